@@ -0,0 +1,25 @@
+"""Cœur de l'Atelier Créatif, sans interface.
+
+Prompts, génération et export PDF, importables sans Streamlit : les pages
+Streamlit, la génération en lot et les scripts de mesure s'appuient dessus.
+Le SDK OpenAI n'est chargé qu'à la création d'un backend `openai`.
+"""
+from .generation import generate, generate_complete
+from .llm_backend import OpenAIBackend, StubBackend, make_backend
+from .pdf_export import render_booklet, render_pdf
+from .prompts import build_params, build_prompt, build_request, prompt_template, variant_params
+
+__all__ = [
+    "OpenAIBackend",
+    "StubBackend",
+    "build_params",
+    "build_prompt",
+    "build_request",
+    "generate",
+    "generate_complete",
+    "make_backend",
+    "prompt_template",
+    "render_booklet",
+    "render_pdf",
+    "variant_params",
+]
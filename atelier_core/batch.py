@@ -0,0 +1,177 @@
+"""Génération en lot, hors interface : un fichier de demandes -> des PDF.
+
+    python -m atelier_core.batch demandes.csv --out pdf/ [--workers 4] [--booklet recueil.pdf]
+                                 [--checkpoint demandes.ckpt.jsonl]
+
+Entrée CSV ou JSONL, une demande par ligne :
+- `lang` (FR par défaut), `activity` (Histoire, Poème, Chanson, Saynette, Libre), `author` ;
+- `answers` : liste JSON, ou chaîne séparée par des `|` ; en CSV, on peut aussi
+  utiliser des colonnes `q1`, `q2`... à la place.
+
+Les demandes sont générées en parallèle (au plus `--workers` appels à la
+fois) avec les prompts de `atelier_core.prompts`. Chaque texte obtenu est
+ajouté au fichier de reprise dès réception : relancer la même commande après
+une interruption ne régénère que les demandes manquantes ou en échec.
+Sortie : un PDF par demande dans `--out`, et/ou un recueil unique (`--booklet`).
+Le backend suit `ATELIER_LLM_BACKEND` (openai avec OPENAI_API_KEY, ou stub).
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from .generation import generate
+from .llm_backend import make_backend
+from .pdf_export import render_booklet, render_pdf
+
+
+@dataclass(frozen=True)
+class BatchRow:
+    index: int
+    lang: str
+    activity: str
+    author: str
+    answers: tuple
+
+    @property
+    def key(self) -> str:
+        """Identifiant stable de la demande (position + contenu), pour la reprise."""
+        payload = json.dumps([self.index, self.lang, self.activity, self.author, self.answers], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^\w-]+", "_", f"{self.index:04d}_{self.activity}_{self.lang}").strip("_")
+
+
+def _answers(record: dict) -> tuple:
+    answers = record.get("answers")
+    if isinstance(answers, list):
+        return tuple(str(a).strip() for a in answers)
+    if answers:
+        return tuple(a.strip() for a in str(answers).split("|"))
+    numbered = sorted((k for k in record if re.fullmatch(r"q\d+", k)), key=lambda k: int(k[1:]))
+    return tuple((record[k] or "").strip() for k in numbered)
+
+
+def read_rows(path) -> list:
+    """Demandes d'un fichier .csv ou .jsonl, numérotées à partir de 1."""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".jsonl":
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+    return [
+        BatchRow(
+            index=i,
+            lang=(record.get("lang") or "FR").strip(),
+            activity=(record.get("activity") or "Histoire").strip(),
+            author=(record.get("author") or "").strip(),
+            answers=_answers(record),
+        )
+        for i, record in enumerate(records, 1)
+    ]
+
+
+class Checkpoint:
+    """Fichier JSONL des textes déjà obtenus : {"key", "index", "text"} par ligne."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.done = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # dernière ligne tronquée par une interruption
+                    self.done[entry["key"]] = entry["text"]
+        self._lock = threading.Lock()
+
+    def add(self, row: BatchRow, text: str):
+        with self._lock:
+            self.done[row.key] = text
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": row.key, "index": row.index, "text": text}, ensure_ascii=False) + "\n")
+
+
+def run_batch(rows, backend, checkpoint: Checkpoint, workers: int = 4, on_done=None):
+    """Génère les demandes absentes du point de reprise ; renvoie [(demande, message d'erreur)]."""
+    todo = [row for row in rows if row.key not in checkpoint.done]
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(generate, backend, row.lang, row.activity, row.author or None, list(row.answers)): row
+            for row in todo
+        }
+        for future in as_completed(futures):
+            row = futures[future]
+            try:
+                checkpoint.add(row, future.result())
+            except Exception as e:  # la demande reste à faire pour la prochaine reprise
+                errors.append((row, str(e)))
+            if on_done:
+                on_done(row)
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m atelier_core.batch", description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="fichier .csv ou .jsonl de demandes")
+    parser.add_argument("--out", help="dossier des PDF (un par demande)")
+    parser.add_argument("--booklet", help="recueil PDF unique regroupant toutes les demandes")
+    parser.add_argument("--title", default="Recueil", help="titre de couverture du recueil")
+    parser.add_argument("--workers", type=int, default=4, help="appels simultanés au backend")
+    parser.add_argument("--checkpoint", help="fichier de reprise (défaut : <input>.ckpt.jsonl)")
+    args = parser.parse_args(argv)
+    if not args.out and not args.booklet:
+        parser.error("indiquer --out et/ou --booklet")
+
+    rows = read_rows(args.input)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.ckpt.jsonl")
+    backend = make_backend(os.environ.get("OPENAI_API_KEY"))
+    resumed = sum(1 for row in rows if row.key in checkpoint.done)
+    print(f"{len(rows)} demandes, {resumed} déjà faites (reprise), backend {backend.name}, {args.workers} en parallèle")
+
+    finished = 0
+
+    def progress(row):
+        nonlocal finished
+        finished += 1
+        print(f"  [{finished}/{len(rows) - resumed}] #{row.index} {row.activity} ({row.lang})", flush=True)
+
+    t0 = time.perf_counter()
+    errors = run_batch(rows, backend, checkpoint, workers=args.workers, on_done=progress)
+    elapsed = time.perf_counter() - t0
+    generated = len(rows) - resumed - len(errors)
+
+    ready = [row for row in rows if row.key in checkpoint.done]
+    if args.out:
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        for row in ready:
+            (out / f"{row.slug}.pdf").write_bytes(render_pdf(checkpoint.done[row.key], row.activity))
+    if args.booklet and ready:
+        chapters = [(f"{row.index}. {row.activity} ({row.lang})", checkpoint.done[row.key]) for row in ready]
+        Path(args.booklet).write_bytes(render_booklet(chapters, args.title))
+
+    rate = generated / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"{generated} textes générés en {elapsed:.1f} s, soit {rate:.1f} par minute ; "
+          f"{len(ready)}/{len(rows)} disponibles en PDF")
+    for row, error in errors:
+        print(f"échec #{row.index} : {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""Génération d'un texte : réponses du formulaire -> texte, sans interface."""
+from .prompts import MAX_TOKENS, build_request
+
+CONTINUE_PROMPT = "Continue le texte exactement là où il s'est arrêté, sans rien répéter, et termine-le."
+
+
+def generate_complete(backend, params: dict, on_usage=None, ceiling: int = MAX_TOKENS):
+    """(texte, tronqué) : un texte coupé par `max_tokens` est complété une fois, sous le plafond `ceiling`.
+
+    La reprise demande la suite du texte déjà reçu avec les seuls tokens
+    restants (`ceiling - max_tokens`) : texte et reprise ne dépassent jamais
+    ensemble le plafond historique d'un appel. Sans marge (budget déjà au
+    plafond), pas de reprise. `tronqué` reste vrai si le texte final est
+    coupé ; ce texte ne doit pas être mis en cache.
+    """
+    reasons = []
+    text = backend.generate(on_usage=on_usage, on_finish=reasons.append, **params)
+    budget = params.get("max_tokens")
+    if reasons[-1:] == ["length"] and budget and budget < ceiling:
+        messages = params["messages"] + [
+            {"role": "assistant", "content": text},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+        text += backend.generate(on_usage=on_usage, on_finish=reasons.append,
+                                 **dict(params, messages=messages, max_tokens=ceiling - budget))
+    return text, reasons[-1:] == ["length"]
+
+
+def generate(backend, lang: str, activity: str, author: str, answers: list, **overrides) -> str:
+    """Texte complet pour un jeu de réponses ; `overrides` remplace des paramètres d'appel (timeout...)."""
+    params = build_request(lang, activity, author, answers)
+    params.update(overrides)
+    return generate_complete(backend, params)[0]
@@ -0,0 +1,164 @@
+"""Backends de génération de texte : OpenAI ou bouchon local.
+
+Les pages n'appellent plus le SDK directement mais un backend exposant :
+- `generate(**params) -> str` : texte complet ;
+- `stream(**params)` : itérateur de fragments de texte ;
+- `stats() -> dict` : compteurs affichés dans l'admin.
+
+`params` reprend les arguments de `chat.completions.create` (model, messages,
+temperature, max_tokens, et éventuellement timeout). `generate` et `stream`
+acceptent aussi `on_usage(prompt_tokens, completion_tokens)`, appelé une fois
+l'appel terminé avec sa consommation (`resp.usage` pour OpenAI), et
+`on_finish(raison)` avec le `finish_reason` de l'API ("length" : texte coupé
+par `max_tokens`).
+
+Le backend est choisi par `ATELIER_LLM_BACKEND` :
+- `openai` (défaut) : client partagé de `llm_client` (pool, reprises, disjoncteur) ;
+- `stub` : histoires pré-écrites rejouées localement, avec une latence
+  (`ATELIER_STUB_LATENCY_S`) et un débit (`ATELIER_STUB_TOKENS_PER_S`)
+  configurables, pour mesurer toute la chaîne sans appeler l'API.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+STUB_STORIES = (
+    "Il était une fois une fillette curieuse qui découvrit, au fond de la forêt magique, "
+    "un écureuil capable de parler. Ensemble, ils partirent à la recherche d'un trésor "
+    "caché derrière l'orage.\n\nAprès bien des détours, ils comprirent que le plus beau "
+    "trésor était leur amitié, et rentrèrent au village en chantant.",
+
+    "Sur la plage, un petit robot rouillé rêvait de voler comme les mouettes.\n"
+    "Chaque matin, il ramassait des plumes, des coquillages et des bouts de ficelle.\n"
+    "Un jour de grand vent, ses amis les crabes l'aidèrent à assembler de grandes ailes, "
+    "et le robot s'éleva enfin au-dessus des vagues, fier et heureux.",
+
+    "Dans la cour de l'école, deux amis trouvèrent une carte mystérieuse.\n\n"
+    "Refrain :\nOn cherche, on trouve, on partage,\nLe monde entier est notre page !\n\n"
+    "La carte menait à la bibliothèque, où chaque livre ouvrait une porte vers un nouveau voyage.",
+)
+
+
+class OpenAIBackend:
+    """Génération via l'API OpenAI (`llm_client.ResilientClient`)."""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate(self, on_usage=None, on_finish=None, **params) -> str:
+        resp = self.client.create(**params)
+        if on_usage and resp.usage:
+            on_usage(resp.usage.prompt_tokens, resp.usage.completion_tokens)
+        if on_finish:
+            on_finish(resp.choices[0].finish_reason)
+        return resp.choices[0].message.content.strip()
+
+    def stream(self, on_usage=None, on_finish=None, **params):
+        # Le dernier fragment, sans choix, porte la consommation de l'appel
+        for chunk in self.client.create(stream=True, stream_options={"include_usage": True}, **params):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if on_finish and chunk.choices and chunk.choices[0].finish_reason:
+                on_finish(chunk.choices[0].finish_reason)
+            if on_usage and getattr(chunk, "usage", None):
+                on_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+
+    def stats(self) -> dict:
+        return self.client.stats()
+
+
+class StubBackend:
+    """Rejoue des histoires pré-écrites, sans réseau.
+
+    Le choix de l'histoire dépend uniquement des messages (même prompt, même
+    texte) ; `latency_s` simule l'attente du premier fragment et
+    `tokens_per_s` le débit (un « token » = un mot ici). `max_tokens` tronque
+    le texte comme le ferait l'API.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_s: float = 0.3, tokens_per_s: float = 50.0, stories=STUB_STORIES):
+        self.latency_s = latency_s
+        self.tokens_per_s = tokens_per_s
+        self.stories = stories
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _words(self, params: dict):
+        """(mots rejoués, raison de fin) : "length" si `max_tokens` a coupé l'histoire."""
+        with self._lock:
+            self.calls += 1
+        digest = hashlib.sha256(json.dumps(params.get("messages"), sort_keys=True).encode("utf-8")).digest()
+        story = self.stories[digest[0] % len(self.stories)]
+        words = story.split(" ")
+        max_tokens = params.get("max_tokens")
+        if max_tokens and len(words) > max_tokens:
+            return words[:max_tokens], "length"
+        return words, "stop"
+
+    def generate(self, on_usage=None, on_finish=None, **params) -> str:
+        words, reason = self._words(params)
+        delay = self.latency_s + (len(words) / self.tokens_per_s if self.tokens_per_s > 0 else 0)
+        time.sleep(delay)
+        if on_usage:
+            on_usage(_prompt_words(params), len(words))
+        if on_finish:
+            on_finish(reason)
+        return " ".join(words).strip()
+
+    def stream(self, on_usage=None, on_finish=None, **params):
+        words, reason = self._words(params)
+        time.sleep(self.latency_s)
+        gap = 1 / self.tokens_per_s if self.tokens_per_s > 0 else 0
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(gap)
+            yield word if i == 0 else " " + word
+        if on_finish:
+            on_finish(reason)
+        if on_usage:
+            on_usage(_prompt_words(params), len(words))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls}
+
+
+def _prompt_words(params: dict) -> int:
+    # Consommation simulée du bouchon : un « token » par mot, comme pour la réponse
+    return sum(len(str(m.get("content", "")).split()) for m in params.get("messages") or [])
+
+
+def make_backend(api_key: str = None, kind: str = None):
+    """Backend choisi par `kind` ou `ATELIER_LLM_BACKEND` (openai | stub)."""
+    kind = (kind or os.environ.get("ATELIER_LLM_BACKEND", "openai")).lower()
+    if kind == "stub":
+        return StubBackend(
+            latency_s=float(os.environ.get("ATELIER_STUB_LATENCY_S", "0.3")),
+            tokens_per_s=float(os.environ.get("ATELIER_STUB_TOKENS_PER_S", "50")),
+        )
+    if kind != "openai":
+        raise ValueError(f"Backend LLM inconnu : {kind} (attendu : openai ou stub)")
+    if not api_key:
+        raise ValueError("Clé OpenAI manquante")
+    # Import différé : le SDK OpenAI n'est chargé que si ce backend est utilisé
+    from .llm_client import CircuitBreaker, ResilientClient, make_openai_client
+    return OpenAIBackend(ResilientClient(
+        make_openai_client(
+            api_key,
+            base_url=os.environ.get("OPENAI_BASE_URL"),
+            connect_timeout=float(os.environ.get("ATELIER_CONNECT_TIMEOUT_S", "5")),
+            read_timeout=float(os.environ.get("ATELIER_READ_TIMEOUT_S", "60")),
+            max_connections=int(os.environ.get("ATELIER_MAX_CONNECTIONS", "20")),
+        ),
+        max_retries=int(os.environ.get("ATELIER_MAX_RETRIES", "3")),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.environ.get("ATELIER_BREAKER_FAILURES", "5")),
+            cooldown_s=float(os.environ.get("ATELIER_BREAKER_COOLDOWN_S", "30")),
+        ),
+    ))
@@ -0,0 +1,169 @@
+"""Client OpenAI partagé : pool de connexions, délais, reprises et disjoncteur.
+
+Un seul client par processus (mis en cache par les pages Streamlit) réutilise
+ses connexions HTTP (keep-alive), évitant une poignée de main TLS par
+génération. Autour des appels :
+- délais explicites de connexion et de lecture ;
+- nouvelles tentatives sur 429 / 5xx / erreurs réseau, avec attente
+  exponentielle et gigue (« full jitter ») ;
+- disjoncteur : après `failure_threshold` échecs consécutifs, les appels
+  échouent immédiatement pendant `cooldown_s`, puis un appel d'essai décide
+  de la réouverture.
+"""
+import random
+import threading
+import time
+
+import openai
+from openai import OpenAI
+
+RETRYABLE = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,  # inclut APITimeoutError
+)
+
+# Classe Limits du client HTTP utilisé par le SDK (httpx ou httpx2 selon la version)
+Limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+
+class CircuitOpenError(RuntimeError):
+    """Le disjoncteur est ouvert : l'API est considérée indisponible."""
+
+
+def make_openai_client(api_key: str, base_url: str = None, connect_timeout: float = 5.0,
+                       read_timeout: float = 60.0, max_connections: int = 20,
+                       keepalive_expiry: float = 30.0) -> OpenAI:
+    """Client OpenAI avec pool de connexions persistantes et délais explicites.
+
+    Les reprises sont désactivées côté SDK : elles sont gérées par `ResilientClient`.
+    """
+    timeout = openai.Timeout(read_timeout, connect=connect_timeout)
+    http_client = openai.DefaultHttpxClient(
+        limits=Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=timeout,
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0, http_client=http_client)
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états : closed -> open -> half-open -> closed."""
+
+    def __init__(self, failure_threshold: int = 5, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_s:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial_running):
+                raise CircuitOpenError("Service OpenAI momentanément indisponible, réessayez plus tard.")
+            if state == "half-open":
+                self._trial_running = True
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """Libère l'appel d'essai sans conclure (erreur qui ne dit rien de l'état de l'API)."""
+        with self._lock:
+            self._trial_running = False
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ResilientClient:
+    """Enveloppe `chat.completions.create` avec reprises et disjoncteur."""
+
+    def __init__(self, client: OpenAI, max_retries: int = 3, backoff_base_s: float = 0.5,
+                 backoff_max_s: float = 8.0, breaker: CircuitBreaker = None):
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.breaker = breaker or CircuitBreaker()
+        self._counts_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def create(self, **params):
+        """Comme `client.chat.completions.create` (y compris `stream=True` et `timeout=`)."""
+        self._count(calls=1)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = self.client.chat.completions.create(**params)
+            except RETRYABLE as e:
+                self.breaker.on_failure()
+                # Disjoncteur déclenché : inutile d'insister, on remonte l'erreur réelle
+                if attempt >= self.max_retries or self.breaker.state != "closed":
+                    self._count(failures=1)
+                    raise
+                self._count(retries=1)
+                time.sleep(self._delay(attempt, e))
+                attempt += 1
+                continue
+            except openai.APIStatusError:
+                # 4xx non réessayable (requête invalide, clé refusée...) : l'API a répondu, elle est joignable
+                self.breaker.on_success()
+                self._count(failures=1)
+                raise
+            except BaseException:
+                # Autre erreur (interruption, bug local) : l'essai ne doit pas rester pris
+                self.breaker.release()
+                self._count(failures=1)
+                raise
+            self.breaker.on_success()
+            return result
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "breaker": self.breaker.state,
+            }
+
+    def _delay(self, attempt: int, error) -> float:
+        # Respecter Retry-After si l'API l'indique, sinon attente exponentielle avec gigue
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max_s)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+
+    def _count(self, calls: int = 0, retries: int = 0, failures: int = 0):
+        with self._counts_lock:
+            self.calls += calls
+            self.retries += retries
+            self.failures += failures
@@ -0,0 +1,85 @@
+"""Export PDF en mémoire.
+
+Le PDF est écrit dans un `BytesIO` (aucun fichier temporaire) et les octets
+sont passés directement à `st.download_button`. La mise en page de la
+couverture (polices, positions centrées) est calculée une seule fois par
+couple (activité, date) puis réutilisée ; le corps passe par le moteur de
+mise en page de `text_layout`.
+"""
+import io
+from datetime import datetime
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .text_layout import draw_lines, wrap_text
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+APP_TITLE = "Atelier Créatif — EDU"
+
+HEADING_FONT = "Helvetica-Bold"
+HEADING_SIZE = 14
+BODY_FONT = "Helvetica"
+BODY_SIZE = 12
+LINE_HEIGHT = 15
+MARGIN_X = 2 * cm
+TOP_Y = PAGE_HEIGHT - 3 * cm
+BOTTOM_Y = 2 * cm
+BODY_WIDTH = PAGE_WIDTH - 2 * MARGIN_X
+
+
+@lru_cache(maxsize=64)
+def _cover_layout(activity: str, date: str):
+    """Lignes de la couverture : (police, taille, x, y, texte), centrées une fois pour toutes."""
+    lines = [
+        ("Helvetica-Bold", 22, PAGE_HEIGHT - 4 * cm, APP_TITLE),
+        ("Helvetica", 16, PAGE_HEIGHT - 5 * cm, activity),
+        ("Helvetica-Oblique", 10, PAGE_HEIGHT - 6 * cm, date),
+    ]
+    return tuple(
+        (font, size, (PAGE_WIDTH - stringWidth(text, font, size)) / 2, y, text)
+        for font, size, y, text in lines
+    )
+
+
+def _draw_cover(c, activity: str, date: str):
+    for font, size, x, y, text in _cover_layout(activity, date):
+        c.setFont(font, size)
+        c.drawString(x, y, text)
+    c.showPage()
+
+
+def _draw_body(c, text: str, heading: str = None):
+    top = TOP_Y
+    if heading:
+        c.setFont(HEADING_FONT, HEADING_SIZE)
+        c.drawString(MARGIN_X, top, heading)
+        top -= 2 * LINE_HEIGHT
+    lines = wrap_text(text, BODY_WIDTH, BODY_FONT, BODY_SIZE)
+    draw_lines(c, lines, MARGIN_X, top, BOTTOM_Y, LINE_HEIGHT, BODY_FONT, BODY_SIZE, page_top_y=TOP_Y)
+
+
+def render_pdf(text: str, activity: str, date: str = None) -> bytes:
+    """Couverture + texte, renvoyés sous forme d'octets PDF."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    _draw_cover(c, activity, date or datetime.now().strftime("%d/%m/%Y"))
+    _draw_body(c, text)
+    c.save()
+    return buf.getvalue()
+
+
+def render_booklet(chapters, activity: str, date: str = None) -> bytes:
+    """Couverture + un chapitre par page, `chapters` étant une liste de (titre, texte)."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    _draw_cover(c, activity, date or datetime.now().strftime("%d/%m/%Y"))
+    for i, (title, text) in enumerate(chapters):
+        if i:
+            c.showPage()
+        _draw_body(c, text, heading=title)
+    c.save()
+    return buf.getvalue()
@@ -0,0 +1,144 @@
+"""Construction des prompts et des paramètres d'appel.
+
+Une seule source pour les consignes par activité, partagée par les pages
+Streamlit, la génération en lot et les scripts de mesure.
+
+Chaque couple (langue, activité) a un gabarit compilé une fois par
+processus : en-tête, consignes et message système sont déjà rendus, seuls
+l'auteur et les réponses sont insérés à chaque demande. Le gabarit porte
+aussi le budget `max_tokens` du couple, lu dans `token_budgets.json` : par
+langue, car une même longueur de texte coûte plus de tokens en allemand
+qu'en anglais. Tant qu'aucune mesure n'est enregistrée
+(`benchmarks/measure_budgets.py --write`), chaque budget vaut le plafond
+historique `MAX_TOKENS` ; aucun budget ne le dépasse.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "Tu es un assistant créatif pour enfants."
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+TEMPERATURE = 0.9
+MAX_TOKENS = 700  # activité sans budget mesuré
+
+BUDGETS_PATH = Path(__file__).resolve().parent / "token_budgets.json"
+
+# Consignes spécifiques par activité (clé : nom d'activité du catalogue)
+ACTIVITY_GUIDELINES = {
+    "Poème": (
+        "Consignes pour le poème :\n"
+        "- Respecter le style choisi (alexandrin, haïku, rimes libres, etc.)\n"
+        "- Longueur : 2 à 4 strophes.\n"
+        "- Ton adapté aux enfants.\n\n"
+    ),
+    "Chanson": (
+        "Consignes pour la chanson :\n"
+        "- Respecter le style musical choisi (pop, jazz, rap, folk...)\n"
+        "- Structure : plusieurs couplets courts + un refrain répété.\n"
+        "- Ambiance adaptée aux enfants.\n"
+        "- Fournir aussi une suggestion musicale simple (ex : accords C-G-Am-F, rythme 4/4, tempo modéré).\n\n"
+    ),
+    "Saynette": (
+        "Consignes pour la saynette :\n"
+        "- Respecter le style théâtral choisi (comédie, vaudeville, drame, comédie musicale...)\n"
+        "- Dialogue entre 2 à 4 personnages.\n"
+        "- De 6 à 12 répliques.\n"
+        "- Si c’est une comédie musicale, ajouter aussi une indication de rythme ou de style musical (ex : jazz, pop, folk, tempo rapide ou lent).\n\n"
+    ),
+    "Histoire": (
+        "Consignes pour l’histoire :\n"
+        "- Structure claire : début, problème, solution, fin.\n"
+        "- Ton choisi par l’utilisateur (drôle, mystérieux, épique...)\n"
+        "- Fin souhaitée (heureuse, morale, surprenante...)\n\n"
+    ),
+    "Libre": (
+        "Consignes pour le texte libre :\n"
+        "- Respecter le type choisi (lettre, dialogue, journal...)\n"
+        "- Ton narratif choisi (réaliste, imaginaire, poétique...)\n\n"
+    ),
+}
+
+
+INTRO = (
+    "Tu dois créer un texte adapté aux enfants (6–14 ans). "
+    "Le texte doit être positif, créatif, structuré et bienveillant.\n\n"
+)
+ANSWERS_HEADER = "Voici les réponses données par l’utilisateur :\n"
+FOOTER = "\nMaintenant, rédige le texte en suivant ces éléments."
+
+
+def load_budgets(path=BUDGETS_PATH) -> dict:
+    """Budget `max_tokens` par langue puis activité ({} si le fichier est absent).
+
+    Un fichier à plat (activité -> budget) s'applique à toutes les langues (clé "*").
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            budgets = json.load(f)["max_tokens"]
+    except FileNotFoundError:
+        return {}
+    if all(isinstance(v, int) for v in budgets.values()):
+        budgets = {"*": budgets}
+    return {lang: {k: int(v) for k, v in per_activity.items()} for lang, per_activity in budgets.items()}
+
+
+def token_budget(lang: str, activity: str) -> int:
+    """Budget `max_tokens` de (langue, activité), sinon le plafond historique."""
+    per_activity = TOKEN_BUDGETS.get(lang) or TOKEN_BUDGETS.get("*", {})
+    return per_activity.get(activity, MAX_TOKENS)
+
+
+TOKEN_BUDGETS = load_budgets()
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    head: str        # « Langue : … Activité : … »
+    body: str        # introduction, consignes et début de la liste des réponses
+    max_tokens: int
+
+    def render(self, author: str, answers: list) -> str:
+        lines = "".join(f"- Q{k}: {a}\n" for k, a in enumerate(answers, 1) if a)
+        author_clause = f" Auteur : {author}" if author else ""  # pas d'auteur (None, "") : pas de mention
+        return self.head + author_clause + "\n" + self.body + lines + FOOTER
+
+
+@lru_cache(maxsize=None)
+def prompt_template(lang: str, activity: str) -> PromptTemplate:
+    """Gabarit compilé pour (langue, activité), construit au premier usage."""
+    return PromptTemplate(
+        head=f"Langue : {lang}. Activité : {activity}.",
+        body=INTRO + ACTIVITY_GUIDELINES.get(activity, "") + ANSWERS_HEADER,
+        max_tokens=token_budget(lang, activity),
+    )
+
+
+def build_prompt(lang: str, activity: str, author: str, answers: list) -> str:
+    """Prompt enrichi : contexte, consignes de l'activité et réponses de l'utilisateur."""
+    return prompt_template(lang, activity).render(author, answers)
+
+
+def build_params(prompt: str, max_tokens: int = MAX_TOKENS) -> dict:
+    """Paramètres de l'appel chat.completions pour un prompt donné."""
+    return dict(
+        model=MODEL,
+        messages=[SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
+        temperature=TEMPERATURE,
+        max_tokens=max_tokens,
+    )
+
+
+def build_request(lang: str, activity: str, author: str, answers: list) -> dict:
+    """Paramètres complets d'une demande, avec le budget `max_tokens` de l'activité."""
+    template = prompt_template(lang, activity)
+    return build_params(template.render(author, answers), template.max_tokens)
+
+
+def variant_params(base: dict, i: int, n: int) -> dict:
+    """Paramètres de la version `i` sur `n` d'un pack (textes distincts pour un même sujet)."""
+    variant = base["messages"][-1]["content"] + (
+        f"\n\nVersion {i} sur {n} : propose un texte différent des autres versions."
+    )
+    return dict(base, messages=base["messages"][:-1] + [{"role": "user", "content": variant}])
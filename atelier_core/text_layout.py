@@ -0,0 +1,98 @@
+"""Mise en page du texte pour l'export PDF.
+
+Coupure des lignes au mot près, à partir des largeurs réelles des glyphes
+(`stringWidth`) plutôt qu'à un nombre fixe de caractères : plus de mots
+coupés en deux ni de débordement de marge avec les accents. Les largeurs
+sont mémorisées par (mot, police, taille), et les lignes sont émises par
+page dans un seul objet texte (`beginText` / `textLines`).
+"""
+from functools import lru_cache
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+
+@lru_cache(maxsize=16384)
+def word_width(word: str, font: str, size: float) -> float:
+    """Largeur d'un mot en points (mémorisée)."""
+    return stringWidth(word, font, size)
+
+
+def _split_long_word(word: str, max_width: float, font: str, size: float):
+    """Découpe un mot plus large que la ligne (URL, onomatopée...) au caractère près."""
+    pieces, current = [], ""
+    for char in word:
+        if current and word_width(current + char, font, size) > max_width:
+            pieces.append(current)
+            current = char
+        else:
+            current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def wrap_paragraph(paragraph: str, max_width: float, font: str, size: float):
+    """Coupure gloutonne d'un paragraphe (sans retour à la ligne) en lignes de largeur <= max_width."""
+    stripped = paragraph.lstrip(" ")
+    indent = paragraph[:len(paragraph) - len(stripped)]  # garder l'indentation des répliques
+    words = stripped.split()
+    if not words:
+        return [""]
+    space = word_width(" ", font, size)
+    lines = []
+    current = indent
+    current_width = word_width(indent, font, size) if indent else 0.0
+    for word in words:
+        width = word_width(word, font, size)
+        if width > max_width:
+            if current.strip():
+                lines.append(current)
+            pieces = _split_long_word(word, max_width, font, size)
+            lines.extend(pieces[:-1])
+            current = pieces[-1]
+            current_width = word_width(current, font, size)
+            continue
+        if not current.strip():
+            current += word
+            current_width += width
+        elif current_width + space + width <= max_width:
+            current += " " + word
+            current_width += space + width
+        else:
+            lines.append(current)
+            current = word
+            current_width = width
+    lines.append(current)
+    return lines
+
+
+def wrap_text(text: str, max_width: float, font: str, size: float):
+    """Coupe un texte complet ; les lignes vides (changements de strophe, etc.) sont conservées."""
+    lines = []
+    for paragraph in text.split("\n"):
+        lines.extend(wrap_paragraph(paragraph.rstrip(), max_width, font, size))
+    return lines
+
+
+def draw_lines(c, lines, x: float, top_y: float, bottom_y: float, leading: float, font: str, size: float,
+               page_top_y: float = None):
+    """Dessine les lignes page par page, un objet texte par page.
+
+    La page courante du canvas reçoit la première tranche à partir de `top_y`
+    (sous un éventuel titre) ; une nouvelle page est ouverte pour chaque
+    tranche suivante, qui repart de la marge haute `page_top_y` (`top_y` par
+    défaut).
+    """
+    page_top_y = top_y if page_top_y is None else page_top_y
+    start, y = 0, top_y
+    while start < len(lines):
+        if start:
+            c.showPage()
+            y = page_top_y
+        count = max(1, int((y - bottom_y) // leading) + 1)
+        text = c.beginText(x, y)
+        text.setFont(font, size)
+        text.setLeading(leading)
+        text.textLines(lines[start:start + count], trim=0)
+        c.drawText(text)
+        start += count
@@ -1,10 +1,6 @@
 import streamlit as st
-from openai import OpenAI
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-import tempfile
-from datetime import datetime
+import os
+from atelier_core import generate, make_backend, render_pdf
 
 # -----------------------
 # CONFIG APP
@@ -31,13 +27,21 @@ st.info("💡 Votre clé OpenAI reste privée et n’est jamais partagée.")
 # -----------------------
 # CLÉ OPENAI
 # -----------------------
-api_key = st.text_input("🔑 Entrez votre clé OpenAI", type="password")
+LLM_BACKEND = os.environ.get("ATELIER_LLM_BACKEND", "openai")
+api_key = None
+if LLM_BACKEND == "openai":
+    api_key = st.text_input("🔑 Entrez votre clé OpenAI", type="password")
 
-if not api_key:
-    st.warning("Veuillez entrer votre clé OpenAI pour continuer.")
-    st.stop()
+    if not api_key:
+        st.warning("Veuillez entrer votre clé OpenAI pour continuer.")
+        st.stop()
 
-client = OpenAI(api_key=api_key)
+# Un backend (et son pool de connexions) par clé, réutilisé d'un rerun à l'autre
+@st.cache_resource(max_entries=100, ttl=3600)
+def get_llm_backend(key: str):
+    return make_backend(key, LLM_BACKEND)
+
+llm = get_llm_backend(api_key)
 
 # -----------------------
 # LANGUE & ACTIVITÉ
@@ -136,24 +140,10 @@ if st.button("🪄 Générer le texte", use_container_width=True, type="primary"
     if not any(answers):
         st.error("⚠️ Veuillez répondre à au moins une question.")
     else:
+        # Nom d'activité sans emoji, comme dans le catalogue (consignes du prompt, couverture du PDF)
+        activity_name = activity.split(" ", 1)[-1]
         with st.spinner("✍️ L'IA écrit votre création..."):
-            prompt = f"Langue : {lang}. Activité : {activity}. "
-            prompt += "Crée un texte adapté aux enfants (6–14 ans). Style positif et créatif.\n"
-            for i, a in enumerate(answers, 1):
-                if a:
-                    prompt += f"Q{i}: {a}\n"
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Tu es un assistant créatif pour enfants."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.9,
-                max_tokens=700
-            )
-
-            story = response.choices[0].message.content.strip()
+            story = generate(llm, lang, activity_name, None, answers)
 
         st.success("✨ Voici votre création :")
         st.markdown(f"<div style='background:#f9f9f9; padding:15px; border-radius:10px;'>{story}</div>", unsafe_allow_html=True)
@@ -161,40 +151,11 @@ if st.button("🪄 Générer le texte", use_container_width=True, type="primary"
         # -----------------------
         # EXPORT EN PDF
         # -----------------------
-        def create_pdf(text):
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-            c = canvas.Canvas(tmp_file.name, pagesize=A4)
-            width, height = A4
-            # Couverture
-            c.setFont("Helvetica-Bold", 22)
-            c.drawCentredString(width/2, height - 4*cm, "Atelier Créatif — EDU")
-            c.setFont("Helvetica", 14)
-            c.drawCentredString(width/2, height - 5*cm, activity)
-            c.setFont("Helvetica-Oblique", 10)
-            c.drawCentredString(width/2, height - 6*cm, datetime.now().strftime("%d/%m/%Y"))
-            c.showPage()
-            # Texte
-            c.setFont("Helvetica", 12)
-            y = height - 3*cm
-            for line in text.split("\n"):
-                for subline in [line[i:i+90] for i in range(0, len(line), 90)]:
-                    c.drawString(2*cm, y, subline)
-                    y -= 15
-                    if y < 2*cm:
-                        c.showPage()
-                        c.setFont("Helvetica", 12)
-                        y = height - 3*cm
-            c.save()
-            return tmp_file.name
-
-        pdf_path = create_pdf(story)
-
-        with open(pdf_path, "rb") as f:
-            st.download_button(
-                label="⬇️ Télécharger en PDF",
-                data=f,
-                file_name="atelier_creatif.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
+        st.download_button(
+            label="⬇️ Télécharger en PDF",
+            data=render_pdf(story, activity_name),
+            file_name="atelier_creatif.pdf",
+            mime="application/pdf",
+            use_container_width=True
+        )
 
@@ -0,0 +1,52 @@
+"""Benchmark : catalogue chargé une fois vs littéraux reconstruits à chaque rerun.
+
+    python benchmarks/bench_catalog.py [--reruns 2000]
+
+Mesure le coût de démarrage (`load_catalog` : lecture JSON, validation,
+index) et le coût par rerun de l'ancien code (construction des littéraux
+LABELS/QPACK puis recherche) face à une recherche dans le catalogue en cache.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from catalog import CATALOG_PATH, load_catalog  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=2000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    catalog = load_catalog()
+    startup_ms = (time.perf_counter() - t0) * 1000
+
+    # Ancien comportement : les littéraux sont réévalués à chaque exécution du script
+    data = json.loads(Path(CATALOG_PATH).read_text(encoding="utf-8"))
+    literal = compile(f"LABELS = {data['labels']!r}\nQPACK = {data['questions']!r}\n", "<littéraux>", "exec")
+
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        scope = {}
+        exec(literal, scope)
+        scope["QPACK"].get("DE", scope["QPACK"]["FR"]).get("Chanson", [])
+        scope["LABELS"]["DE"]["generate"]
+    legacy_us = (time.perf_counter() - t0) / args.reruns * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(args.reruns):
+        catalog.questions_for("DE", "Chanson")
+        catalog.labels["DE"]["generate"]
+    cached_us = (time.perf_counter() - t0) / args.reruns * 1e6
+
+    print(f"démarrage (load_catalog)      : {startup_ms:8.2f} ms, une fois par processus")
+    print(f"par rerun, littéraux          : {legacy_us:8.2f} µs")
+    print(f"par rerun, catalogue en cache : {cached_us:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Mesure le regroupement des générations identiques (une classe valide les mêmes suggestions).
+
+    python benchmarks/bench_coalesce.py [--pupils 20] [--spread 2.0] [--latency 0.5] [--tokens-per-s 50]
+
+`--pupils` sessions (threads d'un même processus, comme les sessions
+Streamlit d'un worker) demandent le même texte, à des instants répartis au
+hasard sur `--spread` secondes. Avec le backend bouchon, compare les appels
+émis et le temps avant le texte complet, sans puis avec `SingleFlight`.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from atelier_core.llm_backend import StubBackend  # noqa: E402
+from atelier_core.prompts import build_request  # noqa: E402
+from single_flight import SingleFlight, flight_key  # noqa: E402
+
+
+def run(pupils: int, spread: float, backend, in_flight=None, seed: int = 0):
+    rng = random.Random(seed)
+    delays = sorted(rng.uniform(0, spread) for _ in range(pupils))
+    params = build_request("FR", "Histoire", None, ["Un dragon", "Dans une école", "Il a peur du noir"])
+    key = flight_key(params["messages"], params["model"], params["temperature"], params["max_tokens"])
+    texts, durations = [], []
+    lock = threading.Lock()
+
+    def pupil(delay: float):
+        time.sleep(delay)
+        t0 = time.perf_counter()
+        if in_flight is None:
+            text = "".join(backend.stream(**params))
+        else:
+            text = "".join(in_flight.stream(key, lambda: backend.stream(**params)))
+        with lock:
+            texts.append(text)
+            durations.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=pupil, args=(d,)) for d in delays]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return texts, sorted(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pupils", type=int, default=20)
+    parser.add_argument("--spread", type=float, default=2.0, help="fenêtre des clics (s)")
+    parser.add_argument("--latency", type=float, default=0.5, help="latence du bouchon avant le 1er mot (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="débit du bouchon (mots/s)")
+    args = parser.parse_args()
+
+    print(f"{args.pupils} demandes identiques sur {args.spread:.1f} s")
+    print(f"{'mode':<14}{'appels':>8}{'p50 (s)':>10}{'max (s)':>10}{'textes':>8}")
+    for mode in ("indépendants", "regroupés"):
+        backend = StubBackend(latency_s=args.latency, tokens_per_s=args.tokens_per_s)
+        in_flight = SingleFlight() if mode == "regroupés" else None
+        texts, durations = run(args.pupils, args.spread, backend, in_flight)
+        print(f"{mode:<14}{backend.stats()['calls']:>8}{durations[len(durations) // 2]:>10.2f}"
+              f"{durations[-1]:>10.2f}{len(set(texts)):>8}")
+        if in_flight is not None:
+            stats = in_flight.stats()
+            print(f"  lancés {stats['issued']}, regroupés {stats['coalesced']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Rapport : octets envoyés par vue du carrousel, originaux vs variantes.
+
+    python benchmarks/bench_images.py [--container 880] [--reps 20]
+
+Affiche le temps de construction des variantes (une fois au démarrage) et,
+pour chaque image et chaque format, la taille réellement envoyée au
+navigateur face à l'original. Les octets passent par le traitement de
+`st.image` (format déduit, réencodage éventuel) : une variante WebP y est
+réencodée en JPEG, ce que le rapport fait apparaître avec le coût de ce
+réencodage par affichage. Sort en erreur (code 1) si les octets servis par
+l'application (`ImageVariant.sent`) diffèrent de ce que Streamlit envoie.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from streamlit.elements.lib.image_utils import (  # noqa: E402
+    _ensure_image_size_and_format, _validate_image_format_string,
+)
+from streamlit.elements.lib.layout_utils import LayoutConfig  # noqa: E402
+
+from image_assets import ENCODERS, ImageAssets  # noqa: E402
+
+FILES = ["slide1.jpg", "slide2.jpg", "slide4.jpg"]
+
+
+def streamlit_bytes(data: bytes) -> bytes:
+    """Octets que `st.image(data, use_container_width=True)` transmet au navigateur."""
+    image_format = _validate_image_format_string(data, "auto")
+    return _ensure_image_size_and_format(data, LayoutConfig(width="stretch"), image_format)
+
+
+def per_call_ms(data: bytes, reps: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        streamlit_bytes(data)
+    return (time.perf_counter() - t0) / reps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--container", type=int, default=880, help="largeur du conteneur en px")
+    parser.add_argument("--reps", type=int, default=20, help="affichages mesurés par image")
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    t0 = time.perf_counter()
+    assets = ImageAssets(FILES)
+    print(f"construction des variantes : {(time.perf_counter() - t0) * 1000:.0f} ms (une fois par processus)")
+    mismatches = 0
+    for fmt in ENCODERS:
+        before = after = 0
+        print(f"\n{fmt} :")
+        for file in FILES:
+            original = streamlit_bytes(Path(file).read_bytes())
+            variant = assets.best(file, args.container, fmt)
+            sent = streamlit_bytes(variant.data)  # ce que donnerait la sortie brute de l'encodeur
+            mismatches += streamlit_bytes(variant.sent) != variant.sent
+            before, after = before + len(original), after + len(variant.sent)
+            print(f"  {file:<12} {len(original) / 1000:7.1f} Ko -> encodé {len(variant.data) / 1000:6.1f} Ko, "
+                  f"envoyé {len(sent) / 1000:6.1f} Ko ({variant.width}px) ; "
+                  f"st.image {per_call_ms(variant.data, args.reps):.1f} ms brut, "
+                  f"{per_call_ms(variant.sent, args.reps):.1f} ms servi")
+        print(f"  moyenne par vue : {before / len(FILES) / 1000:.1f} Ko -> {after / len(FILES) / 1000:.1f} Ko "
+              f"({after / before - 1:+.0%})")
+    if mismatches:
+        print(f"{mismatches} variante(s) servie(s) réencodée(s) par Streamlit")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
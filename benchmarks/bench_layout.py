@@ -0,0 +1,147 @@
+"""Benchmark : coupure des lignes du PDF, ancienne (90 caractères) vs `text_layout`.
+
+    python benchmarks/bench_layout.py [--repeat 20]
+
+Pour une longue histoire dans chacune des cinq langues, compte les lignes qui
+débordent de la marge A4 et les mots coupés en deux, et mesure le temps de
+mise en page.
+
+Vérifie aussi la mise en page de `text_layout` et sort en erreur (code 1) si,
+dans une des langues : une ligne dépasse la largeur du corps, un mot est
+coupé alors qu'il tient sur une ligne, des mots sont perdus ou déplacés, une
+ligne vide (changement de strophe) disparaît, ou l'indentation d'une
+réplique n'est pas conservée.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from atelier_core.pdf_export import BODY_FONT, BODY_SIZE, BODY_WIDTH  # noqa: E402
+from atelier_core.text_layout import word_width, wrap_text  # noqa: E402
+
+PARAGRAPHS = {
+    "FR": "Élodie, une fillette curieuse, découvrit dans la forêt magique un écureuil qui parlait "
+          "d’une voix douce ; ensemble, ils cherchèrent le trésor caché derrière l’orage, "
+          "malgré le rival jaloux qui surveillait chaque sentier ensoleillé.",
+    "EN": "Once upon a time, a curious girl wandered through the magic forest, where a talking "
+          "squirrel offered to help her find a treasure hidden beyond the storm, despite a "
+          "jealous rival who watched every sunlit trail.",
+    "ES": "Érase una vez una niña curiosa que descubrió en el bosque mágico una ardilla parlanchina; "
+          "juntas buscaron el tesoro escondido tras la tormenta, a pesar del rival celoso que "
+          "vigilaba cada sendero iluminado.",
+    "DE": "Es war einmal ein neugieriges Mädchen, das im Zauberwald ein sprechendes Eichhörnchen "
+          "traf; gemeinsam suchten sie den Schatz hinter dem Gewitter, obwohl ein eifersüchtiger "
+          "Rivale jeden sonnenüberfluteten Pfad beobachtete.",
+    "IT": "C’era una volta una ragazza curiosa che scoprì nella foresta magica uno scoiattolo "
+          "parlante; insieme cercarono il tesoro nascosto oltre la tempesta, nonostante il rivale "
+          "geloso che sorvegliava ogni sentiero soleggiato.",
+}
+
+
+# Réplique indentée et mot plus large que la ligne (seul cas où une coupure est permise)
+DIALOGUE = "    — {}"
+LONG_WORD = "https://exemple.org/" + "abcdefghij" * 15
+
+
+def make_story(paragraph: str) -> str:
+    blocks = [paragraph * 3, DIALOGUE.format(paragraph), "", paragraph + " " + LONG_WORD + " " + paragraph]
+    return "\n\n".join(["\n".join(blocks)] * 4)
+
+
+def legacy_wrap(text: str):
+    lines = []
+    for line in text.split("\n"):
+        lines.extend([line[i:i+90] for i in range(0, len(line), 90)] if line else [""])
+    return lines
+
+
+def check(lines, text):
+    overflow = sum(1 for line in lines if stringWidth(line, BODY_FONT, BODY_SIZE) > BODY_WIDTH + 0.01)
+    words = set(text.split())
+    split = sum(1 for line in lines for w in line.split()[-1:] if w not in words and w not in LONG_WORD)
+    return overflow, split
+
+
+def _segments(lines):
+    """Mots de chaque bloc séparé par des lignes vides."""
+    blocks = [[]]
+    for line in lines:
+        if line.strip():
+            blocks[-1].extend(line.split())
+        else:
+            blocks.append([])
+    return blocks
+
+
+def _same_words(expected: list, got: list) -> bool:
+    """Mêmes mots dans le même ordre ; seul un mot plus large que la ligne peut être en plusieurs morceaux."""
+    k = 0
+    for word in expected:
+        if stringWidth(word, BODY_FONT, BODY_SIZE) <= BODY_WIDTH:
+            if got[k:k + 1] != [word]:
+                return False
+            k += 1
+            continue
+        joined = ""
+        while k < len(got) and len(joined) < len(word):
+            joined += got[k]
+            k += 1
+        if joined != word:
+            return False
+    return k == len(got)
+
+
+def layout_errors(text: str, lines: list) -> list:
+    """Défauts de mise en page de `lines` (coupure de `text`) ; liste vide si tout est correct."""
+    errors = []
+    for i, line in enumerate(lines):
+        if stringWidth(line, BODY_FONT, BODY_SIZE) > BODY_WIDTH + 0.01:
+            errors.append(f"ligne {i + 1} trop large : {line[:40]}…")
+    paragraphs = text.split("\n")
+    expected = _segments(paragraphs)
+    got = _segments(lines)
+    if len(expected) != len(got):
+        errors.append(f"{len(got) - 1} ligne(s) vide(s) au lieu de {len(expected) - 1}")
+    for n, (words, line_words) in enumerate(zip(expected, got), 1):
+        if not _same_words(words, line_words):
+            errors.append(f"bloc {n} : mots coupés, perdus ou déplacés")
+    for paragraph in paragraphs:
+        indent = paragraph[:len(paragraph) - len(paragraph.lstrip(" "))]
+        if indent and paragraph.strip():
+            start = indent + paragraph.split()[0]
+            if not any(line.startswith(start) for line in lines):
+                errors.append(f"indentation perdue : {paragraph.strip()[:40]}…")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    failures = []
+    print(f"{'langue':<7}{'méthode':<10}{'lignes':>8}{'débords':>9}{'mots coupés':>13}{'ms':>9}")
+    for lang, paragraph in PARAGRAPHS.items():
+        story = make_story(paragraph)
+        for name, fn in (("90 car.", legacy_wrap),
+                         ("layout", lambda t: wrap_text(t, BODY_WIDTH, BODY_FONT, BODY_SIZE))):
+            word_width.cache_clear()
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                lines = fn(story)
+            ms = (time.perf_counter() - t0) / args.repeat * 1000
+            overflow, split = check(lines, story)
+            print(f"{lang:<7}{name:<10}{len(lines):>8}{overflow:>9}{split:>13}{ms:>9.2f}")
+        failures.extend(f"{lang} : {error}" for error in layout_errors(story, lines))
+
+    for failure in failures:
+        print(f"ÉCHEC {failure}")
+    print("mise en page : OK (5 langues)" if not failures else f"mise en page : {len(failures)} échec(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Test de charge sans navigateur : N enseignants remplissent le formulaire et génèrent.
+
+    python benchmarks/bench_load.py [--teachers 8] [--rounds 2] [--app streamlit_app.py]
+                                    [--latency 0.2] [--tokens-per-s 200]
+                                    [--budget rerun_p95_ms=1500,pdf_p95_ms=100] [--json out.json]
+
+Chaque enseignant est une session `AppTest` indépendante, exécutée dans son
+propre processus (AppTest n'est pas utilisable depuis plusieurs threads) :
+identification, réponses aux questions, clic sur « Générer ». Les processus
+partent ensemble une fois leurs imports faits, et partagent les bases SQLite
+comme plusieurs workers d'un même déploiement. Le backend est le bouchon local (`ATELIER_LLM_BACKEND=stub`), les bases
+SQLite vont dans un dossier temporaire : aucun appel réseau, aucun fichier
+laissé dans le dépôt.
+
+Mesures (p50 / p95 / p99, en ms) :
+- rerun : durée de chaque `AppTest.run()` vue par la session (le premier
+  construit aussi les ressources `st.cache_resource` du processus) ;
+- résultat : du clic à l'arrivée du texte dans la session (file de
+  génération comprise), la page étant relancée toutes les 50 ms comme le
+  ferait le rafraîchissement de la progression ;
+- génération : appel complet au backend (flux consommé jusqu'au bout) ;
+- pdf : `render_pdf` ;
+- journal : `UsageLogWriter.submit` (chemin de la requête) et
+  `UsageStore.record_many` (écriture par lots, en arrière-plan) ;
+- mémoire : hausse du RSS maximal de chaque processus pendant sa session,
+  imports déduits.
+
+Avec `--budget`, le script sort en erreur (code 1) si un seuil est dépassé,
+pour servir de garde-fou en intégration continue.
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Champs de réponse : answer_<activité>_<langue>_<i> (streamlit_app) ou q<i> (aventure_creatif, QPACK)
+ANSWER_KEY = re.compile(r"answer_.+|q\d+")
+
+SAMPLES = {}
+_samples_lock = threading.Lock()
+
+
+def add_sample(metric: str, seconds: float):
+    with _samples_lock:
+        SAMPLES.setdefault(metric, []).append(seconds * 1000)
+
+
+def percentile(values, pct: float) -> float:
+    """Percentile au rang le plus proche."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def probe(owner, name: str, metric: str):
+    """Remplace `owner.name` par une version chronométrée (générateurs consommés compris)."""
+    original = getattr(owner, name)
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        result = original(*args, **kwargs)
+        if hasattr(result, "__next__"):
+            return _timed_iter(result, metric, t0)
+        add_sample(metric, time.perf_counter() - t0)
+        return result
+
+    setattr(owner, name, wrapper)
+
+
+def _timed_iter(iterator, metric: str, t0: float):
+    yield from iterator
+    add_sample(metric, time.perf_counter() - t0)
+
+
+def install_probes():
+    import atelier_core
+    import usage_store
+    from atelier_core import llm_backend, pdf_export
+
+    for backend in (llm_backend.OpenAIBackend, llm_backend.StubBackend):
+        probe(backend, "generate", "génération")
+        probe(backend, "stream", "génération")
+    probe(pdf_export, "render_pdf", "pdf")
+    probe(atelier_core, "render_pdf", "pdf")  # pages qui importent depuis le paquet
+    probe(usage_store.UsageLogWriter, "submit", "journal (submit)")
+    probe(usage_store.UsageStore, "record_many", "journal (lot SQLite)")
+
+
+def teacher_session(app_test, app: str, index: int, rounds: int, errors: list):
+    def run(element=None):
+        t0 = time.perf_counter()
+        (element or at).run()
+        add_sample("rerun", time.perf_counter() - t0)
+
+    at = app_test.from_file(str(ROOT / app), default_timeout=120)
+    run()
+    if app == "streamlit_app.py":
+        run(at.text_input(key="user_id_input").input(f"prof{index}"))
+    for round_no in range(rounds):
+        # Réponses propres à chaque enseignant et à chaque tour : pas de hit de cache
+        for i, field in enumerate(t for t in at.text_input if ANSWER_KEY.fullmatch(t.key or "")):
+            field.input(f"Idée {i + 1} du prof {index}, tour {round_no}")
+        button = next(b for b in at.button if "Générer le texte" in str(b.label))
+        t0 = time.perf_counter()
+        run(button.click())
+        wait_result(at)
+        add_sample("résultat", time.perf_counter() - t0)
+        if at.exception:
+            errors.append((index, str(at.exception[0].value)))
+        elif at.error or at.warning:
+            errors.append((index, (at.error or at.warning)[0].value))
+
+
+def wait_result(at, timeout_s: float = 120):
+    """Relance la page jusqu'à ce que les tâches de génération de la session soient terminées."""
+    deadline = time.perf_counter() + timeout_s
+    while "jobs" in at.session_state and at.session_state["jobs"]:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("résultat non reçu")
+        time.sleep(0.05)
+        at.run()
+
+
+def teacher_process(app: str, index: int, rounds: int, barrier, results):
+    """Une session dans son propre processus ; renvoie (mesures, erreurs, Ko de RSS) par `results`."""
+    from streamlit.testing.v1 import AppTest  # importé avant la barrière : hors chronométrage
+    os.chdir(ROOT)
+    from streamlit.logger import set_log_level
+    set_log_level("error")  # avertissements de l'app répétés par chaque session
+    install_probes()
+    errors = []
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    barrier.wait()
+    try:
+        teacher_session(AppTest, app, index, rounds, errors)
+    except Exception as e:  # la session compte comme en erreur, les autres continuent
+        errors.append((index, repr(e)))
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    time.sleep(float(os.environ.get("ATELIER_LOG_FLUSH_MS", "500")) / 1000 + 0.2)  # dernier lot du journal
+    with _samples_lock:
+        results.put((SAMPLES, errors, rss_kb))
+
+
+def parse_budget(spec: str) -> dict:
+    """"rerun_p95_ms=1500,pdf_p99_ms=200" -> {("rerun", 95): 1500.0, ("pdf", 99): 200.0}"""
+    budget = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, limit = item.split("=")
+        metric, pct, _unit = name.rsplit("_", 2)
+        budget[(metric, int(pct.lstrip("p")))] = float(limit)
+    return budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="streamlit_app.py", choices=["streamlit_app.py", "aventure_creatif.py"])
+    parser.add_argument("--teachers", type=int, default=8, help="sessions simultanées")
+    parser.add_argument("--rounds", type=int, default=2, help="générations par enseignant")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du bouchon avant le 1er mot (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=200, help="débit du bouchon (mots/s)")
+    parser.add_argument("--budget", default="", help="seuils, ex. rerun_p95_ms=1500,pdf_p95_ms=100")
+    parser.add_argument("--json", help="écrit le rapport dans ce fichier")
+    args = parser.parse_args()
+
+    # Bases SQLite du banc, supprimées à la fin (processus enfants terminés)
+    with tempfile.TemporaryDirectory(prefix="atelier-bench-") as workdir:
+        os.environ.update({
+            "ATELIER_LLM_BACKEND": "stub",
+            "ATELIER_STUB_LATENCY_S": str(args.latency),
+            "ATELIER_STUB_TOKENS_PER_S": str(args.tokens_per_s),
+            "ATELIER_STATE_DB": os.path.join(workdir, "state.db"),
+            "ATELIER_QUOTA_DB": os.path.join(workdir, "quota.db"),
+            "ATELIER_USAGE_DB": os.path.join(workdir, "usage.db"),
+            "ATELIER_CREATIONS_DB": os.path.join(workdir, "creations.db"),
+            "ATELIER_CACHE_PATH": os.path.join(workdir, "generations.db"),
+            "ATELIER_QUOTA_USER": str(args.rounds + 1),
+            "ATELIER_GLOBAL_RPM": "100000",
+            "ATELIER_GLOBAL_BURST": str(args.teachers * args.rounds),
+        })
+        results = multiprocessing.Queue()
+        barrier = multiprocessing.Barrier(args.teachers + 1)
+        processes = [
+            multiprocessing.Process(target=teacher_process, args=(args.app, i, args.rounds, barrier, results))
+            for i in range(args.teachers)
+        ]
+        for p in processes:
+            p.start()
+        barrier.wait()  # tous les processus ont fini leurs imports
+        t0 = time.perf_counter()
+        errors, rss = [], []
+        for _ in processes:
+            samples, session_errors, rss_kb = results.get()
+            for metric, values in samples.items():
+                SAMPLES.setdefault(metric, []).extend(values)
+            errors.extend(session_errors)
+            rss.append(rss_kb)
+        wall = time.perf_counter() - t0
+        for p in processes:
+            p.join()
+    rss_kb = sum(rss) / len(rss)
+
+    report = {
+        "app": args.app, "teachers": args.teachers, "rounds": args.rounds,
+        "wall_s": round(wall, 2), "errors": errors,
+        "memory_per_session_kb": round(rss_kb),
+        "metrics": {
+            metric: {
+                "n": len(values),
+                **{f"p{p}": round(percentile(values, p), 1) for p in (50, 95, 99)},
+            }
+            for metric, values in sorted(SAMPLES.items())
+        },
+    }
+
+    print(f"{args.teachers} sessions x {args.rounds} générations ({args.app}) en {wall:.1f} s")
+    print(f"{'mesure (ms)':<22}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for metric, row in report["metrics"].items():
+        print(f"{metric:<22}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+    print(f"mémoire par session : ~{rss_kb:.0f} Ko (hausse du RSS max)")
+    for index, message in errors:
+        print(f"erreur session {index} : {message}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failed = [f"{len(errors)} session(s) en erreur"] if errors else []
+    for (metric, pct), limit in parse_budget(args.budget).items():
+        row = report["metrics"].get(metric)
+        if row is None:
+            failed.append(f"{metric} : aucune mesure")
+        elif row[f"p{pct}"] > limit:
+            failed.append(f"{metric} p{pct} = {row[f'p{pct}']:.1f} ms > {limit:.0f} ms")
+    for message in failed:
+        print(f"ÉCHEC : {message}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
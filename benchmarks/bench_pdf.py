@@ -0,0 +1,92 @@
+"""Benchmark : export PDF en mémoire vs ancien chemin par fichier temporaire.
+
+    python benchmarks/bench_pdf.py [--n 200]
+
+Compare le débit (PDF/s), le pic mémoire (tracemalloc) et les fichiers
+laissés dans le répertoire temporaire par chaque méthode.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from atelier_core.pdf_export import render_pdf  # noqa: E402
+
+STORY = ("Il était une fois une fillette curieuse qui explorait la forêt magique. " * 12 + "\n\n") * 6
+
+
+def legacy_create_pdf(text: str, activity: str) -> str:
+    """Copie de l'ancien `create_pdf()` de streamlit_app.py (fichier temporaire jamais supprimé)."""
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    c = canvas.Canvas(tmp_file.name, pagesize=A4)
+    width, height = A4
+    c.setFont("Helvetica-Bold", 22)
+    c.drawCentredString(width/2, height - 4*cm, "Atelier Créatif — EDU")
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(width/2, height - 5*cm, activity)
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawCentredString(width/2, height - 6*cm, datetime.now().strftime("%d/%m/%Y"))
+    c.showPage()
+    c.setFont("Helvetica", 12)
+    y = height - 3*cm
+    for line in text.split("\n"):
+        parts = [line[i:i+90] for i in range(0, len(line), 90)] if line else [""]
+        for sub in parts:
+            c.drawString(2*cm, y, sub)
+            y -= 15
+            if y < 2*cm:
+                c.showPage()
+                c.setFont("Helvetica", 12)
+                y = height - 3*cm
+    c.save()
+    return tmp_file.name
+
+
+def legacy(text: str) -> bytes:
+    # Comme l'app : on rouvre le fichier pour le passer au bouton de téléchargement
+    with open(legacy_create_pdf(text, "Histoire"), "rb") as f:
+        return f.read()
+
+
+def in_memory(text: str) -> bytes:
+    return render_pdf(text, "Histoire")
+
+
+def run(name, fn, n):
+    tmp_dir = Path(tempfile.gettempdir())
+    before = set(tmp_dir.glob("*.pdf"))
+    fn(STORY)  # échauffement
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(STORY)
+    elapsed = time.perf_counter() - t0
+    # Pic mémoire mesuré à part : tracemalloc ralentit fortement l'exécution
+    tracemalloc.start()
+    fn(STORY)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    leaked = set(tmp_dir.glob("*.pdf")) - before
+    print(f"{name:<12} {n / elapsed:8.1f} PDF/s   pic mémoire {peak / 1024:8.0f} Kio   fichiers laissés : {len(leaked)}")
+    for path in leaked:
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=200, help="nombre de PDF par méthode")
+    args = parser.parse_args()
+    run("tempfile", legacy, args.n)
+    run("BytesIO", in_memory, args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Vérifie reprises, gigue et disjoncteur du client partagé contre le serveur bouchon.
+
+    python benchmarks/check_llm_client.py [--cooldown 0.5]
+
+Un serveur `stub_openai_server` tourne dans le processus ; son comportement
+est changé entre les étapes :
+1. 500 en continu : l'appel est repris puis le disjoncteur s'ouvre au
+   `failure_threshold`-ième échec et l'erreur réelle remonte ;
+2. disjoncteur ouvert : l'appel échoue aussitôt (`CircuitOpenError`), sans
+   requête ;
+3. après `cooldown_s` (half-open), un seul appel d'essai part ; encore en
+   500, il rouvre le disjoncteur, sans reprise ;
+4. délai de lecture dépassé : l'essai suivant échoue en `APITimeoutError`
+   et rouvre le disjoncteur ;
+5. erreur 400 pendant l'essai : l'API répond, le disjoncteur se referme ;
+6. 429 avec `Retry-After` : les reprises attendent le délai indiqué ;
+7. API rétablie : l'appel réussit et l'état reste fermé ;
+8. gigue : les attentes sans `Retry-After` sont tirées dans
+   [0, min(backoff_max, base x 2^tentative)] et varient.
+
+Sort en erreur (code 1) si une vérification échoue.
+"""
+import argparse
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import openai
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent))
+sys.path.insert(0, str(ROOT))
+from atelier_core.llm_client import (  # noqa: E402
+    CircuitBreaker, CircuitOpenError, ResilientClient, make_openai_client,
+)
+from stub_openai_server import make_handler  # noqa: E402
+
+THRESHOLD = 3
+READ_TIMEOUT_S = 0.3
+PARAMS = {"model": "stub", "messages": [{"role": "user", "content": "Une histoire"}], "max_tokens": 50}
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # réponse écrite après l'abandon du client (délai dépassé, étape 4)
+
+
+def start_server(control: dict) -> ThreadingHTTPServer:
+    server = QuietServer(("127.0.0.1", 0), make_handler(0.0, 0.0, 0.0, control))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def call(client) -> str:
+    """Nom de l'exception levée par un appel, ou "ok"."""
+    try:
+        client.create(**PARAMS)
+    except Exception as e:
+        return type(e).__name__
+    return "ok"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cooldown", type=float, default=0.5, help="cooldown_s du disjoncteur")
+    args = parser.parse_args()
+
+    control = {}
+    server = start_server(control)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    breaker = CircuitBreaker(failure_threshold=THRESHOLD, cooldown_s=args.cooldown)
+    client = ResilientClient(make_openai_client("stub", base_url, read_timeout=READ_TIMEOUT_S),
+                             max_retries=THRESHOLD + 1, backoff_base_s=0.01, backoff_max_s=0.05, breaker=breaker)
+    failures = []
+
+    def check(step: str, ok: bool, detail):
+        print(f"{'OK ' if ok else 'ERR'} {step} : {detail}")
+        if not ok:
+            failures.append(step)
+
+    def requests() -> int:
+        return control.get("requests", 0)
+
+    def cool_down():
+        time.sleep(args.cooldown + 0.05)
+
+    # 1. 500 en continu
+    control["status"] = 500
+    outcome = call(client)
+    check("500 : reprises puis ouverture", outcome == "InternalServerError" and requests() == THRESHOLD
+          and client.retries == THRESHOLD - 1 and breaker.state == "open",
+          f"{outcome}, {requests()} requêtes, {client.retries} reprises, {breaker.state}")
+
+    # 2. Ouvert : échec immédiat, sans requête
+    before = requests()
+    outcome = call(client)
+    check("ouvert : échec immédiat", outcome == CircuitOpenError.__name__ and requests() == before,
+          f"{outcome}, {requests() - before} requête(s)")
+
+    # 3. Half-open : un seul essai, encore en échec
+    cool_down()
+    state, before = breaker.state, requests()
+    outcome = call(client)
+    check("half-open puis réouverture", state == "half-open" and outcome == "InternalServerError"
+          and requests() == before + 1 and breaker.state == "open",
+          f"{state} -> {outcome}, {requests() - before} requête(s), {breaker.state}")
+
+    # 4. Délai de lecture dépassé pendant l'essai
+    control.pop("status")
+    control["latency"] = READ_TIMEOUT_S * 3
+    cool_down()
+    outcome = call(client)
+    check("timeout : réouverture", outcome == "APITimeoutError" and breaker.state == "open",
+          f"{outcome}, {breaker.state}")
+
+    # 5. 400 pendant l'essai : l'API est joignable, le disjoncteur se referme
+    control["latency"] = 0.0
+    control["status"] = 400
+    cool_down()
+    outcome = call(client)
+    check("400 : fermeture", outcome == "BadRequestError" and breaker.state == "closed" and breaker.failures == 0,
+          f"{outcome}, {breaker.state}")
+
+    # 6. 429 + Retry-After : attente du délai annoncé (0,1 s) entre les reprises
+    control["status"] = 429
+    patient = ResilientClient(client.client, max_retries=2, backoff_base_s=0.01, backoff_max_s=1.0,
+                              breaker=CircuitBreaker(failure_threshold=100))
+    t0 = time.perf_counter()
+    outcome = call(patient)
+    elapsed = time.perf_counter() - t0
+    check("429 : Retry-After respecté", outcome == "RateLimitError" and patient.retries == 2 and elapsed >= 0.2,
+          f"{outcome}, {patient.retries} reprises en {elapsed:.2f} s")
+
+    # 7. API rétablie
+    control.pop("status")
+    outcome = call(client)
+    check("rétablie", outcome == "ok" and breaker.state == "closed", f"{outcome}, {breaker.state}")
+
+    # 8. Gigue (« full jitter ») sans Retry-After
+    error = openai.APIConnectionError(request=None)
+    bounds_ok, spread = True, []
+    for attempt in range(4):
+        cap = min(client.backoff_max_s, client.backoff_base_s * 2 ** attempt)
+        delays = [client._delay(attempt, error) for _ in range(200)]
+        bounds_ok &= all(0 <= d <= cap for d in delays)
+        spread.append(len(set(delays)) > 1)
+    check("gigue bornée et variable", bounds_ok and all(spread), f"bornes {'OK' if bounds_ok else 'dépassées'}")
+
+    server.shutdown()
+    print(f"{len(failures)} vérification(s) en échec")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Vérifie que deux workers partageant le même magasin d'état restent cohérents.
+
+    python benchmarks/check_multiworker.py [--backend sqlite] [--users 200] [--attempts 10]
+
+1. Quotas : deux processus, chacun avec son propre `QuotaService`, tentent
+   en même temps `--attempts` essais pour chacun des `--users` utilisateurs.
+   Au total, chaque utilisateur doit obtenir exactement `user_limit` essais.
+2. Application : une session `AppTest` dans le worker A choisit l'anglais,
+   l'activité Poème et génère un texte (backend bouchon) ; une nouvelle
+   session dans le worker B, pour le même utilisateur, doit retrouver la
+   langue, l'activité, la dernière création et le quota consommé.
+
+Sort en erreur (code 1) si une vérification échoue.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from quota import QuotaService  # noqa: E402
+from state_store import make_state_store  # noqa: E402
+
+USER_LIMIT = 5
+
+
+def quota_worker(backend: str, path: str, users: int, attempts: int, barrier, results):
+    granted = {}
+    try:
+        store = make_state_store(backend, path=path)
+        quota = QuotaService(store, user_limit=USER_LIMIT, global_rate_per_min=1e9, global_burst=10 ** 9)
+        barrier.wait(timeout=60)
+        for _ in range(attempts):
+            for u in range(users):
+                if quota.try_acquire(f"prof{u}", "Histoire").allowed:
+                    granted[u] = granted.get(u, 0) + 1
+                time.sleep(0.0002)  # requêtes espacées : sinon un worker monopolise le verrou SQLite
+    except Exception as e:
+        barrier.abort()
+        results.put({"error": repr(e)})
+        return
+    results.put(granted)
+
+
+def app_worker(step: str, results):
+    from streamlit.testing.v1 import AppTest
+    from streamlit.logger import set_log_level
+
+    set_log_level("error")
+    os.chdir(ROOT)
+    try:
+        at = AppTest.from_file(str(ROOT / "streamlit_app.py"), default_timeout=60).run()
+        at.text_input(key="user_id_input").input("prof-partage").run()
+        if step == "A":
+            at.radio[0].set_value("EN").run()
+            at.button(key="act_Poème").click().run()
+            at.text_input(key="answer_Poème_EN_1").input("Rain").run()
+            next(b for b in at.button if "Generate" in str(b.label)).click().run()
+            while "jobs" in at.session_state and at.session_state["jobs"]:  # génération en arrière-plan
+                time.sleep(0.05)
+                at.run()
+    except Exception as e:
+        results.put({"lang": None, "activity": None, "story": None, "tries": None, "exceptions": [repr(e)]})
+        return
+    results.put({
+        "lang": at.session_state["lang"],
+        "activity": at.session_state["activity"],
+        "story": next((m.value for m in at.markdown if "result-box" in m.value), None),
+        "tries": next((c.value for c in at.caption if "5" in c.value), None),  # affiché avant le clic
+        "exceptions": [str(e.value) for e in at.exception],
+    })
+
+
+def run(target, args_list):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=(*args, results)) for args in args_list]
+    for p in processes:
+        p.start()
+    out = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "redis"])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--attempts", type=int, default=10, help="essais tentés par utilisateur et par worker")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="atelier-workers-")
+    path = os.path.join(workdir, "state.db")
+    failures = []
+
+    # 1. Quotas sous concurrence
+    barrier = multiprocessing.Barrier(2)
+    granted = run(quota_worker, [(args.backend, path, args.users, args.attempts, barrier)] * 2)
+    for result in granted:
+        if "error" in result:
+            print(f"ÉCHEC : worker en erreur : {result['error']}")
+            sys.exit(1)
+    totals = {u: sum(g.get(u, 0) for g in granted) for u in range(args.users)}
+    wrong = {u: n for u, n in totals.items() if n != USER_LIMIT}
+    split = [sum(g.values()) for g in granted]
+    print(f"quotas : {args.users} utilisateurs x {args.attempts} essais x 2 workers -> "
+          f"accordés A={split[0]}, B={split[1]}, attendu {args.users * USER_LIMIT} au total")
+    if wrong:
+        failures.append(f"quota incohérent pour {len(wrong)} utilisateur(s) : {wrong}")
+
+    # 2. Application : session sur A, reprise sur B
+    os.environ.update({
+        "ATELIER_LLM_BACKEND": "stub",
+        "ATELIER_STUB_LATENCY_S": "0",
+        "ATELIER_STATE_BACKEND": args.backend,
+        "ATELIER_STATE_DB": os.path.join(workdir, "app-state.db"),
+        "ATELIER_QUOTA_DB": os.path.join(workdir, "quota.db"),
+        "ATELIER_USAGE_DB": os.path.join(workdir, "usage.db"),
+        "ATELIER_CREATIONS_DB": os.path.join(workdir, "creations.db"),
+        "ATELIER_CACHE_PATH": os.path.join(workdir, "generations.db"),
+    })
+    (a,) = run(app_worker, [("A",)])
+    (b,) = run(app_worker, [("B",)])
+    print(f"worker A : {a['lang']} / {a['activity']} / {a['tries']}")
+    print(f"worker B : {b['lang']} / {b['activity']} / {b['tries']}")
+    for name, result in (("A", a), ("B", b)):
+        if result["exceptions"]:
+            failures.append(f"worker {name} : {result['exceptions']}")
+    if (b["lang"], b["activity"]) != ("EN", "Poème"):
+        failures.append("préférences non retrouvées sur le worker B")
+    if not b["story"] or b["story"] != a["story"]:
+        failures.append("dernière création absente sur le worker B")
+    if "4" not in (b["tries"] or ""):
+        failures.append(f"essai consommé sur A non vu par B : « {b['tries']} »")
+
+    for message in failures:
+        print(f"ÉCHEC : {message}")
+    if not failures:
+        print("OK : état cohérent entre les deux workers")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Vérifie le texte des prompts construits par `atelier_core.prompts`.
+
+    python benchmarks/check_prompts.py
+
+Pour chaque langue et chaque activité :
+- avec un auteur, le prompt le mentionne (« Auteur : … ») ;
+- sans auteur (None, comme aventure_creatif.py, test_app et le mode lot,
+  ou chaîne vide), le prompt ne contient ni « Auteur » ni « None » ;
+- les réponses vides sont omises et la numérotation des questions conservée.
+
+Sort en erreur (code 1) si une vérification échoue.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from atelier_core.prompts import ACTIVITY_GUIDELINES, build_prompt  # noqa: E402
+
+LANGS = ["FR", "EN", "ES", "DE", "IT"]
+ANSWERS = ["un dragon", "", "la mer"]
+
+
+def prompt_errors(lang: str, activity: str) -> list:
+    errors = []
+    named = build_prompt(lang, activity, "Zoé", ANSWERS)
+    if f"Activité : {activity}. Auteur : Zoé\n" not in named:
+        errors.append("auteur absent du prompt")
+    for author in (None, ""):
+        prompt = build_prompt(lang, activity, author, ANSWERS)
+        if "None" in prompt or "Auteur" in prompt:
+            errors.append(f"auteur {author!r} mentionné : {prompt.splitlines()[0]!r}")
+        if not prompt.startswith(f"Langue : {lang}. Activité : {activity}.\n"):
+            errors.append(f"en-tête inattendu pour l'auteur {author!r} : {prompt.splitlines()[0]!r}")
+    if "- Q1: un dragon\n- Q3: la mer\n" not in named or "- Q2:" in named:
+        errors.append("liste des réponses incorrecte")
+    return errors
+
+
+def main() -> int:
+    failures = 0
+    for lang in LANGS:
+        for activity in ACTIVITY_GUIDELINES:
+            errors = prompt_errors(lang, activity)
+            failures += bool(errors)
+            print(f"{lang} {activity:<10} {'OK' if not errors else '; '.join(errors)}")
+    print(f"{failures} combinaison(s) en erreur")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
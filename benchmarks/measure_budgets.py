@@ -0,0 +1,112 @@
+"""Mesure la longueur des textes générés par langue et activité et en déduit les budgets `max_tokens`.
+
+    python benchmarks/measure_budgets.py [--samples 20] [--lang FR] [--cap 1400] [--write]
+    python benchmarks/measure_budgets.py --reset
+
+Pour chaque langue (toutes par défaut) et chaque activité, génère
+`--samples` textes à partir de réponses tirées au hasard parmi les
+suggestions du catalogue, avec un plafond large (`--cap`, le double du
+plafond historique) pour observer les longueurs réelles. La longueur est le
+nombre de tokens générés rapporté par l'API (`usage.completion_tokens`), à
+défaut le nombre de fragments du flux. Le budget proposé vaut p95 x 1.25,
+arrondi aux 50 supérieurs et plafonné à `MAX_TOKENS` (le plafond historique
+d'un appel, qui borne aussi la reprise d'un texte coupé) ; `--write`
+l'enregistre dans `atelier_core/token_budgets.json`, avec la méthode et la
+date de la mesure.
+
+Le backend suit `ATELIER_LLM_BACKEND` ; `--write` refuse le bouchon, qui
+compte des mots et ne mesure rien. `--reset` réécrit le fichier sans
+mesure : chaque langue et activité reçoit le plafond historique.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from atelier_core import make_backend  # noqa: E402
+from atelier_core.prompts import BUDGETS_PATH, MAX_TOKENS, build_params, build_prompt  # noqa: E402
+from catalog import load_catalog  # noqa: E402
+
+HEADROOM = 1.25
+
+
+def measure(backend, lang: str, activity: str, questions: list, rng: random.Random, cap: int):
+    """(tokens générés, coupé par `cap`) pour un texte."""
+    answers = [rng.choice(q["sug"]) for q in questions]
+    params = build_params(build_prompt(lang, activity, None, answers), cap)
+    usage, reasons = [], []
+    chunks = sum(1 for _ in backend.stream(on_usage=lambda p, c: usage.append(c), on_finish=reasons.append,
+                                           **params))
+    return (usage[-1] if usage else chunks), reasons[-1:] == ["length"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=20, help="textes par langue et activité")
+    parser.add_argument("--lang", action="append", help="langue à mesurer (répétable ; défaut : toutes)")
+    parser.add_argument("--cap", type=int, default=2 * MAX_TOKENS, help="max_tokens des appels de mesure")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write", action="store_true", help=f"enregistre les budgets dans {BUDGETS_PATH.name}")
+    parser.add_argument("--reset", action="store_true", help=f"remet {BUDGETS_PATH.name} au plafond, sans mesure")
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    languages = args.lang or catalog.languages
+    if args.reset:
+        budgets = {lang: {activity: MAX_TOKENS for activity in catalog.activities} for lang in languages}
+        write_budgets(budgets, {}, f"aucune mesure : plafond historique ({MAX_TOKENS}) partout ; "
+                                   "à remplacer par benchmarks/measure_budgets.py --write avec une vraie clé")
+        return
+    backend = make_backend(os.environ.get("OPENAI_API_KEY"))
+    if args.write and backend.name == "stub":
+        parser.error("--write : le bouchon ne mesure pas de vraies longueurs (ATELIER_LLM_BACKEND=openai)")
+    rng = random.Random(args.seed)
+    budgets = {}
+    print(f"{'langue':<8}{'activité':<10}{'n':>4}{'p50':>7}{'p95':>7}{'max':>7}{'coupés':>8}{'budget':>8}")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for lang in languages:
+            for activity in catalog.activities:
+                questions = catalog.questions_for(lang, activity)
+                seeds = [random.Random(rng.random()) for _ in range(args.samples)]
+                outcomes = list(pool.map(lambda r: measure(backend, lang, activity, questions, r, args.cap), seeds))
+                lengths = sorted(n for n, _ in outcomes)
+                p95 = lengths[min(len(lengths) - 1, math.ceil(0.95 * len(lengths)) - 1)]
+                budgets.setdefault(lang, {})[activity] = min(MAX_TOKENS, 50 * math.ceil(p95 * HEADROOM / 50))
+                truncated = sum(1 for _, cut in outcomes if cut)
+                print(f"{lang:<8}{activity:<10}{len(lengths):>4}{lengths[len(lengths) // 2]:>7}{p95:>7}"
+                      f"{lengths[-1]:>7}{truncated:>8}{budgets[lang][activity]:>8}")
+
+    if args.write:
+        with open(BUDGETS_PATH, encoding="utf-8") as f:
+            previous = json.load(f)["max_tokens"]
+        if any(isinstance(v, int) for v in previous.values()):
+            previous = {}  # ancien format à plat : remplacé par le format par langue
+        write_budgets(budgets, previous, (
+            f"mesuré le {time.strftime('%Y-%m-%d')} pour {', '.join(budgets)} "
+            f"({backend.name}, {args.samples} textes par langue et activité, "
+            f"usage.completion_tokens) : p95 x {HEADROOM}, arrondi aux 50 supérieurs, plafond {MAX_TOKENS}"
+        ))
+
+
+def write_budgets(budgets: dict, previous: dict, method: str):
+    """Écrit les budgets (fusionnés avec ceux des langues non mesurées) dans le fichier du paquet."""
+    merged = {lang: dict(per_activity) for lang, per_activity in previous.items()}
+    for lang, per_activity in budgets.items():
+        merged.setdefault(lang, {}).update(per_activity)
+    data = {"version": 2, "method": method, "max_tokens": merged}
+    with open(BUDGETS_PATH, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"budgets écrits dans {BUDGETS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
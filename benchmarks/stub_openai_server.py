@@ -0,0 +1,113 @@
+"""Serveur HTTP local imitant `POST /v1/chat/completions` (réponse complète ou SSE).
+
+    python benchmarks/stub_openai_server.py [--port 8765] [--latency 0.3] [--fail-rate 0.2]
+
+Permet d'éprouver le client partagé (`atelier_core.llm_client`) sans appeler OpenAI :
+latence configurable, et une part des requêtes répond 429 ou 500 pour
+exercer les reprises et le disjoncteur (`make_handler(..., control=...)`
+permet aussi de forcer un statut ou une latence en cours de route, voir
+`check_llm_client.py`). Lancer l'app contre ce serveur :
+
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STORY = (
+    "Il était une fois une fillette curieuse qui découvrit, au fond de la forêt magique, "
+    "un écureuil capable de parler. Ensemble, ils partirent à la recherche d'un trésor "
+    "caché derrière l'orage, et apprirent que le plus beau trésor était leur amitié."
+)
+
+
+def make_handler(latency: float, fail_rate: float, token_delay: float, control: dict = None):
+    """Gestionnaire HTTP du bouchon.
+
+    `control`, modifiable pendant l'exécution, peut imposer `status` et
+    `latency` ; il reçoit le nombre de requêtes reçues (`requests`).
+    """
+    control = {} if control is None else control
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+            with lock:
+                control["requests"] = control.get("requests", 0) + 1
+            time.sleep(control.get("latency", latency))
+            status = control.get("status")
+            if status is None and random.random() < fail_rate:
+                status = 429 if random.random() < 0.5 else 500
+            if status == 429:
+                return self._json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                  {"retry-after": "0.1"})
+            if status:
+                return self._json(status, {"error": {"message": "boom", "type": "server_error"}})
+            words = STORY.split(" ")
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                for word in words:
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", "stub"),
+                             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    time.sleep(token_delay)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", "stub"), "choices": [],
+                             "usage": {"prompt_tokens": 120, "completion_tokens": len(words),
+                                       "total_tokens": 120 + len(words)}}
+                    self._chunk(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+                return
+            self._json(200, {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": STORY}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 120, "completion_tokens": len(words), "total_tokens": 120 + len(words)},
+            })
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="délai avant la réponse (s)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="délai entre fragments SSE (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="part des requêtes en 429/500")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency, args.fail_rate, args.token_delay))
+    print(f"Stub OpenAI sur http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
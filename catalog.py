@@ -0,0 +1,83 @@
+"""Catalogue de l'interface : libellés, questions et suggestions.
+
+Le contenu vit dans `catalog.json` (versionné). Il est chargé et validé une
+seule fois par processus, puis indexé par (langue, activité) pour un accès
+direct à chaque rerun.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+CATALOG_PATH = Path(__file__).resolve().parent / "catalog.json"
+SUPPORTED_VERSION = 1
+
+
+class CatalogError(ValueError):
+    """Catalogue incomplet ou incohérent."""
+
+
+@dataclass(frozen=True)
+class Catalog:
+    version: int
+    languages: tuple
+    language_names: dict
+    activities: tuple
+    labels: dict          # lang -> libellés
+    placeholders: dict    # lang -> texte d'exemple des champs
+    questions: dict       # (lang, activity) -> [{"q": ..., "sug": [...]}, ...]
+
+    def questions_for(self, lang: str, activity: str) -> list:
+        return self.questions.get((lang, activity)) or self.questions.get(("FR", activity), [])
+
+
+def validate(data: dict):
+    """Vérifie que chaque langue a tous les libellés et toutes les activités,
+    avec le même nombre de questions d'une langue à l'autre."""
+    if data.get("version") != SUPPORTED_VERSION:
+        raise CatalogError(f"Version de catalogue non prise en charge : {data.get('version')}")
+    languages, activities = data["languages"], data["activities"]
+    reference = languages[0]
+    label_keys = set(data["labels"][reference])
+    for lang in languages:
+        labels = data["labels"].get(lang)
+        if labels is None:
+            raise CatalogError(f"Libellés manquants pour {lang}")
+        missing = label_keys - set(labels)
+        if missing:
+            raise CatalogError(f"Libellés manquants pour {lang} : {sorted(missing)}")
+        if set(labels["activities"]) != set(activities):
+            raise CatalogError(f"Noms d'activités incomplets pour {lang}")
+        if lang not in data["placeholders"]:
+            raise CatalogError(f"Placeholder manquant pour {lang}")
+        for activity in activities:
+            questions = data["questions"].get(lang, {}).get(activity)
+            if not questions:
+                raise CatalogError(f"Questions manquantes : {lang} / {activity}")
+            expected = len(data["questions"][reference][activity])
+            if len(questions) != expected:
+                raise CatalogError(
+                    f"{lang} / {activity} : {len(questions)} questions au lieu de {expected}"
+                )
+            for q in questions:
+                if not q.get("q") or not q.get("sug"):
+                    raise CatalogError(f"Question incomplète : {lang} / {activity} / {q}")
+
+
+def load_catalog(path=CATALOG_PATH) -> Catalog:
+    """Lit, valide et indexe le catalogue."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    validate(data)
+    return Catalog(
+        version=data["version"],
+        languages=tuple(data["languages"]),
+        language_names=data["language_names"],
+        activities=tuple(data["activities"]),
+        labels=data["labels"],
+        placeholders=data["placeholders"],
+        questions={
+            (lang, activity): questions
+            for lang, per_activity in data["questions"].items()
+            for activity, questions in per_activity.items()
+        },
+    )
@@ -0,0 +1,64 @@
+"""Pack classe : plusieurs variantes d'un même sujet, générées en parallèle.
+
+`generate_variants` répartit N appels sur un pool de threads borné, avec
+nouvelles tentatives (attente exponentielle) pour chaque variante. Le
+délai maximal par appel est fixé côté client OpenAI (paramètre `timeout`).
+L'application passe `run=` pour exécuter les variantes dans sa file de
+génération plutôt que dans un pool propre au pack.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PackResult:
+    texts: list                      # un texte par variante, None si elle a échoué
+    latencies: list                  # durée de l'appel réussi (ou du dernier essai), en s
+    errors: list = field(default_factory=list)  # (numéro de variante, message)
+    wall_s: float = 0.0              # durée réelle du pack
+
+    @property
+    def ok(self) -> int:
+        return sum(1 for t in self.texts if t)
+
+    @property
+    def sequential_s(self) -> float:
+        """Durée estimée si les variantes avaient été générées l'une après l'autre."""
+        return sum(self.latencies)
+
+
+def _with_retries(generate_one, index: int, retries: int, backoff_s: float):
+    attempt = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            return generate_one(index), time.perf_counter() - t0, None
+        except Exception as e:  # erreurs réseau, 429, délai dépassé...
+            if attempt >= retries:
+                return None, time.perf_counter() - t0, str(e)
+            time.sleep(backoff_s * 2 ** attempt)
+            attempt += 1
+
+
+def generate_variants(generate_one, n: int, max_workers: int = 5, retries: int = 2,
+                      backoff_s: float = 1.0, run=None) -> PackResult:
+    """Appelle `generate_one(i)` pour i = 1..n, au plus `max_workers` à la fois.
+
+    `run(tâches)`, s'il est fourni, exécute les tâches (fonctions sans argument)
+    et renvoie leurs résultats dans l'ordre ; `max_workers` est alors ignoré.
+    """
+    t0 = time.perf_counter()
+    tasks = [lambda i=i: _with_retries(generate_one, i, retries, backoff_s) for i in range(1, n + 1)]
+    if run is not None:
+        outcomes = run(tasks)
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, n))) as pool:
+            outcomes = list(pool.map(lambda task: task(), tasks))
+    result = PackResult(texts=[], latencies=[], wall_s=time.perf_counter() - t0)
+    for i, (text, latency, error) in enumerate(outcomes, 1):
+        result.texts.append(text)
+        result.latencies.append(latency)
+        if error:
+            result.errors.append((i, error))
+    return result
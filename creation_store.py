@@ -0,0 +1,119 @@
+"""Créations des utilisateurs (SQLite en mode WAL) : texte et PDF déjà rendu.
+
+Chaque génération réussie est enregistrée avec les octets de son PDF : le
+panneau de résultat se réaffiche après un rerun (clic sur « Télécharger »,
+changement de processus sur la même machine : le fichier est local à
+l'hôte) sans nouvel appel OpenAI ni nouveau rendu PDF, et
+l'historique « Mes créations » se lit page par page grâce à l'index
+(user_id, id). Les identifiants croissent avec le temps : trier par id
+revient à trier par date de création.
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS creations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    lang TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    text TEXT NOT NULL,
+    pdf BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_creations_user ON creations(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_creations_user_activity ON creations(user_id, activity, id);
+"""
+
+# Colonnes lues pour l'affichage : le PDF n'est chargé qu'au téléchargement
+COLUMNS = "id, user_id, created_at, lang, activity, text"
+
+
+@dataclass(frozen=True)
+class Creation:
+    id: int
+    user_id: str
+    created_at: float
+    lang: str
+    activity: str
+    text: str
+
+
+class CreationStore:
+    """Historique des créations par utilisateur, partageable entre threads et processus."""
+
+    def __init__(self, path="creations.db", max_per_user: int = 200):
+        self.path = Path(path)
+        self.max_per_user = max_per_user
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # -------------------------
+    # Écriture
+    # -------------------------
+    def add(self, user_id: str, lang: str, activity: str, text: str, pdf: bytes) -> int:
+        """Enregistre une création et renvoie son identifiant.
+
+        Au-delà de `max_per_user` créations, les plus anciennes de l'utilisateur sont supprimées.
+        """
+        with self._lock:
+            creation_id = self._conn.execute(
+                "INSERT INTO creations (user_id, created_at, lang, activity, text, pdf) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, time.time(), lang, activity, text, sqlite3.Binary(pdf)),
+            ).lastrowid
+            if self.max_per_user:
+                self._conn.execute(
+                    "DELETE FROM creations WHERE user_id = ? AND id <= "
+                    "(SELECT id FROM creations WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (user_id, user_id, self.max_per_user),
+                )
+            self._conn.commit()
+        return creation_id
+
+    # -------------------------
+    # Lecture
+    # -------------------------
+    def get(self, user_id: str, creation_id: int):
+        """Création `creation_id` si elle appartient à `user_id`, sinon None."""
+        rows = self._query(f"SELECT {COLUMNS} FROM creations WHERE id = ? AND user_id = ?", (creation_id, user_id))
+        return Creation(*rows[0]) if rows else None
+
+    def latest(self, user_id: str, activity: str = None):
+        """Dernière création de l'utilisateur (pour une activité donnée si précisée), ou None."""
+        if activity is None:
+            rows = self._query(
+                f"SELECT {COLUMNS} FROM creations WHERE user_id = ? ORDER BY id DESC LIMIT 1", (user_id,)
+            )
+        else:
+            rows = self._query(
+                f"SELECT {COLUMNS} FROM creations WHERE user_id = ? AND activity = ? ORDER BY id DESC LIMIT 1",
+                (user_id, activity),
+            )
+        return Creation(*rows[0]) if rows else None
+
+    def pdf(self, user_id: str, creation_id: int):
+        """Octets du PDF enregistré, ou None."""
+        rows = self._query("SELECT pdf FROM creations WHERE id = ? AND user_id = ?", (creation_id, user_id))
+        return bytes(rows[0][0]) if rows else None
+
+    def page(self, user_id: str, page: int = 0, per_page: int = 10) -> list:
+        """Créations de l'utilisateur, de la plus récente à la plus ancienne, page `page` (à partir de 0)."""
+        rows = self._query(
+            f"SELECT {COLUMNS} FROM creations WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (user_id, per_page, max(0, page) * per_page),
+        )
+        return [Creation(*row) for row in rows]
+
+    def count(self, user_id: str) -> int:
+        return self._query("SELECT COUNT(*) FROM creations WHERE user_id = ?", (user_id,))[0][0]
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
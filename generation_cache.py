@@ -0,0 +1,137 @@
+"""Cache persistant des générations (SQLite), adressé par le contenu du prompt.
+
+Une même combinaison de suggestions produit le même prompt : on évite de
+repayer l'appel OpenAI en servant un texte déjà généré. Pour garder de la
+variété, on génère d'abord `variants` textes par clé, puis on les resservira
+à tour de rôle (le moins récemment servi en premier).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generations_key ON generations(key, last_used);
+CREATE INDEX IF NOT EXISTS idx_generations_last_used ON generations(last_used);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def make_key(prompt, model: str, temperature: float, max_tokens: int) -> str:
+    """Empreinte SHA-256 du prompt complet (str ou liste de messages) et des paramètres."""
+    payload = json.dumps(
+        {"prompt": prompt, "model": model, "temperature": temperature, "max_tokens": max_tokens},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Store SQLite partagé entre sessions, avec éviction TTL puis LRU."""
+
+    def __init__(self, path="generations.db", ttl_s: float = 7 * 24 * 3600,
+                 max_entries: int = 5000, variants: int = 3):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.variants = max(1, variants)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # -------------------------
+    # Lecture / écriture
+    # -------------------------
+    def get(self, key: str):
+        """Renvoie un texte en cache, ou None s'il faut encore générer une variante."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, text FROM generations WHERE key = ? AND created_at >= ? "
+                "ORDER BY last_used ASC",
+                (key, now - self.ttl_s),
+            ).fetchall()
+            if len(rows) < self.variants:
+                self._bump("misses")
+                self._conn.commit()
+                return None
+            row_id, text = rows[0]
+            self._conn.execute("UPDATE generations SET last_used = ? WHERE id = ?", (now, row_id))
+            self._bump("hits")
+            self._conn.commit()
+            return text
+
+    def put(self, key: str, text: str):
+        """Enregistre une nouvelle variante puis applique l'éviction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO generations (key, text, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, text, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def count(self, key: str) -> int:
+        """Nombre de variantes encore valides pour `key` (sans toucher aux compteurs)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM generations WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_s),
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        """Compteurs hits/misses et taille du cache (pour la barre admin)."""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+            entries, keys = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT key) FROM generations"
+            ).fetchone()
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "keys": keys,
+        }
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _bump(self, name: str):
+        self._conn.execute(
+            "INSERT INTO cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def _evict(self, now: float):
+        # 1) TTL : entrées trop anciennes
+        self._conn.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl_s,))
+        # 2) LRU : au-delà de max_entries, on retire les moins récemment servies
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM generations WHERE id IN ("
+                "SELECT id FROM generations ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
@@ -0,0 +1,94 @@
+"""Variantes redimensionnées des images du carrousel.
+
+Au démarrage, chaque image est redimensionnée à quelques largeurs et
+recompressée (WebP et JPEG) ; les octets restent en mémoire pour tout le
+processus. À l'affichage, on sert la plus petite variante qui couvre la
+largeur du conteneur, au lieu du fichier original.
+
+`st.image` ne transmet tels quels que les octets JPEG (ou PNG/GIF) : une
+variante WebP serait réencodée par Streamlit en JPEG qualité 90 à chaque
+affichage, plus lourde que la variante JPEG. Chaque variante garde donc
+aussi les octets réellement envoyés au navigateur (`sent`), calculés une
+fois ; c'est eux que l'application sert et que les rapports mesurent.
+"""
+import io
+import os
+from dataclasses import dataclass
+
+from PIL import Image
+
+WIDTHS = (480, 880)
+CONTAINER_PX = 880  # largeur max du bloc principal (voir le CSS global)
+ENCODERS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+PASSTHROUGH = {"jpeg"}  # formats que `st.image` envoie sans réencodage
+STREAMLIT_REENCODE = {"format": "JPEG", "quality": 90}  # ce que fait `st.image` des autres
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    width: int
+    height: int
+    fmt: str
+    data: bytes  # sortie de l'encodeur
+    sent: bytes  # octets transmis par `st.image` (= `data` pour un format accepté tel quel)
+
+    @property
+    def size(self) -> int:
+        """Octets envoyés au navigateur pour une vue."""
+        return len(self.sent)
+
+
+def _encode(img, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, **ENCODERS[fmt])
+    return buf.getvalue()
+
+
+def _sent(data: bytes, fmt: str) -> bytes:
+    """Octets que `st.image` transmettra pour `data` (même réencodage que Streamlit)."""
+    if fmt in PASSTHROUGH:
+        return data
+    buf = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        img.save(buf, **STREAMLIT_REENCODE)
+    return buf.getvalue()
+
+
+def build_variants(path, widths=WIDTHS, formats=tuple(ENCODERS)):
+    """Toutes les variantes d'une image, triées par largeur croissante."""
+    with Image.open(path) as src:
+        src = src.convert("RGB")
+        variants = []
+        for width in sorted(set(min(w, src.width) for w in widths)):
+            height = round(src.height * width / src.width)
+            img = src if width == src.width else src.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                data = _encode(img, fmt)
+                variants.append(ImageVariant(width, height, fmt, data, _sent(data, fmt)))
+    return variants
+
+
+class ImageAssets:
+    """Cache des variantes pour un ensemble de fichiers."""
+
+    def __init__(self, files, widths=WIDTHS, formats=tuple(ENCODERS)):
+        self.original_sizes = {f: os.path.getsize(f) for f in files}
+        self.variants = {f: build_variants(f, widths, formats) for f in files}
+
+    def best(self, file: str, container_px: int = CONTAINER_PX, fmt: str = "jpeg") -> ImageVariant:
+        """Plus petite variante d'au moins `container_px` de large (ou la plus large disponible)."""
+        candidates = [v for v in self.variants[file] if v.fmt == fmt]
+        for variant in candidates:
+            if variant.width >= container_px:
+                return variant
+        return candidates[-1]
+
+    def report(self, container_px: int = CONTAINER_PX, fmt: str = "jpeg"):
+        """[(fichier, octets originaux, octets envoyés par `st.image`)] pour une vue de chaque image."""
+        return [
+            (f, self.original_sizes[f], self.best(f, container_px, fmt).size)
+            for f in self.variants
+        ]
@@ -0,0 +1,213 @@
+"""Mesures de performance du processus : compteurs et histogrammes étiquetés.
+
+Un registre minimal, sans dépendance, au format d'exposition texte de
+Prometheus :
+- `inc(nom, valeur, **étiquettes)` pour les compteurs (générations, jetons, coût) ;
+- `observe(nom, secondes, **étiquettes)` pour les histogrammes (latence amont,
+  PDF, rerun, attente en file).
+
+Exports :
+- `start_http_exporter(port, host)` : `GET /metrics` servi par un thread de
+  fond, sur la boucle locale par défaut (les compteurs sont par enseignant) ;
+- `start_file_exporter(path)` : fichier réécrit périodiquement (collecteur
+  « textfile » de node_exporter, ou simple consultation).
+
+Les valeurs sont propres au processus, comme avec un client Prometheus
+classique : chaque réplica expose les siennes.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Mesures de la chaîne de génération, étiquetées par langue et activité
+PIPELINE = [
+    ("counter", "atelier_generations_total", "Générations servies, par origine (cache, regroupée, backend)"),
+    ("counter", "atelier_prompt_tokens_total", "Jetons du prompt (usage renvoyé par l'API)"),
+    ("counter", "atelier_completion_tokens_total", "Jetons générés (usage renvoyé par l'API)"),
+    ("counter", "atelier_cost_usd_total", "Coût estimé des appels, en dollars"),
+    ("counter", "atelier_truncated_total", "Textes coupés par max_tokens (après reprise éventuelle)"),
+    ("histogram", "atelier_upstream_ttft_seconds", "Délai avant le premier fragment du backend"),
+    ("histogram", "atelier_upstream_seconds", "Durée complète de l'appel au backend"),
+    ("histogram", "atelier_queue_wait_seconds", "Attente dans la file de génération"),
+    ("histogram", "atelier_pdf_seconds", "Construction du PDF"),
+    ("histogram", "atelier_rerun_seconds", "Exécution complète du script Streamlit"),
+]
+
+
+class Metrics:
+    """Registre thread-safe de compteurs et d'histogrammes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._defs = {}     # nom -> (type, aide, bornes)
+        self._values = {}   # (nom, étiquettes triées) -> float | [comptes par borne..., somme, nombre]
+        self.export_errors = []  # exports impossibles (port pris...), affichés dans l'admin
+
+    def counter(self, name: str, help: str):
+        self._defs[name] = ("counter", help, None)
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self._defs[name] = ("histogram", help, tuple(buckets))
+
+    # -------------------------
+    # Enregistrement
+    # -------------------------
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._defs[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            cell = self._values.get(key)
+            if cell is None:
+                cell = self._values[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            cell[bisect_left(buckets, value)] += 1  # dernière case : au-delà de la plus grande borne
+            cell[-2] += value
+            cell[-1] += 1
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    # -------------------------
+    # Lecture
+    # -------------------------
+    def series(self, name: str) -> list:
+        """[(étiquettes, valeur)] ; pour un histogramme, valeur = {"buckets", "sum", "count"}."""
+        buckets = self._defs[name][2]
+        with self._lock:
+            rows = [(dict(labels), value) for (n, labels), value in self._values.items() if n == name]
+        if buckets is None:
+            return rows
+        return [
+            (labels, {"buckets": list(zip(buckets + (float("inf"),), cell[:-2])), "sum": cell[-2], "count": cell[-1]})
+            for labels, cell in rows
+        ]
+
+    def histogram_counts(self, name: str, **labels) -> list:
+        """[(borne, nombre)] non cumulés, fusionnés sur les séries dont les étiquettes contiennent `labels`."""
+        merged = {}
+        for series_labels, value in self.series(name):
+            if all(series_labels.get(k) == v for k, v in labels.items()):
+                for bound, n in value["buckets"]:
+                    merged[bound] = merged.get(bound, 0) + n
+        return sorted(merged.items())
+
+    def quantile(self, name: str, q: float, **labels) -> float:
+        """Estimation d'un quantile par interpolation linéaire dans les bornes (comme `histogram_quantile`)."""
+        counts = self.histogram_counts(name, **labels)
+        total = sum(n for _, n in counts)
+        if not total:
+            return 0.0
+        rank, seen, lower = q * total, 0, 0.0
+        for bound, n in counts:
+            if n and seen + n >= rank:
+                if bound == float("inf"):
+                    return lower  # au-delà de la dernière borne : on ne sait pas mieux
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound if bound != float("inf") else lower
+        return lower
+
+    def total(self, name: str, **labels) -> float:
+        """Somme d'un compteur sur les séries dont les étiquettes contiennent `labels`."""
+        return sum(
+            value for series_labels, value in self.series(name)
+            if all(series_labels.get(k) == v for k, v in labels.items())
+        )
+
+    # -------------------------
+    # Export
+    # -------------------------
+    def render(self) -> str:
+        """Format d'exposition texte de Prometheus (version 0.0.4)."""
+        lines = []
+        for name, (kind, help, buckets) in self._defs.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(self.series(name), key=lambda row: sorted(row[0].items())):
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {value:g}")
+                    continue
+                cumulative = 0
+                for bound, n in value["buckets"]:
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {value['sum']:g}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Écrit l'exposition dans `path` (remplacement atomique)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+def make_metrics() -> Metrics:
+    """Registre avec les mesures de la chaîne de génération déclarées."""
+    metrics = Metrics()
+    for kind, name, help in PIPELINE:
+        getattr(metrics, kind)(name, help)
+    return metrics
+
+
+def start_http_exporter(metrics: Metrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sert `GET /metrics` dans un thread de fond ; `host="0.0.0.0"` l'ouvre sur toutes les interfaces."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("content-type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_file_exporter(metrics: Metrics, path, interval_s: float = 15.0) -> threading.Thread:
+    """Réécrit `path` toutes les `interval_s` secondes dans un thread de fond."""
+    def loop():
+        while True:
+            try:
+                metrics.write_textfile(path)
+            except OSError:
+                pass  # dossier indisponible : on réessaiera au prochain tour
+            time.sleep(interval_s)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
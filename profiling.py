@@ -0,0 +1,210 @@
+"""Profilage à la demande : traces de reruns par étapes imbriquées, cProfile en option.
+
+Un rerun tracé enregistre une étape (« span ») pour chaque section logique
+(CSS, en-tête, questions, résultat, journal, appel au backend, PDF...),
+avec son début et sa durée. Les étapes exécutées dans d'autres threads
+(workers de la file, variantes d'un pack) apparaissent sur leur propre
+ligne. À la fin, la trace est écrite au format Chrome (`trace_*.json`, à
+ouvrir dans chrome://tracing ou https://ui.perfetto.dev) et, si le rerun
+était profilé, les statistiques cProfile à côté (`trace_*.prof`, lisibles
+avec `pstats` ou snakeviz).
+
+Coût maîtrisé en production : seule une fraction `sample_rate` des reruns
+est tracée (0 par défaut) ; hors trace, une étape ne coûte qu'une lecture
+de variable de contexte. cProfile, bien plus coûteux, n'est activé que
+pour les reruns choisis (`profile=True`), un seul à la fois par processus.
+"""
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+_current = ContextVar("atelier_trace", default=None)
+
+
+class Trace:
+    """Étapes d'un rerun (ou d'une tâche de fond), en secondes depuis `t0`."""
+
+    def __init__(self, name: str, profile: bool = False, **args):
+        self.name = name
+        self.args = args
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.duration_s = None
+        self.path = None
+        self.profile_path = None
+        self.spans = []  # (nom, début, durée, thread, arguments)
+        self._lock = threading.Lock()
+        self._profiler = cProfile.Profile() if profile else None
+        self._stats = None
+
+    @property
+    def finished(self) -> bool:
+        return self.duration_s is not None
+
+    @property
+    def profiled(self) -> bool:
+        return self._profiler is not None
+
+    def add(self, name: str, start: float, end: float = None, **args):
+        """Ajoute une étape terminée ; `start` et `end` viennent de `time.perf_counter()`."""
+        end = time.perf_counter() if end is None else end
+        thread = threading.current_thread()
+        with self._lock:
+            self.spans.append((name, start - self.t0, end - start, (thread.ident, thread.name), args))
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, **args)
+
+    def hotspots(self, limit: int = 15) -> list:
+        """Fonctions les plus coûteuses (temps cumulé) : [(fonction, appels, propre (s), cumulé (s))]."""
+        if self._stats is None:
+            return []
+        rows = sorted(self._stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            (f"{Path(filename).name}:{line}({func})", calls, tottime, cumtime)
+            for (filename, line, func), (_, calls, tottime, cumtime, _) in rows[:limit]
+        ]
+
+    def chrome(self) -> dict:
+        """Trace au format « Trace Event » de Chrome (durées en microsecondes)."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        threads = {ident: name for _, _, _, (ident, name), _ in spans}
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+            for ident, name in threads.items()
+        ]
+        # Les étapes englobantes d'abord, pour un affichage correct des étapes de même début
+        for name, start, duration, (ident, _), args in sorted(spans, key=lambda s: (s[1], -s[2])):
+            events.append({
+                "name": name, "cat": self.name, "ph": "X", "pid": pid, "tid": ident,
+                "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1), "args": args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace": self.name, "started_at": self.started_at, **self.args},
+        }
+
+
+class Tracer:
+    """Échantillonnage, profilage et écriture des traces du processus."""
+
+    def __init__(self, directory="traces", sample_rate: float = 0.0, keep: int = 50):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._recent = deque(maxlen=keep)
+        self._profiling = threading.Lock()  # cProfile : un seul rerun profilé à la fois
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._counts = {"traced": 0, "profiled": 0, "dropped": 0}
+
+    def begin(self, name: str, force: bool = False, profile: bool = False, **args):
+        """Démarre une trace si ce rerun est échantillonné (ou `force`) et la rend courante ; sinon None."""
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            _current.set(None)
+            return None
+        if profile and not self._profiling.acquire(blocking=False):
+            profile = False  # un autre rerun est déjà profilé : étapes seules
+        trace = Trace(name, profile=profile, **args)
+        _current.set(trace)
+        if trace.profiled:
+            trace._profiler.enable()
+        return trace
+
+    def finish(self, trace: Trace):
+        """Termine la trace, l'écrit sur disque et la garde parmi les récentes."""
+        if trace is None or trace.finished:
+            return
+        self._stop(trace)
+        trace.duration_s = time.perf_counter() - trace.t0
+        with self._lock:
+            stem = f"trace_{time.strftime('%Y%m%d_%H%M%S', time.localtime(trace.started_at))}_{next(self._ids)}"
+            self._counts["traced"] += 1
+            self._counts["profiled"] += trace.profiled
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{stem}.json"
+            path.write_text(json.dumps(trace.chrome(), ensure_ascii=False), encoding="utf-8")
+            trace.path = path
+            if trace._stats is not None:
+                trace.profile_path = self.directory / f"{stem}.prof"
+                trace._stats.dump_stats(trace.profile_path)
+        except OSError:
+            pass  # dossier indisponible : la trace reste consultable en mémoire
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._remove_files(self._recent[0])
+            self._recent.append(trace)
+
+    def discard(self, trace: Trace):
+        """Abandonne une trace inachevée (rerun interrompu par `st.stop` ou `st.rerun`)."""
+        if trace is None or trace.finished:
+            return
+        self._stop(trace)
+        trace.duration_s = time.perf_counter() - trace.t0
+        with self._lock:
+            self._counts["dropped"] += 1
+
+    def recent(self) -> list:
+        """Traces terminées, la plus récente d'abord."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sample_rate": self.sample_rate, "kept": len(self._recent), **self._counts}
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _stop(self, trace: Trace):
+        if trace.profiled and trace._stats is None:
+            trace._profiler.disable()
+            self._profiling.release()
+            trace._stats = pstats.Stats(trace._profiler, stream=io.StringIO())
+        if _current.get() is trace:
+            _current.set(None)
+
+    @staticmethod
+    def _remove_files(trace: Trace):
+        for path in (trace.path, trace.profile_path):
+            if path is not None:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def current_trace():
+    """Trace en cours dans ce contexte d'exécution, ou None."""
+    trace = _current.get()
+    return trace if trace is not None and not trace.finished else None
+
+
+@contextmanager
+def span(name: str, **args):
+    """Étape de la trace courante ; ne fait rien hors trace."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **args):
+        yield
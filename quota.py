@@ -0,0 +1,196 @@
+"""Quotas d'utilisation partagés entre sessions.
+
+Deux niveaux, vérifiés en O(1) avant tout appel OpenAI :
+- par utilisateur : nombre d'essais par fenêtre (fenêtre fixe, ou illimitée
+  dans le temps comme les 5 essais gratuits), avec plafonds optionnels par
+  activité ; les compteurs vivent dans le magasin d'état (`state_store`),
+  partagé par tous les réplicas, et sont incrémentés atomiquement : un
+  essai réservé au-delà de la limite est aussitôt rendu ;
+- global : un seau à jetons (débit + rafale) qui protège le budget OpenAI
+  quand beaucoup de classes génèrent en même temps. Il reste propre à chaque
+  processus : avec N réplicas, le débit total autorisé est N fois le réglage.
+
+Une demande coûte un essai et un jeton par appel au backend. Les packs
+classe (un texte par élève) ont leur propre compteur, `pack_limit` textes
+par fenêtre, distinct des essais individuels : un pack de N textes en
+réserve N d'un coup, et N jetons (au-delà de la rafale, le seau s'endette).
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+ALL = "*"  # compteur « toutes activités » d'un utilisateur
+PACK = "+pack"  # compteur des textes générés en pack classe
+MIGRATED_KEY = "quota:migrated"
+
+
+def parse_activity_limits(spec: str) -> dict:
+    """"Chanson=3,Saynette=2" -> {"Chanson": 3, "Saynette": 2}."""
+    limits = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par seconde, au plus `burst` en réserve."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill(time.monotonic())
+        return self.tokens
+
+    def take(self, n: int = 1) -> bool:
+        """Prend `n` jetons ; au-delà de la rafale, la réserve passe en négatif (dette à rembourser)."""
+        self._refill(time.monotonic())
+        if self.tokens >= min(n, self.burst):
+            self.tokens -= n
+            return True
+        return False
+
+
+@dataclass
+class QuotaDecision:
+    allowed: bool
+    reason: str = ""  # "user", "activity", "pack" ou "global" si refusé
+    used: int = 0
+
+
+class QuotaService:
+    """Compteurs par utilisateur (magasin d'état partagé) + seau à jetons global (mémoire)."""
+
+    def __init__(self, store, user_limit: int = 5, window_s: float = 0,
+                 activity_limits: dict = None, global_rate_per_min: float = 60, global_burst: int = 10,
+                 pack_limit: int = 50):
+        self.store = store
+        self.user_limit = user_limit
+        self.pack_limit = pack_limit  # textes en pack classe par fenêtre
+        self.window_s = window_s  # 0 = pas de remise à zéro
+        self.activity_limits = activity_limits or {}
+        self.bucket = TokenBucket(global_rate_per_min / 60, global_burst)
+        self._lock = threading.Lock()  # seau à jetons
+
+    # -------------------------
+    # API
+    # -------------------------
+    def try_acquire(self, user_id: str, activity: str, cost: int = 1) -> QuotaDecision:
+        """Consomme `cost` essais (un par appel au backend) si les limites utilisateur, activité et globale le permettent."""
+        window = self._window_start()
+        ttl = self.window_s or None
+        total_key, activity_key = self._key(window, ALL, user_id), self._key(window, activity, user_id)
+        used = self.store.incr(total_key, cost, ttl)
+        if used > self.user_limit:
+            self.store.incr(total_key, -cost)
+            return QuotaDecision(False, "user", used - cost)
+        act_used = self.store.incr(activity_key, cost, ttl)
+        act_limit = self.activity_limits.get(activity)
+        if act_limit is not None and act_used > act_limit:
+            self._release(cost, total_key, activity_key)
+            return QuotaDecision(False, "activity", used - cost)
+        with self._lock:
+            allowed = self.bucket.take(cost)
+        if not allowed:
+            self._release(cost, total_key, activity_key)
+            return QuotaDecision(False, "global", used - cost)
+        return QuotaDecision(True, used=used)
+
+    def try_acquire_pack(self, user_id: str, n: int) -> QuotaDecision:
+        """Réserve `n` textes de pack classe (compteur des packs, pas les essais individuels) et `n` jetons."""
+        pack_key = self._key(self._window_start(), PACK, user_id)
+        used = self.store.incr(pack_key, n, self.window_s or None)
+        if used > self.pack_limit:
+            self.store.incr(pack_key, -n)
+            return QuotaDecision(False, "pack", used - n)
+        with self._lock:
+            allowed = self.bucket.take(n)
+        if not allowed:
+            self.store.incr(pack_key, -n)
+            return QuotaDecision(False, "global", used - n)
+        return QuotaDecision(True, used=used)
+
+    def refund_pack(self, user_id: str, n: int):
+        """Rend des textes de pack réservés mais non générés."""
+        self.store.incr(self._key(self._window_start(), PACK, user_id), -n)
+
+    def remaining_pack(self, user_id: str) -> int:
+        """Textes de pack classe restants pour l'utilisateur."""
+        return max(0, self.pack_limit - self.store.get(self._key(self._window_start(), PACK, user_id), 0))
+
+    def refund(self, user_id: str, activity: str, cost: int = 1):
+        """Rend des essais accordés mais non utilisés (demande refusée par la file de génération)."""
+        window = self._window_start()
+        self._release(cost, self._key(window, ALL, user_id), self._key(window, activity, user_id))
+
+    def remaining(self, user_id: str, activity: str = None) -> int:
+        """Essais restants pour l'utilisateur (et l'activité, si plafonnée)."""
+        window = self._window_start()
+        left = self.user_limit - self.store.get(self._key(window, ALL, user_id), 0)
+        act_limit = self.activity_limits.get(activity)
+        if act_limit is not None:
+            left = min(left, act_limit - self.store.get(self._key(window, activity, user_id), 0))
+        return max(0, left)
+
+    def snapshot(self) -> dict:
+        """Consommation courante, pour la barre admin."""
+        prefix = self._key(self._window_start(), ALL, "")
+        per_user = sorted(
+            ((key[len(prefix):], used) for key, used in self.store.items(prefix) if used > 0),
+            key=lambda row: -row[1],
+        )
+        with self._lock:
+            tokens = self.bucket.available()
+        return {
+            "global_tokens": tokens,
+            "global_burst": self.bucket.burst,
+            "users": len(per_user),
+            "exhausted": sum(1 for _, used in per_user if used >= self.user_limit),
+            "per_user": per_user,
+        }
+
+    def import_legacy(self, path) -> int:
+        """Reprend une seule fois les compteurs de l'ancienne table `quota_usage` (quota.db)."""
+        if self.store.get(MIGRATED_KEY) or not Path(path).exists():
+            return 0
+        # Réservation atomique : avec plusieurs réplicas qui démarrent ensemble, un seul importe
+        if self.store.incr(MIGRATED_KEY) != 1:
+            return 0
+        conn = sqlite3.connect(str(path))
+        try:
+            rows = conn.execute("SELECT user_id, activity, window_start, used FROM quota_usage").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        for user_id, activity, window_start, used in rows:
+            self.store.incr(self._key(window_start, activity, user_id), used, self.window_s or None)
+        return len(rows)
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _window_start(self) -> float:
+        if not self.window_s:
+            return 0.0
+        return time.time() // self.window_s * self.window_s
+
+    @staticmethod
+    def _key(window: float, activity: str, user_id: str) -> str:
+        # Identifiant utilisateur en dernier : il peut contenir des « : »
+        return f"quota:{int(window)}:{activity}:{user_id}"
+
+    def _release(self, cost: int, *keys):
+        for key in keys:
+            self.store.incr(key, -cost)
@@ -0,0 +1,226 @@
+"""File de génération équitable, exécutée en arrière-plan.
+
+Un clic sur « Générer » ne lance plus l'appel au backend dans le thread du
+script Streamlit : il dépose une tâche dans une file servie par un nombre
+borné de workers (au plus `workers` appels simultanés par processus). Le
+service est équitable : tourniquet entre classes (groupes), puis entre
+utilisateurs d'une même classe, si bien qu'une classe entière qui clique en
+même temps ne bloque pas les autres enseignants.
+
+Un pack classe passe par la même file (`map`) : une tâche par variante,
+admises ensemble comme une seule demande.
+
+Contrôle d'admission : au-delà de `max_backlog` tâches en attente, ou de
+`max_per_user` demandes non terminées pour un même utilisateur, la demande
+est refusée (`AdmissionError`) plutôt que d'allonger indéfiniment l'attente.
+Sinon elle est différée dans la file et sa position est consultable
+(`position`). Le texte partiel (`Job.text`) et le résultat restent sur la
+tâche : la session les retrouve quand elle veut, même si l'utilisateur est
+passé à une autre question entre-temps.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class AdmissionError(Exception):
+    """Demande refusée par la file ; `reason` vaut "backlog" ou "user"."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def group_of(user_id: str) -> str:
+    """Classe (groupe d'équité) d'un utilisateur : domaine de l'adresse e-mail, sinon l'utilisateur lui-même."""
+    return user_id.rsplit("@", 1)[1].lower() if "@" in user_id else user_id
+
+
+@dataclass
+class Job:
+    id: int
+    user_id: str
+    group: str
+    fn: object                # fn(job) -> résultat, exécutée par un worker
+    request: int = 0          # demande d'origine (les variantes d'un pack partagent la leur)
+    status: str = QUEUED
+    text: str = ""            # texte partiel, alimenté par `publish`
+    result: object = None
+    error: str = ""
+    exception: Exception = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float = None
+    finished_at: float = None
+
+    def publish(self, delta: str):
+        """Ajoute un fragment au texte partiel (appelé depuis le worker)."""
+        self.text += delta
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def wait_s(self) -> float:
+        return (self.started_at or time.monotonic()) - self.submitted_at
+
+
+class GenerationScheduler:
+    """File équitable (classe, puis utilisateur) servie par un pool de workers borné."""
+
+    def __init__(self, workers: int = 4, max_backlog: int = 50, max_per_user: int = 2, keep_s: float = 600):
+        self.workers = max(1, workers)
+        self.max_backlog = max_backlog
+        self.max_per_user = max_per_user
+        self.keep_s = keep_s  # durée de conservation des tâches terminées
+        self._groups = OrderedDict()  # classe -> OrderedDict(utilisateur -> deque de tâches)
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._counts = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0}
+        self._waits = deque(maxlen=200)  # dernières attentes en file (s)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"generation-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # -------------------------
+    # API
+    # -------------------------
+    def submit(self, user_id: str, fn, group: str = None) -> Job:
+        """Dépose une tâche ; lève `AdmissionError` si la file ou l'utilisateur sont au plafond."""
+        return self.submit_many(user_id, [fn], group)[0]
+
+    def submit_many(self, user_id: str, fns, group: str = None) -> list:
+        """Dépose plusieurs tâches formant une seule demande (toutes admises, ou aucune)."""
+        fns = list(fns)
+        with self._cond:
+            self._prune()
+            queued = self._queued()
+            if queued + len(fns) > self.max_backlog:
+                self._counts["rejected"] += 1
+                raise AdmissionError("backlog", f"file de génération pleine ({queued} demandes en attente)")
+            pending = len({job.request for job in self._jobs.values() if job.user_id == user_id and not job.finished})
+            if pending >= self.max_per_user:
+                self._counts["rejected"] += 1
+                raise AdmissionError("user", f"{pending} génération(s) déjà en cours pour cet utilisateur")
+            group = group or group_of(user_id)
+            users = self._groups.setdefault(group, OrderedDict())
+            jobs = []
+            for fn in fns:
+                job = Job(next(self._ids), user_id, group, fn)
+                job.request = jobs[0].id if jobs else job.id
+                self._jobs[job.id] = job
+                users.setdefault(user_id, deque()).append(job)
+                jobs.append(job)
+            self._counts["submitted"] += len(jobs)
+            self._cond.notify(len(jobs))
+        return jobs
+
+    def map(self, user_id: str, fns, group: str = None) -> list:
+        """Exécute `fn()` pour chaque fonction via la file et renvoie les résultats dans l'ordre.
+
+        Bloquant : pour un pack classe, dont les variantes passent ainsi par les
+        mêmes workers (et le même contrôle d'admission) que les générations simples.
+        La première erreur d'une tâche est relevée une fois toutes terminées.
+        """
+        jobs = self.submit_many(user_id, [lambda job, fn=fn: fn() for fn in fns], group)
+        with self._cond:
+            self._cond.wait_for(lambda: all(job.finished for job in jobs))
+        for job in jobs:
+            if job.exception is not None:
+                raise job.exception
+        return [job.result for job in jobs]
+
+    def get(self, job_id: int):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: int) -> int:
+        """Rang de la tâche dans l'ordre de service (1 = la prochaine), 0 si elle n'attend plus."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return 0
+            # Rejoue le tourniquet sur une copie de la file
+            groups = deque(deque(deque(jobs) for jobs in users.values()) for users in self._groups.values())
+            rank = 0
+            while groups:
+                users = groups.popleft()
+                jobs = users.popleft()
+                rank += 1
+                if jobs.popleft() is job:
+                    return rank
+                if jobs:
+                    users.append(jobs)
+                if users:
+                    groups.append(users)
+            return 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            waits = sorted(self._waits)
+            return {
+                "queued": self._queued(),
+                "running": running,
+                "workers": self.workers,
+                "groups": len(self._groups),
+                "wait_p50_s": waits[len(waits) // 2] if waits else 0.0,
+                "wait_max_s": waits[-1] if waits else 0.0,
+                **self._counts,
+            }
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _queued(self) -> int:
+        return sum(len(jobs) for users in self._groups.values() for jobs in users.values())
+
+    def _next(self) -> Job:
+        # Tourniquet : première classe, premier utilisateur, puis chacun repasse en fin de file
+        group, users = next(iter(self._groups.items()))
+        user_id, jobs = next(iter(users.items()))
+        job = jobs.popleft()
+        if jobs:
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        if users:
+            self._groups.move_to_end(group)
+        else:
+            del self._groups[group]
+        return job
+
+    def _prune(self):
+        limit = time.monotonic() - self.keep_s
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < limit]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._groups:
+                    self._cond.wait()
+                job = self._next()
+                job.status = RUNNING
+                job.started_at = time.monotonic()
+                self._waits.append(job.wait_s)
+            try:
+                job.result = job.fn(job)
+                status = DONE
+            except Exception as e:  # l'erreur est rendue à la session, le worker continue
+                job.error = str(e) or type(e).__name__
+                job.exception = e
+                status = FAILED
+            with self._cond:
+                job.status = status
+                job.finished_at = time.monotonic()
+                self._counts[status] += 1
+                self._cond.notify_all()  # réveille `map` (les workers sans tâche se rendorment)
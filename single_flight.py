@@ -0,0 +1,147 @@
+"""Regroupement des générations identiques en cours (« single flight »).
+
+Quand un enseignant projette l'application et que vingt élèves valident les
+mêmes suggestions en quelques secondes, un seul appel part vers le backend :
+les demandes identiques arrivées pendant qu'il est en cours s'y
+raccrochent. Elles relisent les fragments déjà reçus puis suivent le flux
+jusqu'à la fin, ou reçoivent la même erreur. La table est propre au
+processus, et chaque session consomme toujours son propre essai de quota.
+
+La clé est le prompt normalisé : espaces et casse des messages sont ignorés.
+"""
+import hashlib
+import json
+import threading
+
+
+def flight_key(messages, model: str, temperature: float, max_tokens: int) -> str:
+    """Empreinte du prompt normalisé (espaces multiples et majuscules ignorés) et des paramètres."""
+    normalized = [
+        {**m, "content": " ".join(str(m.get("content", "")).split()).casefold()}
+        for m in messages
+    ]
+    payload = json.dumps(
+        {"messages": normalized, "model": model, "temperature": temperature, "max_tokens": max_tokens},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """Un appel en cours : fragments reçus, fin, erreur éventuelle."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Table des appels en cours, partagée par toutes les sessions du processus."""
+
+    def __init__(self, wait_timeout_s: float = 120.0):
+        self.wait_timeout_s = wait_timeout_s
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._coalesced = 0
+
+    def stream(self, key: str, start) -> "FlightStream":
+        """Fragments de la génération `key`.
+
+        Si aucun appel identique n'est en cours, `start()` (qui renvoie un
+        itérateur de fragments) est appelé et le flux est leader ; sinon il
+        suit l'appel déjà lancé. Seul le leader doit enregistrer le résultat
+        (cache, etc.).
+        """
+        return FlightStream(self, key, start)
+
+    def do(self, key: str, fn):
+        """Variante bloquante : (résultat de `fn()`, leader).
+
+        Les suiveurs reçoivent l'objet renvoyé au leader tel quel (par exemple
+        le couple (texte, tronqué)), pas seulement son texte.
+        """
+        flight = self.stream(key, lambda: iter([fn()]))
+        [result] = flight
+        return result, flight.leader
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"issued": self._issued, "coalesced": self._coalesced, "in_flight": len(self._flights)}
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _join(self, key: str, start):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._issued += 1
+                return self._lead(key, flight, start), True
+            self._coalesced += 1
+        return self._follow(flight), False
+
+    def _lead(self, key: str, flight: _Flight, start):
+        try:
+            for delta in start():
+                with flight.cond:
+                    flight.chunks.append(delta)
+                    flight.cond.notify_all()
+                yield delta
+        except BaseException as e:
+            # GeneratorExit compris (session interrompue) : les suiveurs ne doivent pas attendre
+            flight.error = e if isinstance(e, Exception) else RuntimeError("génération interrompue")
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def _follow(self, flight: _Flight):
+        sent = 0
+        while True:
+            with flight.cond:
+                if sent == len(flight.chunks) and not flight.done:
+                    if not flight.cond.wait(self.wait_timeout_s):
+                        raise TimeoutError("la génération partagée n'a pas répondu à temps")
+                chunks = flight.chunks[sent:]
+                done, error = flight.done, flight.error
+            for delta in chunks:
+                yield delta
+            sent += len(chunks)
+            if done and sent == len(flight.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class FlightStream:
+    """Itérateur de fragments ; la table n'est consultée qu'au premier fragment demandé.
+
+    `leader` vaut None avant, puis True (appel lancé) ou False (appel rejoint).
+    """
+
+    def __init__(self, owner: SingleFlight, key: str, start):
+        self._owner = owner
+        self._key = key
+        self._start = start
+        self._deltas = None
+        self.leader = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._deltas is None:
+            self._deltas, self.leader = self._owner._join(self._key, self._start)
+        return next(self._deltas)
+
+    def close(self):
+        if self._deltas is not None:
+            self._deltas.close()
@@ -0,0 +1,193 @@
+"""État partagé entre les réplicas de l'application.
+
+Tout ce qui doit suivre un utilisateur d'un processus à l'autre (compteurs
+de quota, langue et activité choisies) passe par un petit magasin
+clé -> valeur JSON, interchangeable :
+- `MemoryStateStore` : dictionnaire du processus (un seul worker) ;
+- `SQLiteStateStore` : fichier partagé par plusieurs processus d'une même
+  machine ; une seule machine : des réplicas sur des hôtes différents
+  auraient chacun leur fichier, donc leurs propres quotas et préférences
+  (un fichier SQLite sur un partage réseau n'est pas une solution : ses
+  verrous n'y sont pas fiables) ;
+- `RedisStateStore` : serveur Redis (ou compatible), seul choix cohérent
+  pour plusieurs machines.
+
+Les opérations sont atomiques une à une ; `incr` sert aux compteurs
+consultés et modifiés par plusieurs workers à la fois.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value,
+    expires_at REAL
+);
+"""
+
+
+class MemoryStateStore:
+    """Dictionnaire en mémoire, protégé par un verrou."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or _expired(entry[1]):
+                return default
+            return entry[0]
+
+    def set(self, key: str, value, ttl_s: float = None):
+        with self._lock:
+            self._data[key] = (value, _expiry(ttl_s))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl_s: float = None) -> int:
+        """Ajoute `amount` au compteur (créé à 0) et renvoie la nouvelle valeur."""
+        with self._lock:
+            entry = self._data.get(key)
+            value = (0 if entry is None or _expired(entry[1]) else entry[0]) + amount
+            expires_at = entry[1] if entry is not None and not _expired(entry[1]) else _expiry(ttl_s)
+            self._data[key] = (value, expires_at)
+            return value
+
+    def items(self, prefix: str) -> list:
+        with self._lock:
+            return [(k, v) for k, (v, exp) in self._data.items() if k.startswith(prefix) and not _expired(exp)]
+
+
+class SQLiteStateStore:
+    """Table clé -> valeur dans un fichier SQLite (WAL), partageable entre processus d'une même machine."""
+
+    def __init__(self, path="state.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(Path(path)), check_same_thread=False, timeout=30, isolation_level=None)
+        # Plusieurs workers peuvent ouvrir le fichier au même moment : le passage
+        # en WAL n'attend pas toujours le verrou, on réessaie brièvement.
+        for attempt in range(50):
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                break
+            except sqlite3.OperationalError:
+                if attempt == 49:
+                    raise
+                time.sleep(0.1)
+        self._conn.executescript(SCHEMA)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return default if row is None else _decode(row[0])
+
+    def set(self, key: str, value, ttl_s: float = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, json.dumps(value, ensure_ascii=False), _expiry(ttl_s)),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl_s: float = None) -> int:
+        """Ajoute `amount` au compteur (créé à 0) et renvoie la nouvelle valeur.
+
+        Une seule instruction UPSERT ... RETURNING : atomique même quand
+        plusieurs processus incrémentent la même clé.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "  value = CASE WHEN expires_at IS NOT NULL AND expires_at <= ? THEN ? "
+                "               ELSE CAST(value AS INTEGER) + ? END, "
+                "  expires_at = CASE WHEN expires_at IS NOT NULL AND expires_at <= ? THEN excluded.expires_at "
+                "                    ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, _expiry(ttl_s), now, amount, amount, now),
+            ).fetchone()
+        return int(row[0])
+
+    def items(self, prefix: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM state WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+                (prefix, prefix + "\uffff", time.time()),
+            ).fetchall()
+        return [(k, _decode(v)) for k, v in rows]
+
+
+class RedisStateStore:
+    """Serveur Redis ou compatible (`redis` doit être installé)."""
+
+    def __init__(self, url="redis://localhost:6379/0", namespace="atelier:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("ATELIER_STATE_BACKEND=redis nécessite le paquet `redis` (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def get(self, key: str, default=None):
+        raw = self._redis.get(self.namespace + key)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value, ttl_s: float = None):
+        self._redis.set(self.namespace + key, json.dumps(value, ensure_ascii=False),
+                        px=int(ttl_s * 1000) if ttl_s else None)
+
+    def delete(self, key: str):
+        self._redis.delete(self.namespace + key)
+
+    def incr(self, key: str, amount: int = 1, ttl_s: float = None) -> int:
+        pipe = self._redis.pipeline()
+        pipe.incrby(self.namespace + key, amount)
+        if ttl_s:
+            pipe.pexpire(self.namespace + key, int(ttl_s * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+    def items(self, prefix: str) -> list:
+        keys = list(self._redis.scan_iter(match=self.namespace + prefix + "*", count=500))
+        values = self._redis.mget(keys) if keys else []
+        start = len(self.namespace)
+        return [(k.decode()[start:], json.loads(v)) for k, v in zip(keys, values) if v is not None]
+
+
+def make_state_store(kind: str = "memory", path: str = "state.db", url: str = None):
+    """Magasin d'état selon `kind` : memory | sqlite | redis."""
+    if kind == "memory":
+        return MemoryStateStore()
+    if kind == "sqlite":
+        return SQLiteStateStore(path)
+    if kind == "redis":
+        return RedisStateStore(url or "redis://localhost:6379/0")
+    raise ValueError(f"Magasin d'état inconnu : {kind} (attendu : memory, sqlite ou redis)")
+
+
+def _expiry(ttl_s):
+    return time.time() + ttl_s if ttl_s else None
+
+
+def _expired(expires_at) -> bool:
+    return expires_at is not None and expires_at <= time.time()
+
+
+def _decode(raw):
+    # Les compteurs (`incr`) sont stockés en entier SQLite, le reste en JSON
+    return raw if isinstance(raw, (int, float)) else json.loads(raw)
@@ -1,13 +1,25 @@
 import streamlit as st
-from openai import OpenAI
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-import tempfile
-from datetime import datetime
-import os, csv
+import os, time, json, logging
+from contextlib import contextmanager
 import pandas as pd
-from pathlib import Path
+from generation_cache import GenerationCache, make_key
+from single_flight import SingleFlight, flight_key
+from warm_pool import pool_key
+from scheduler import AdmissionError, GenerationScheduler
+from metrics import make_metrics, start_file_exporter, start_http_exporter
+from profiling import Tracer, current_trace, span as trace_span
+from usage_store import UsageLogWriter, UsageStore
+from quota import QuotaService, parse_activity_limits
+from state_store import make_state_store
+from creation_store import CreationStore
+from atelier_core.pdf_export import render_booklet, render_pdf
+from class_pack import generate_variants
+from catalog import load_catalog
+from image_assets import ImageAssets
+from atelier_core.generation import generate_complete
+from atelier_core.llm_backend import make_backend
+from atelier_core.llm_client import CircuitOpenError
+from atelier_core.prompts import build_request, variant_params
 
 # =========================
 # CONFIG APP
@@ -19,9 +31,74 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# =========================
+# CHRONOMÉTRAGE DES SECTIONS
+# =========================
+# Traces par étapes (JSON au format Chrome) : une fraction ATELIER_TRACE_SAMPLE des reruns,
+# plus ceux demandés pour une session depuis le panneau admin (avec cProfile)
+@st.cache_resource
+def get_tracer():
+    return Tracer(
+        os.environ.get("ATELIER_TRACE_DIR", "traces"),
+        sample_rate=float(os.environ.get("ATELIER_TRACE_SAMPLE", "0")),
+        keep=int(os.environ.get("ATELIER_TRACE_KEEP", "50")),
+    )
+
+tracer = get_tracer()
+
+def begin_trace(name: str):
+    """Trace de ce rerun si il est échantillonné ou demandé pour la session, sinon None."""
+    tracer.discard(st.session_state.pop("rerun_trace", None))  # rerun précédent interrompu (st.stop, st.rerun)
+    forced = st.session_state.get("profile_reruns", 0) > 0
+    if forced:
+        st.session_state.profile_reruns -= 1
+    trace = tracer.begin(name, force=forced, profile=forced and st.session_state.get("profile_cprofile", True))
+    if trace is not None:
+        st.session_state.rerun_trace = trace
+    return trace
+
+def end_trace(trace):
+    if trace is not None:
+        st.session_state.pop("rerun_trace", None)
+        tracer.finish(trace)
+
+FULL_RERUN = True  # remis à False en fin de script : les fragments relancés seuls le voient
+rerun_trace = begin_trace("rerun")
+RERUN_T0 = time.perf_counter()
+if "show_timings" not in st.session_state:
+    st.session_state.show_timings = os.environ.get("ATELIER_TIMINGS", "0") == "1"
+
+def record_timing(section: str, t0: float):
+    """Mémorise la durée (ms) d'une section pour la superposition de chronométrage (et la trace en cours)."""
+    st.session_state.setdefault("timings", {})[section] = (time.perf_counter() - t0) * 1000
+    trace = current_trace()
+    if trace is not None:
+        trace.add(section, t0)
+
+@contextmanager
+def timed(section: str):
+    t0 = time.perf_counter()
+    # Rerun d'un fragment seul : il a sa propre trace (échantillonnée comme un rerun complet)
+    own_trace = None if FULL_RERUN else begin_trace(f"fragment {section}")
+    try:
+        yield
+    finally:
+        record_timing(section, t0)
+        end_trace(own_trace)
+
+@st.fragment(run_every=1)
+def timing_overlay():
+    """Encart fixe rafraîchi chaque seconde : il reflète aussi les reruns de fragments."""
+    rows = "".join(
+        f"<div>{name} : <b>{ms:.1f} ms</b></div>"
+        for name, ms in st.session_state.get("timings", {}).items()
+    )
+    st.markdown(f"<div class='timing-overlay'>⏱️ {rows}</div>", unsafe_allow_html=True)
+
 # =========================
 # CSS GLOBAL
 # =========================
+section_t0 = time.perf_counter()
 st.markdown(
     """
     <style>
@@ -72,165 +149,103 @@ st.markdown(
         color: #666 !important;
         opacity: 1 !important;
     }
+    .timing-overlay {
+        position: fixed;
+        right: 12px;
+        bottom: 12px;
+        z-index: 1000;
+        background: rgba(0,0,0,0.75);
+        color: #ffffff;
+        border-radius: 8px;
+        padding: 6px 10px;
+        font-size: 12px;
+        line-height: 1.4em;
+    }
     </style>
     """,
     unsafe_allow_html=True
 )
+record_timing("css", section_t0)
 
 # =========================
 # OPENAI
 # =========================
+# Backend de génération : API OpenAI, ou bouchon local pour les mesures (ATELIER_LLM_BACKEND=stub)
+LLM_BACKEND = os.environ.get("ATELIER_LLM_BACKEND", "openai")
 api_key = os.environ.get("OPENAI_API_KEY")
-if not api_key:
+if LLM_BACKEND == "openai" and not api_key:
     st.error("⚠️ Aucune clé API trouvée. Ajoutez OPENAI_API_KEY dans les Secrets Streamlit Cloud.")
     st.stop()
-client = OpenAI(api_key=api_key)
+
+# Backend partagé par toutes les sessions (pour OpenAI : connexions persistantes, reprises, disjoncteur)
+@st.cache_resource
+def get_llm_backend():
+    return make_backend(api_key, LLM_BACKEND)
+
+llm = get_llm_backend()
+
+# Mesures (latences, jetons, coût) du processus : export Prometheus en HTTP
+# (ATELIER_METRICS_PORT, sur ATELIER_METRICS_HOST : boucle locale par défaut, les
+# compteurs étant par enseignant) et/ou en fichier texte (ATELIER_METRICS_FILE)
+@st.cache_resource
+def get_metrics():
+    registry = make_metrics()
+    port = os.environ.get("ATELIER_METRICS_PORT")
+    if port:
+        try:
+            start_http_exporter(registry, int(port), os.environ.get("ATELIER_METRICS_HOST", "127.0.0.1"))
+        except OSError as e:  # port déjà pris (autre worker sur la même machine) : l'export fichier reste possible
+            registry.export_errors.append(f"Export des mesures sur le port {port} impossible : {e}")
+            logging.getLogger(__name__).warning(registry.export_errors[-1])
+    if os.environ.get("ATELIER_METRICS_FILE"):
+        start_file_exporter(registry, os.environ["ATELIER_METRICS_FILE"],
+                            float(os.environ.get("ATELIER_METRICS_INTERVAL_S", "15")))
+    return registry
+
+metrics = get_metrics()
+# Prix en dollars par million de jetons : "entrée,sortie" (gpt-4o-mini par défaut)
+PRICE_IN, PRICE_OUT = (float(p) for p in os.environ.get("ATELIER_PRICE_PER_1M", "0.15,0.60").split(","))
+
+def usage_recorder(lang: str, activity: str):
+    """Callback `on_usage` du backend : jetons et coût, par langue et activité."""
+    def record(prompt_tokens: int, completion_tokens: int):
+        metrics.inc("atelier_prompt_tokens_total", prompt_tokens, lang=lang, activity=activity)
+        metrics.inc("atelier_completion_tokens_total", completion_tokens, lang=lang, activity=activity)
+        cost = (prompt_tokens * PRICE_IN + completion_tokens * PRICE_OUT) / 1e6
+        metrics.inc("atelier_cost_usd_total", cost, lang=lang, activity=activity)
+    return record
+
+# Cache des générations, partagé par toutes les sessions du processus
+@st.cache_resource
+def get_generation_cache():
+    return GenerationCache(
+        os.environ.get("ATELIER_CACHE_PATH", "generations.db"),
+        ttl_s=float(os.environ.get("ATELIER_CACHE_TTL_H", "168")) * 3600,
+        max_entries=int(os.environ.get("ATELIER_CACHE_MAX", "5000")),
+        variants=int(os.environ.get("ATELIER_CACHE_VARIANTS", "3")),
+    )
+
+gen_cache = get_generation_cache()
+
+# Générations identiques simultanées (même prompt normalisé) : un seul appel au backend
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight(wait_timeout_s=float(os.environ.get("ATELIER_COALESCE_TIMEOUT_S", "120")))
+
+in_flight = get_single_flight()
+
+# Mode streaming : le texte partiel s'affiche pendant la génération (ATELIER_STREAMING=0 pour désactiver)
+STREAMING = os.environ.get("ATELIER_STREAMING", "1") != "0"
 
 # =========================
-# LABELS UI
+# CATALOGUE (libellés + questions), chargé et validé une fois par processus
 # =========================
-LABELS = {
-    "FR": {
-        "title": "🎨 Atelier Créatif — EDU",
-        "subtitle": "Créez facilement des histoires, poèmes, chansons ou saynettes pour vos élèves (6–14 ans).",
-        "choose_lang": "🌍 Choisissez la langue et l’activité",
-        "author": "✍️ Auteur",
-        "author_name": "Nom de l’auteur :",
-        "answer": "📝 Répondez aux questions",
-        "hint": "💡 Utilisez les suggestions en cliquant dessus ou ajoutez votre idée.",
-        "generate": "🪄 Générer le texte",
-        "pdf_dl": "⬇️ Télécharger en PDF",
-        "carousel_prompt": "Sélectionne une image",
-        "tagline": "✨ Crée une histoire magique avec tes élèves",
-        "result_title": "✨ Voici votre création :",
-        "need_answers": "⚠️ Veuillez répondre à au moins une question.",
-        "writing": "⏳ Veuillez patienter, votre œuvre est en construction...",
-        "tries_left": "Il vous reste {n} essai(s) sur 5.",
-        "secure_api": "💡 Votre clé OpenAI est sécurisée via Streamlit Cloud (Secrets).",
-        "inspirations": "🎬 Inspirations",
-        "default_author": "Ma classe",
-        "identify": "👤 Identification (Nom ou email)",
-        "activities": {
-            "Histoire": "📖 Histoire",
-            "Saynette": "🎭 Saynette",
-            "Poème": "✒️ Poème",
-            "Chanson": "🎵 Chanson",
-            "Libre": "✨ Libre"
-        }
-    },
-    "EN": {
-        "title": "🎨 Creative Workshop — EDU",
-        "subtitle": "Easily create stories, poems, songs or skits for students (6–14).",
-        "choose_lang": "🌍 Choose the language and activity",
-        "author": "✍️ Author",
-        "author_name": "Author’s name:",
-        "answer": "📝 Answer the questions",
-        "hint": "💡 Use the suggestions by clicking them or add your own idea.",
-        "generate": "🪄 Generate text",
-        "pdf_dl": "⬇️ Download PDF",
-        "carousel_prompt": "Pick an image",
-        "tagline": "✨ Create a magical story with your students",
-        "result_title": "✨ Here is your creation:",
-        "need_answers": "⚠️ Please answer at least one question.",
-        "writing": "⏳ Please wait, your creation is being written...",
-        "tries_left": "You have {n} of 5 tries left.",
-        "secure_api": "💡 Your OpenAI key is secured via Streamlit Cloud (Secrets).",
-        "inspirations": "🎬 Inspirations",
-        "default_author": "My class",
-        "identify": "👤 Identification (Name or email)",
-        "activities": {
-            "Histoire": "📖 Story",
-            "Saynette": "🎭 Skit",
-            "Poème": "✒️ Poem",
-            "Chanson": "🎵 Song",
-            "Libre": "✨ Free"
-        }
-    },
-    "ES": {
-        "title": "🎨 Taller Creativo — EDU",
-        "subtitle": "Crea fácilmente historias, poemas, canciones o escenitas para alumnos (6–14).",
-        "choose_lang": "🌍 Elige el idioma y la actividad",
-        "author": "✍️ Autor",
-        "author_name": "Nombre del autor:",
-        "answer": "📝 Responde a las preguntas",
-        "hint": "💡 Usa las sugerencias haciendo clic o añade tu propia idea.",
-        "generate": "🪄 Generar texto",
-        "pdf_dl": "⬇️ Descargar en PDF",
-        "carousel_prompt": "Selecciona una imagen",
-        "tagline": "✨ Crea una historia mágica con tus alumnos",
-        "result_title": "✨ Aquí está tu creación:",
-        "need_answers": "⚠️ Responde al menos a una pregunta.",
-        "writing": "⏳ Espere, su obra está en construcción...",
-        "tries_left": "Te quedan {n} de 5 intentos.",
-        "secure_api": "💡 Tu clave OpenAI está segura en Streamlit Cloud (Secrets).",
-        "inspirations": "🎬 Inspiraciones",
-        "default_author": "Mi clase",
-        "identify": "👤 Identificación (Nombre o correo)",
-        "activities": {
-            "Histoire": "📖 Historia",
-            "Saynette": "🎭 Escenita",
-            "Poème": "✒️ Poema",
-            "Chanson": "🎵 Canción",
-            "Libre": "✨ Libre"
-        }
-    },
-    "DE": {
-        "title": "🎨 Kreativwerkstatt — EDU",
-        "subtitle": "Erstelle leicht Geschichten, Gedichte, Lieder oder Sketche für Schüler (6–14).",
-        "choose_lang": "🌍 Wähle die Sprache und Aktivität",
-        "author": "✍️ Autor",
-        "author_name": "Name des Autors:",
-        "answer": "📝 Beantworte die Fragen",
-        "hint": "💡 Nutze die Vorschläge per Klick oder füge deine eigene Idee hinzu.",
-        "generate": "🪄 Text generieren",
-        "pdf_dl": "⬇️ Als PDF herunterladen",
-        "carousel_prompt": "Wähle ein Bild",
-        "tagline": "✨ Erstelle eine magische Geschichte mit deinen Schülern",
-        "result_title": "✨ Hier ist deine Erstellung:",
-        "need_answers": "⚠️ Bitte beantworte mindestens eine Frage.",
-        "writing": "⏳ Bitte warten, dein Werk wird erstellt...",
-        "tries_left": "Du hast noch {n} von 5 Versuchen.",
-        "secure_api": "💡 Dein OpenAI-Schlüssel ist in Streamlit Cloud (Secrets) gesichert.",
-        "inspirations": "🎬 Inspirationen",
-        "default_author": "Meine Klasse",
-        "identify": "👤 Identifikation (Name oder E-Mail)",
-        "activities": {
-            "Histoire": "📖 Geschichte",
-            "Saynette": "🎭 Sketch",
-            "Poème": "✒️ Gedicht",
-            "Chanson": "🎵 Lied",
-            "Libre": "✨ Frei"
-        }
-    },
-    "IT": {
-        "title": "🎨 Laboratorio Creativo — EDU",
-        "subtitle": "Crea facilmente storie, poesie, canzoni o scenette per studenti (6–14).",
-        "choose_lang": "🌍 Scegli la lingua e l’attività",
-        "author": "✍️ Autore",
-        "author_name": "Nome dell’autore:",
-        "answer": "📝 Rispondi alle domande",
-        "hint": "💡 Usa i suggerimenti con un clic oppure aggiungi la tua idea.",
-        "generate": "🪄 Genera il testo",
-        "pdf_dl": "⬇️ Scarica in PDF",
-        "carousel_prompt": "Seleziona un’immagine",
-        "tagline": "✨ Crea una storia magica con i tuoi studenti",
-        "result_title": "✨ Ecco la tua creazione:",
-        "need_answers": "⚠️ Rispondi ad almeno una domanda.",
-        "writing": "⏳ Attendere, la tua opera è in costruzione...",
-        "tries_left": "Ti restano {n} tentativi su 5.",
-        "secure_api": "💡 La tua chiave OpenAI è protetta in Streamlit Cloud (Secrets).",
-        "inspirations": "🎬 Ispirazioni",
-        "default_author": "La mia classe",
-        "identify": "👤 Identificazione (Nome o Email)",
-        "activities": {
-            "Histoire": "📖 Storia",
-            "Saynette": "🎭 Scenetta",
-            "Poème": "✒️ Poesia",
-            "Chanson": "🎵 Canzone",
-            "Libre": "✨ Libero"
-        }
-    }
-}
+@st.cache_resource
+def get_catalog():
+    return load_catalog()
+
+catalog = get_catalog()
+LABELS = catalog.labels
 
 # =========================
 # ETAT INITIAL
@@ -242,6 +257,7 @@ lang = st.session_state.lang
 # =========================
 # TITRE + IDENTIFICATION
 # =========================
+section_t0 = time.perf_counter()
 st.markdown(f"<h1 style='text-align:center;color:#ff69b4'>{LABELS[lang]['title']}</h1>", unsafe_allow_html=True)
 st.caption(LABELS[lang]["subtitle"])
 st.info(LABELS[lang]["secure_api"])
@@ -251,65 +267,130 @@ user_id = st.text_input("", "", key="user_id_input")
 if not user_id:
     st.warning("⚠️ Merci d’entrer votre nom/email pour continuer.")
     st.stop()
-
-# Initialiser quota individuel
-if f"essais_{user_id}" not in st.session_state:
-    st.session_state[f"essais_{user_id}"] = 0
+record_timing("en-tête", section_t0)
+
+# État partagé entre réplicas (quotas, préférences) : memory (un seul processus),
+# sqlite (plusieurs processus d'une seule machine) ou redis (plusieurs machines).
+# Par défaut redis dès qu'ATELIER_REDIS_URL est fourni, sinon sqlite : sur
+# plusieurs hôtes sans Redis, chaque hôte garde ses propres quotas, préférences
+# et créations (creations.db est lui aussi local à la machine).
+@st.cache_resource
+def get_state_store():
+    return make_state_store(
+        os.environ.get("ATELIER_STATE_BACKEND", "redis" if os.environ.get("ATELIER_REDIS_URL") else "sqlite"),
+        path=os.environ.get("ATELIER_STATE_DB", "state.db"),
+        url=os.environ.get("ATELIER_REDIS_URL"),
+    )
+
+state = get_state_store()
+STATE_TTL_S = float(os.environ.get("ATELIER_STATE_TTL_D", "30")) * 86400
+
+# Quotas (par utilisateur, par activité, global), partagés entre sessions et réplicas
+@st.cache_resource
+def get_quota_service():
+    service = QuotaService(
+        state,
+        user_limit=int(os.environ.get("ATELIER_QUOTA_USER", "5")),
+        window_s=float(os.environ.get("ATELIER_QUOTA_WINDOW_H", "0")) * 3600,
+        activity_limits=parse_activity_limits(os.environ.get("ATELIER_QUOTA_ACTIVITY", "")),
+        global_rate_per_min=float(os.environ.get("ATELIER_GLOBAL_RPM", "60")),
+        global_burst=int(os.environ.get("ATELIER_GLOBAL_BURST", "10")),
+        pack_limit=int(os.environ.get("ATELIER_QUOTA_PACK", "50")),
+    )
+    service.import_legacy(os.environ.get("ATELIER_QUOTA_DB", "quota.db"))  # anciens compteurs
+    return service
+
+quota = get_quota_service()
+
+# Préférences retrouvées quand l'utilisateur revient, quel que soit le réplica qui le sert
+if st.session_state.get("prefs_user") != user_id:
+    st.session_state.prefs_user = user_id
+    prefs = state.get(f"prefs:{user_id}") or {}
+    st.session_state.saved_prefs = prefs
+    if prefs.get("activity") in catalog.activities:
+        st.session_state.activity = prefs["activity"]
+    if prefs.get("lang") in catalog.languages and prefs["lang"] != lang:
+        st.session_state.lang = prefs["lang"]
+        st.rerun()  # en-tête à réafficher dans la bonne langue
+
+# Créations (texte + PDF rendu) : le résultat survit aux reruns sans nouvel appel
+@st.cache_resource
+def get_creation_store():
+    return CreationStore(
+        os.environ.get("ATELIER_CREATIONS_DB", "creations.db"),
+        max_per_user=int(os.environ.get("ATELIER_CREATIONS_MAX", "200")),
+    )
+
+creations = get_creation_store()
+CREATIONS_PER_PAGE = int(os.environ.get("ATELIER_CREATIONS_PER_PAGE", "5"))
+
+# Journal d'utilisation (SQLite), partagé par toutes les sessions du processus
+@st.cache_resource
+def get_usage_store():
+    store = UsageStore(os.environ.get("ATELIER_USAGE_DB", "usage.db"))
+    store.import_csv("logs.csv")  # reprise de l'ancien journal CSV
+    return store
+
+usage_store = get_usage_store()
+
+# Écriture par lots en arrière-plan : aucun accès disque pendant le clic
+@st.cache_resource
+def get_usage_writer():
+    return UsageLogWriter(
+        usage_store,
+        batch_size=int(os.environ.get("ATELIER_LOG_BATCH", "50")),
+        flush_ms=int(os.environ.get("ATELIER_LOG_FLUSH_MS", "500")),
+    )
+
+usage_writer = get_usage_writer()
 
 # Fonction log
-def log_usage(user_id: str, lang: str, activity: str, essais: int):
-    """Log l'utilisation dans logs.csv (crée le fichier si besoin)."""
-    log_file = Path("logs.csv")
-    file_exists = log_file.exists()
-
-    # Colonnes toujours les mêmes
-    headers = ["timestamp", "user_id", "lang", "activity", "essais"]
-
-    with open(log_file, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        # écrire l'entête si le fichier est nouveau
-        if not file_exists:
-            writer.writerow(headers)
-        # écrire la ligne
-        writer.writerow([
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            user_id if user_id else "inconnu",
-            lang,
-            activity,
-            essais
-        ])
+def log_usage(user_id: str, lang: str, activity: str, essais: int, answers: list = None):
+    """Empile l'utilisation pour le journal SQLite (écrite en arrière-plan)."""
+    with trace_span("log_usage"):
+        usage_writer.submit(user_id, lang, activity, essais, answers)
 
 # =========================
 # INSPIRATIONS (CARROUSEL)
 # =========================
-st.markdown("## " + LABELS[lang]["inspirations"])
-images = [
-    {"file": "slide1.jpg", "caption": LABELS[lang]["tagline"]},
-    {"file": "slide2.jpg", "caption": "🎭"},
-    {"file": "slide4.jpg", "caption": "🎵"},
-]
-slider_val = st.slider(LABELS[lang]["carousel_prompt"], 1, len(images), 1)
-current = images[slider_val - 1]
-st.image(current["file"], use_container_width=True, caption=current["caption"])
+CAROUSEL_FILES = ["slide1.jpg", "slide2.jpg", "slide4.jpg"]
+IMAGE_FORMAT = os.environ.get("ATELIER_IMAGE_FORMAT", "jpeg")
+
+# Variantes redimensionnées, construites une fois par processus
+@st.cache_resource
+def get_image_assets():
+    return ImageAssets(CAROUSEL_FILES)
+
+image_assets = get_image_assets()
+
+@st.fragment
+def carousel_section(lang: str):
+    with timed("carrousel"):
+        st.markdown("## " + LABELS[lang]["inspirations"])
+        images = [
+            {"file": "slide1.jpg", "caption": LABELS[lang]["tagline"]},
+            {"file": "slide2.jpg", "caption": "🎭"},
+            {"file": "slide4.jpg", "caption": "🎵"},
+        ]
+        slider_val = st.slider(LABELS[lang]["carousel_prompt"], 1, len(images), 1)
+        current = images[slider_val - 1]
+        st.image(image_assets.best(current["file"], fmt=IMAGE_FORMAT).sent, use_container_width=True, caption=current["caption"])
+
+carousel_section(lang)
 
 # =========================
-# LANGUE + ACTIVITÉ
+# LANGUE + ACTIVITÉ (changent toute la page : rerun complet)
 # =========================
+section_t0 = time.perf_counter()
 st.markdown(f"### {LABELS[lang]['choose_lang']}")
 
 # Sélecteur de langue (radio avec 5 options)
 lang = st.radio(
     LABELS[st.session_state.get("lang", "FR")]['choose_lang'],
-    options=["FR", "EN", "ES", "DE", "IT"],
-    format_func=lambda x: {
-        "FR": "🇫🇷 Français",
-        "EN": "🇬🇧 English",
-        "ES": "🇪🇸 Español",
-        "DE": "🇩🇪 Deutsch",
-        "IT": "🇮🇹 Italiano"
-    }[x],
+    options=catalog.languages,
+    format_func=catalog.language_names.get,
     horizontal=True,
-    index=["FR", "EN", "ES", "DE", "IT"].index(st.session_state.get("lang", "FR"))
+    index=catalog.languages.index(st.session_state.get("lang", "FR"))
 )
 st.session_state.lang = lang
 lang = st.session_state.lang
@@ -317,7 +398,7 @@ lang = st.session_state.lang
 # =========================
 # ACTIVITÉS traduites
 # =========================
-activities = ["Histoire", "Saynette", "Poème", "Chanson", "Libre"]
+activities = catalog.activities
 
 cols = st.columns(len(activities))
 for i, act in enumerate(activities):
@@ -329,475 +410,605 @@ if "activity" not in st.session_state:
     st.session_state.activity = "Histoire"
 
 activity = st.session_state.activity
-
+prefs = {"lang": lang, "activity": activity}
+if st.session_state.get("saved_prefs") != prefs:
+    state.set(f"prefs:{user_id}", prefs, STATE_TTL_S)
+    st.session_state.saved_prefs = prefs
+record_timing("langue + activité", section_t0)
 
 # =========================
-# CHAMP AUTEUR
+# AUTEUR + QUESTIONS
 # =========================
-st.markdown(f"### {LABELS[lang]['author']}")
-author = st.text_input(LABELS[lang]["author_name"], LABELS[lang]["default_author"], key="author_input")
+@st.fragment
+def question_form(lang: str, activity: str):
+    with timed("questions"):
+        st.markdown(f"### {LABELS[lang]['author']}")
+        st.text_input(LABELS[lang]["author_name"], LABELS[lang]["default_author"], key="author_input")
+
+        st.markdown(f"### {LABELS[lang]['answer']}")
+        st.caption(LABELS[lang]["hint"])
+
+        questions = catalog.questions_for(lang, activity)
+        progress = st.progress(0)
+
+        for i, q in enumerate(questions, start=1):
+            st.markdown(f"<div class='question-card'><b>{i}. {q['q']}</b></div>", unsafe_allow_html=True)
+            key_text = f"answer_{activity}_{lang}_{i}"
+            cols = st.columns(len(q["sug"]))
+            for j, sug in enumerate(q["sug"]):
+                if cols[j].button(sug, key=f"btn_{activity}_{lang}_{i}_{j}"):
+                    st.session_state[key_text] = sug
+            st.text_input(" ", key=key_text, label_visibility="collapsed", placeholder=catalog.placeholders.get(lang, "Votre idée ou une suggestion…"))
+            progress.progress(int(i / max(1, len(questions)) * 100))
+
+question_form(lang, activity)
+
+def current_answers(lang: str, activity: str) -> list:
+    """Réponses saisies dans le formulaire (lues dans l'état de session)."""
+    questions = catalog.questions_for(lang, activity)
+    return [st.session_state.get(f"answer_{activity}_{lang}_{i}", "") for i in range(1, len(questions) + 1)]
 
 # =========================
-# QPACK COMPLET (questions + suggestions)
+# QUOTA
 # =========================
-QPACK = {
-    "FR": {
-        "Histoire": [
-            {"q": "Héros/héroïne ?", "sug": ["Fillette curieuse", "Garçon inventeur", "Chat qui parle"]},
-            {"q": "Lieu principal ?", "sug": ["Cour d’école", "Forêt magique", "Bus scolaire"]},
-            {"q": "Objectif ?", "sug": ["Retrouver un trésor", "Aider un ami", "Gagner un concours"]},
-            {"q": "Obstacle ?", "sug": ["Orage", "Rival jaloux", "Labyrinthe"]},
-            {"q": "Allié ?", "sug": ["Meilleure amie", "Professeur", "Écureuil"]},
-            {"q": "Ton de l’histoire ?", "sug": ["Drôle", "Mystérieux", "Épique"]},
-            {"q": "Fin souhaitée ?", "sug": ["Heureuse", "Morale", "Surprenante"]},
-        ],
-        "Saynette": [
-            {"q": "Personnages ?", "sug": ["Deux amis", "Prof et élève", "Frères/soeurs"]},
-            {"q": "Lieu ?", "sug": ["Cantine", "Bus", "Gymnase"]},
-            {"q": "Conflit ?", "sug": ["Quiproquo", "Objet perdu", "Concours raté"]},
-            {"q": "Style théâtral ?", "sug": ["Vaudeville", "Drame", "Comédie", "Comédie musicale"]},
-            {"q": "Nombre de scènes ?", "sug": ["1", "2", "3"]},
-            {"q": "Objet central ?", "sug": ["Un ballon", "Une lettre", "Un gâteau"]},
-            {"q": "Fin ?", "sug": ["Réconciliation", "Leçon", "Gag final"]},
-        ],
-        "Poème": [
-            {"q": "Sujet du poème ?", "sug": ["Amitié", "Nature", "Courage"]},
-            {"q": "Ambiance ?", "sug": ["Joyeuse", "Rêveuse", "Épique"]},
-            {"q": "Style poétique ?", "sug": ["Alexandrin", "Rimes libres", "Haïku"]},
-            {"q": "Nombre de strophes ?", "sug": ["2", "3", "4"]},
-            {"q": "Émotion principale ?", "sug": ["Douceur", "Rire", "Inspiration"]},
-            {"q": "Image centrale ?", "sug": ["Étoile", "Arbre", "Rivière"]},
-            {"q": "Public cible ?", "sug": ["6-8 ans", "9-11 ans", "12-14 ans"]},
-        ],
-        "Chanson": [
-            {"q": "Thème ?", "sug": ["Voyage scolaire", "Fête de fin d’année", "Étoiles"]},
-            {"q": "Tempo ?", "sug": ["Lent", "Modéré", "Rapide"]},
-            {"q": "Style musical ?", "sug": ["Pop", "Jazz", "Rap", "Folk"]},
-            {"q": "Sujet du refrain ?", "sug": ["Amitié", "La classe", "Un rêve"]},
-            {"q": "Nombre de couplets ?", "sug": ["2", "3", "4"]},
-            {"q": "Ambiance ?", "sug": ["Joyeuse", "Nostalgique", "Festive"]},
-            {"q": "Public cible ?", "sug": ["6-8 ans", "9-11 ans", "12-14 ans"]},
-        ],
-        "Libre": [
-            {"q": "Type de texte ?", "sug": ["Lettre", "Journal", "Dialogue"]},
-            {"q": "Sujet ?", "sug": ["Un secret", "Une découverte", "Un défi"]},
-            {"q": "Ton ?", "sug": ["Humoristique", "Poétique", "Émouvant"]},
-            {"q": "Lieu ?", "sug": ["École", "Maison", "Forêt"]},
-            {"q": "Personnages ?", "sug": ["Un ami", "Un professeur", "Un animal"]},
-            {"q": "Objectif ?", "sug": ["Amuser", "Émouvoir", "Faire réfléchir"]},
-            {"q": "Style narratif ?", "sug": ["Réaliste", "Imaginaire", "Fantastique"]},
-        ],
-    },
-    "EN": {
-        "Histoire": [
-            {"q": "Hero/heroine?", "sug": ["Curious girl", "Inventor boy", "Talking cat"]},
-            {"q": "Main setting?", "sug": ["Schoolyard", "Magic forest", "School bus"]},
-            {"q": "Goal?", "sug": ["Find a treasure", "Help a friend", "Win a contest"]},
-            {"q": "Obstacle?", "sug": ["Storm", "Jealous rival", "Maze"]},
-            {"q": "Ally?", "sug": ["Best friend", "Teacher", "Squirrel"]},
-            {"q": "Tone of the story?", "sug": ["Funny", "Mysterious", "Epic"]},
-            {"q": "Desired ending?", "sug": ["Happy", "Moral", "Surprising"]},
-        ],
-        "Saynette": [
-            {"q": "Characters?", "sug": ["Two friends", "Teacher & student", "Siblings"]},
-            {"q": "Place?", "sug": ["Cafeteria", "Bus", "Gym"]},
-            {"q": "Conflict?", "sug": ["Misunderstanding", "Lost item", "Failed contest"]},
-            {"q": "Theatrical style?", "sug": ["Vaudeville", "Drama", "Comedy", "Musical"]},
-            {"q": "Number of scenes?", "sug": ["1", "2", "3"]},
-            {"q": "Central object?", "sug": ["A ball", "A letter", "A cake"]},
-            {"q": "Ending?", "sug": ["Reconciliation", "Lesson", "Final gag"]},
-        ],
-        "Poème": [
-            {"q": "Poem topic?", "sug": ["Friendship", "Nature", "Courage"]},
-            {"q": "Mood?", "sug": ["Cheerful", "Dreamy", "Epic"]},
-            {"q": "Poetic style?", "sug": ["Alexandrine", "Free verse", "Haiku"]},
-            {"q": "Number of stanzas?", "sug": ["2", "3", "4"]},
-            {"q": "Main emotion?", "sug": ["Gentleness", "Laughter", "Inspiration"]},
-            {"q": "Central image?", "sug": ["Star", "Tree", "River"]},
-            {"q": "Target audience?", "sug": ["6-8 years", "9-11 years", "12-14 years"]},
-        ],
-        "Chanson": [
-            {"q": "Song theme?", "sug": ["School trip", "Year-end party", "Stars"]},
-            {"q": "Tempo?", "sug": ["Slow", "Medium", "Fast"]},
-            {"q": "Musical style?", "sug": ["Pop", "Jazz", "Rap", "Folk"]},
-            {"q": "Chorus about?", "sug": ["Friendship", "The class", "A dream"]},
-            {"q": "Number of verses?", "sug": ["2", "3", "4"]},
-            {"q": "Mood?", "sug": ["Joyful", "Nostalgic", "Festive"]},
-            {"q": "Target audience?", "sug": ["6-8 years", "9-11 years", "12-14 years"]},
-        ],
-        "Libre": [
-            {"q": "Text type?", "sug": ["Letter", "Diary", "Dialogue"]},
-            {"q": "Topic?", "sug": ["A secret", "A discovery", "A challenge"]},
-            {"q": "Tone?", "sug": ["Humorous", "Poetic", "Emotional"]},
-            {"q": "Place?", "sug": ["School", "Home", "Forest"]},
-            {"q": "Characters?", "sug": ["A friend", "A teacher", "An animal"]},
-            {"q": "Purpose?", "sug": ["Entertain", "Move", "Make think"]},
-            {"q": "Narrative style?", "sug": ["Realistic", "Imaginary", "Fantastic"]},
-        ],
-    },
-    "ES": {
-        "Histoire": [
-            {"q": "¿Héroe/heroína?", "sug": ["Niña curiosa", "Niño inventor", "Gato que habla"]},
-            {"q": "¿Lugar principal?", "sug": ["Patio escolar", "Bosque mágico", "Autobús escolar"]},
-            {"q": "¿Meta?", "sug": ["Encontrar un tesoro", "Ayudar a un amigo", "Ganar un concurso"]},
-            {"q": "¿Obstáculo?", "sug": ["Tormenta", "Rival celoso", "Laberinto"]},
-            {"q": "¿Aliado?", "sug": ["Mejor amigo", "Profesor", "Ardilla"]},
-            {"q": "¿Tono de la historia?", "sug": ["Divertido", "Misterioso", "Épico"]},
-            {"q": "¿Final deseado?", "sug": ["Feliz", "Con moraleja", "Sorprendente"]},
-        ],
-        "Saynette": [
-            {"q": "¿Personajes?", "sug": ["Dos amigos", "Profesor y alumno", "Hermanos"]},
-            {"q": "¿Lugar?", "sug": ["Comedor", "Autobús", "Gimnasio"]},
-            {"q": "¿Conflicto?", "sug": ["Malentendido", "Objeto perdido", "Concurso fallido"]},
-            {"q": "¿Estilo teatral?", "sug": ["Vaudeville", "Drama", "Comedia", "Musical"]},
-            {"q": "¿Número de escenas?", "sug": ["1", "2", "3"]},
-            {"q": "¿Objeto central?", "sug": ["Pelota", "Carta", "Pastel"]},
-            {"q": "¿Final?", "sug": ["Reconciliación", "Lección", "Gag final"]},
-        ],
-        "Poème": [
-            {"q": "¿Tema del poema?", "sug": ["Amistad", "Naturaleza", "Valor"]},
-            {"q": "¿Ambiente?", "sug": ["Alegre", "Soñador", "Épico"]},
-            {"q": "¿Estilo poético?", "sug": ["Alejandrino", "Verso libre", "Haiku"]},
-            {"q": "¿Número de estrofas?", "sug": ["2", "3", "4"]},
-            {"q": "¿Emoción principal?", "sug": ["Dulzura", "Risa", "Inspiración"]},
-            {"q": "¿Imagen central?", "sug": ["Estrella", "Árbol", "Río"]},
-            {"q": "¿Público objetivo?", "sug": ["6-8 años", "9-11 años", "12-14 años"]},
-        ],
-        "Chanson": [
-            {"q": "¿Tema de la canción?", "sug": ["Viaje escolar", "Fiesta de fin de curso", "Estrellas"]},
-            {"q": "¿Tempo?", "sug": ["Lento", "Medio", "Rápido"]},
-            {"q": "¿Estilo musical?", "sug": ["Pop", "Jazz", "Rap", "Folk"]},
-            {"q": "¿Estribillo sobre?", "sug": ["Amistad", "La clase", "Un sueño"]},
-            {"q": "¿Número de estrofas?", "sug": ["2", "3", "4"]},
-            {"q": "¿Ambiente?", "sug": ["Alegre", "Nostálgico", "Festivo"]},
-            {"q": "¿Público objetivo?", "sug": ["6-8 años", "9-11 años", "12-14 años"]},
-        ],
-        "Libre": [
-            {"q": "¿Tipo de texto?", "sug": ["Carta", "Diario", "Diálogo"]},
-            {"q": "¿Tema?", "sug": ["Un secreto", "Un descubrimiento", "Un reto"]},
-            {"q": "¿Tono?", "sug": ["Humorístico", "Poético", "Emotivo"]},
-            {"q": "¿Lugar?", "sug": ["Escuela", "Casa", "Bosque"]},
-            {"q": "¿Personajes?", "sug": ["Un amigo", "Un profesor", "Un animal"]},
-            {"q": "¿Objetivo?", "sug": ["Divertir", "Emocionar", "Hacer pensar"]},
-            {"q": "¿Estilo narrativo?", "sug": ["Realista", "Imaginario", "Fantástico"]},
-        ],
-    },
-    "DE": {
-        "Histoire": [
-            {"q": "Held/Heldin?", "sug": ["Neugieriges Mädchen", "Erfinderjunge", "Sprechende Katze"]},
-            {"q": "Hauptort?", "sug": ["Schulhof", "Zauberwald", "Schulbus"]},
-            {"q": "Ziel?", "sug": ["Einen Schatz finden", "Einem Freund helfen", "Wettbewerb gewinnen"]},
-            {"q": "Hindernis?", "sug": ["Sturm", "Eifersüchtiger Rivale", "Labyrinth"]},
-            {"q": "Verbündeter?", "sug": ["Beste Freundin", "Lehrer", "Eichhörnchen"]},
-            {"q": "Ton der Geschichte?", "sug": ["Lustig", "Geheimnisvoll", "Episch"]},
-            {"q": "Gewünschtes Ende?", "sug": ["Glücklich", "Mit Moral", "Überraschend"]},
-        ],
-        "Saynette": [
-            {"q": "Charaktere?", "sug": ["Zwei Freunde", "Lehrer & Schüler", "Geschwister"]},
-            {"q": "Ort?", "sug": ["Kantine", "Bus", "Turnhalle"]},
-            {"q": "Konflikt?", "sug": ["Missverständnis", "Verlorener Gegenstand", "Gescheiterter Wettbewerb"]},
-            {"q": "Theaterstil?", "sug": ["Vaudeville", "Drama", "Komödie", "Musical"]},
-            {"q": "Anzahl der Szenen?", "sug": ["1", "2", "3"]},
-            {"q": "Zentrales Objekt?", "sug": ["Ball", "Brief", "Kuchen"]},
-            {"q": "Ende?", "sug": ["Versöhnung", "Lehre", "Finaler Gag"]},
-        ],
-        "Poème": [
-            {"q": "Thema des Gedichts?", "sug": ["Freundschaft", "Natur", "Mut"]},
-            {"q": "Stimmung?", "sug": ["Fröhlich", "Träumerisch", "Episch"]},
-            {"q": "Dichtungsstil?", "sug": ["Alexandriner", "Freier Vers", "Haiku"]},
-            {"q": "Anzahl der Strophen?", "sug": ["2", "3", "4"]},
-            {"q": "Hauptemotion?", "sug": ["Sanftheit", "Lachen", "Inspiration"]},
-            {"q": "Zentrales Bild?", "sug": ["Stern", "Baum", "Fluss"]},
-            {"q": "Zielgruppe?", "sug": ["6-8 Jahre", "9-11 Jahre", "12-14 Jahre"]},
-        ],
-        "Chanson": [
-            {"q": "Thema des Liedes?", "sug": ["Klassenfahrt", "Abschlussfeier", "Sterne"]},
-            {"q": "Tempo?", "sug": ["Langsam", "Mittel", "Schnell"]},
-            {"q": "Musikstil?", "sug": ["Pop", "Jazz", "Rap", "Folk"]},
-            {"q": "Refrain über?", "sug": ["Freundschaft", "Die Klasse", "Ein Traum"]},
-            {"q": "Anzahl der Strophen?", "sug": ["2", "3", "4"]},
-            {"q": "Stimmung?", "sug": ["Fröhlich", "Nostalgisch", "Festlich"]},
-            {"q": "Zielgruppe?", "sug": ["6-8 Jahre", "9-11 Jahre", "12-14 Jahre"]},
-        ],
-        "Libre": [
-            {"q": "Textart?", "sug": ["Brief", "Tagebuch", "Dialog"]},
-            {"q": "Thema?", "sug": ["Ein Geheimnis", "Eine Entdeckung", "Eine Herausforderung"]},
-            {"q": "Ton?", "sug": ["Humorvoll", "Poetisch", "Emotional"]},
-            {"q": "Ort?", "sug": ["Schule", "Zuhause", "Wald"]},
-            {"q": "Charaktere?", "sug": ["Ein Freund", "Ein Lehrer", "Ein Tier"]},
-            {"q": "Ziel?", "sug": ["Unterhalten", "Bewegen", "Zum Nachdenken anregen"]},
-            {"q": "Erzählstil?", "sug": ["Realistisch", "Fantastisch", "Imaginär"]},
-        ],
-    },
-    "IT": {
-        "Histoire": [
-            {"q": "Eroe/eroina?", "sug": ["Ragazza curiosa", "Ragazzo inventore", "Gatto parlante"]},
-            {"q": "Luogo principale?", "sug": ["Cortile della scuola", "Foresta magica", "Scuolabus"]},
-            {"q": "Obiettivo?", "sug": ["Trovare un tesoro", "Aiutare un amico", "Vincere un concorso"]},
-            {"q": "Ostacolo?", "sug": ["Tempesta", "Rivale geloso", "Labirinto"]},
-            {"q": "Alleato?", "sug": ["Migliore amica", "Insegnante", "Scoiattolo"]},
-            {"q": "Tono della storia?", "sug": ["Divertente", "Misterioso", "Epico"]},
-            {"q": "Finale desiderato?", "sug": ["Felice", "Con morale", "Sorpresa"]},
-        ],
-        "Saynette": [
-            {"q": "Personaggi?", "sug": ["Due amici", "Professore e studente", "Fratelli"]},
-            {"q": "Luogo?", "sug": ["Mensa", "Autobus", "Palestra"]},
-            {"q": "Conflitto?", "sug": ["Equivoco", "Oggetto perso", "Concorso fallito"]},
-            {"q": "Stile teatrale?", "sug": ["Vaudeville", "Dramma", "Commedia", "Musical"]},
-            {"q": "Numero di scene?", "sug": ["1", "2", "3"]},
-            {"q": "Oggetto centrale?", "sug": ["Pallone", "Lettera", "Torta"]},
-            {"q": "Finale?", "sug": ["Riconciliazione", "Lezione", "Gag finale"]},
-        ],
-        "Poème": [
-            {"q": "Tema della poesia?", "sug": ["Amicizia", "Natura", "Coraggio"]},
-            {"q": "Atmosfera?", "sug": ["Allegra", "Sognante", "Epica"]},
-            {"q": "Stile poetico?", "sug": ["Alessandrino", "Verso libero", "Haiku"]},
-            {"q": "Numero di strofe?", "sug": ["2", "3", "4"]},
-            {"q": "Emozione principale?", "sug": ["Dolcezza", "Risata", "Ispirazione"]},
-            {"q": "Immagine centrale?", "sug": ["Stella", "Albero", "Fiume"]},
-            {"q": "Pubblico target?", "sug": ["6-8 anni", "9-11 anni", "12-14 anni"]},
-        ],
-        "Chanson": [
-            {"q": "Tema della canzone?", "sug": ["Gita scolastica", "Festa di fine anno", "Stelle"]},
-            {"q": "Tempo?", "sug": ["Lento", "Medio", "Veloce"]},
-            {"q": "Stile musicale?", "sug": ["Pop", "Jazz", "Rap", "Folk"]},
-            {"q": "Ritornello su?", "sug": ["Amicizia", "La classe", "Un sogno"]},
-            {"q": "Numero di strofe?", "sug": ["2", "3", "4"]},
-            {"q": "Atmosfera?", "sug": ["Allegra", "Nostalgica", "Festosa"]},
-            {"q": "Pubblico target?", "sug": ["6-8 anni", "9-11 anni", "12-14 anni"]},
-        ],
-        "Libre": [
-            {"q": "Tipo di testo?", "sug": ["Lettera", "Diario", "Dialogo"]},
-            {"q": "Tema?", "sug": ["Un segreto", "Una scoperta", "Una sfida"]},
-            {"q": "Tono?", "sug": ["Umoristico", "Poetico", "Emozionante"]},
-            {"q": "Luogo?", "sug": ["Scuola", "Casa", "Foresta"]},
-            {"q": "Personaggi?", "sug": ["Un amico", "Un insegnante", "Un animale"]},
-            {"q": "Obiettivo?", "sug": ["Divertire", "Emozionare", "Far riflettere"]},
-            {"q": "Stile narrativo?", "sug": ["Realistico", "Immaginario", "Fantastico"]},
-        ],
-    },
-}
-
-# =========================
-# Placeholders multilingues
-# =========================
-placeholders = {
-    "FR": "Votre idée ou une suggestion…",
-    "EN": "Your idea or a suggestion…",
-    "ES": "Tu idea o una sugerencia…",
-    "DE": "Deine Idee oder ein Vorschlag…",
-    "IT": "La tua idea o un suggerimento…",
-}
-# =========================
-# AFFICHAGE QUESTIONS
-# =========================
-st.markdown(f"### {LABELS[lang]['answer']}")
-st.caption(LABELS[lang]["hint"])
-
-placeholders = {
-    "FR": "Votre idée ou une suggestion…",
-    "EN": "Your idea or a suggestion…",
-    "ES": "Tu idea o una sugerencia…",
-    "DE": "Deine Idee oder ein Vorschlag…",
-    "IT": "La tua idea o un suggerimento…",
-}
-
-answers = []
-questions = QPACK.get(lang, QPACK["FR"]).get(activity, [])
-progress = st.progress(0)
-
-for i, q in enumerate(questions, start=1):
-    st.markdown(f"<div class='question-card'><b>{i}. {q['q']}</b></div>", unsafe_allow_html=True)
-    key_text = f"answer_{activity}_{lang}_{i}"
-    cols = st.columns(len(q["sug"]))
-    for j, sug in enumerate(q["sug"]):
-        if cols[j].button(sug, key=f"btn_{activity}_{lang}_{i}_{j}"):
-            st.session_state[key_text] = sug
-    val = st.text_input(" ", key=key_text, label_visibility="collapsed", placeholder=placeholders.get(lang, "Votre idée ou une suggestion…"))
-    answers.append(val)
-    progress.progress(int(i / max(1, len(questions)) * 100))
-
-# Afficher quota
-st.caption(LABELS[lang]["tries_left"].format(n=max(0, 5 - st.session_state[f"essais_{user_id}"])))
+def quota_warning(decision):
+    """Message affiché quand le quota refuse une génération."""
+    if decision.reason == "global":
+        st.warning("⏳ Beaucoup de demandes en ce moment, réessayez dans quelques secondes.")
+    elif decision.reason == "activity":
+        st.warning("🚫 Vous avez atteint la limite d’essais pour cette activité.")
+    elif decision.reason == "pack":
+        st.warning(f"🚫 Vous avez atteint la limite de {quota.pack_limit} textes en pack classe.")
+    else:
+        st.warning(f"🚫 Vous avez atteint vos {quota.user_limit} essais gratuits.")
 
 # =========================
 # GENERATION TEXTE + PDF
 # =========================
-if st.button(LABELS[lang]["generate"], use_container_width=True, type="primary"):
-    if not any(answers):
-        st.error(LABELS[lang]["need_answers"])
-    else:
-        if st.session_state[f"essais_{user_id}"] >= 5:
-            st.warning("🚫 Vous avez atteint vos 5 essais gratuits.")
+# Pack classe (N variantes, exécutées par la file de génération ci-dessous)
+PACK_MAX = int(os.environ.get("ATELIER_PACK_MAX", "30"))
+PACK_TIMEOUT_S = float(os.environ.get("ATELIER_PACK_TIMEOUT_S", "60"))
+
+# File de génération : au plus ATELIER_GEN_WORKERS appels simultanés par processus,
+# service équitable entre classes puis utilisateurs, demandes refusées au-delà du plafond
+@st.cache_resource
+def get_scheduler():
+    return GenerationScheduler(
+        workers=int(os.environ.get("ATELIER_GEN_WORKERS", "4")),
+        max_backlog=int(os.environ.get("ATELIER_GEN_BACKLOG", "50")),
+        max_per_user=int(os.environ.get("ATELIER_GEN_PER_USER", "2")),
+    )
+
+scheduler = get_scheduler()
+JOB_POLL_S = float(os.environ.get("ATELIER_JOB_POLL_S", "0.5"))  # rafraîchissement de la progression
+
+def generation_job(user_id: str, lang: str, activity: str, params: dict):
+    """Tâche exécutée par un worker de la file : texte (cache, appel regroupé ou backend), PDF, création.
+
+    Renvoie {"creation_id", "ttft", "total", "truncated"} ; les durées comptent depuis le clic, attente en
+    file comprise. Un texte coupé par `max_tokens` est redemandé avec un budget plus large s'il n'est pas
+    diffusé au fil de l'eau ; sinon (ou si la reprise est coupée aussi) il est signalé et pas mis en cache.
+    La tâche est tracée (trace « génération » à part) si le rerun qui l'a déposée l'était.
+    """
+    traced = current_trace() is not None
+
+    def run(job):
+        trace = tracer.begin("génération", force=True, lang=lang, activity=activity) if traced else None
+        try:
+            return execute(job, trace)
+        finally:
+            tracer.finish(trace)
+
+    def execute(job, trace):
+        labels = {"lang": lang, "activity": activity}
+        metrics.observe("atelier_queue_wait_seconds", job.wait_s, **labels)
+        if trace is not None:
+            trace.add("file d'attente", trace.t0 - job.wait_s, trace.t0)
+        cache_key = make_key(params["messages"], params["model"], params["temperature"], params["max_tokens"])
+        with trace_span("cache"):
+            story = gen_cache.get(cache_key)
+        ttft = None
+        source = "cache"
+        truncated = False
+        if story is None:
+            # Une demande identique déjà en cours est suivie plutôt que relancée
+            flight = flight_key(params["messages"], params["model"], params["temperature"], params["max_tokens"])
+            on_usage = usage_recorder(lang, activity)
+            finish = []
+
+            t0 = time.monotonic()
+            with trace_span("backend", streaming=STREAMING):
+                if STREAMING:
+                    deltas = in_flight.stream(flight, lambda: llm.stream(on_usage=on_usage, on_finish=finish.append,
+                                                                         **params))
+                    for delta in deltas:
+                        if ttft is None:
+                            ttft = time.monotonic() - job.submitted_at
+                            upstream_ttft = time.monotonic() - t0
+                        job.publish(delta)
+                    story, leader = job.text.strip(), deltas.leader
+                else:
+                    # (texte, tronqué) du leader, partagé tel quel avec les demandes regroupées
+                    (story, cut), leader = in_flight.do(
+                        flight, lambda: generate_complete(llm, params, on_usage=on_usage))
+                    finish.append("length" if cut else "stop")
+            source = "backend" if leader else "coalesced"
+            truncated = finish[-1:] == ["length"]  # en streaming, connu du seul appel leader
+            if truncated:
+                metrics.inc("atelier_truncated_total", **labels)
+            if leader and not truncated:  # les demandes regroupées ne dupliquent pas la variante
+                gen_cache.put(cache_key, story)
+            if leader:
+                metrics.observe("atelier_upstream_seconds", time.monotonic() - t0, **labels)
+                if STREAMING and story:  # sans streaming, pas de premier fragment à mesurer
+                    metrics.observe("atelier_upstream_ttft_seconds", upstream_ttft, **labels)
+        metrics.inc("atelier_generations_total", source=source, **labels)
+        total = time.monotonic() - job.submitted_at
+        with metrics.time("atelier_pdf_seconds", **labels), trace_span("pdf"):
+            pdf = render_pdf(story, activity)
+        with trace_span("enregistrement", source=source):
+            creation_id = creations.add(user_id, lang, activity, story, pdf)
+        return {"creation_id": creation_id, "ttft": total if ttft is None else ttft, "total": total,
+                "truncated": truncated}
+
+    return run
+
+def collect_jobs(lang: str, activity: str):
+    """Fait entrer dans la session les tâches terminées (création courante, durées, erreur, avis)."""
+    for job_id in list(st.session_state.get("jobs", [])):
+        job = scheduler.get(job_id)
+        if job is not None and not job.finished:
+            continue
+        st.session_state.jobs.remove(job_id)
+        if job is None:
+            continue  # tâche oubliée par le processus : la création est de toute façon enregistrée
+        if job.status == "failed":
+            st.session_state.job_error = job.exception
+            continue
+        st.session_state.creation_id = job.result["creation_id"]
+        st.session_state.creation_latency = job.result
+        done_activity = creations.get(job.user_id, job.result["creation_id"]).activity
+        if done_activity != activity:  # l'utilisateur est passé à autre chose entre-temps
+            st.toast(LABELS[lang]["job_ready"].format(activity=done_activity))
+
+def pending_jobs() -> list:
+    """Tâches de la session encore en file ou en cours."""
+    jobs = [scheduler.get(job_id) for job_id in st.session_state.get("jobs", [])]
+    return [job for job in jobs if job is not None and not job.finished]
+
+@st.fragment(run_every=JOB_POLL_S)
+def job_progress(lang: str):
+    """Progression des tâches de la session ; redessine la page quand l'une d'elles se termine."""
+    pending = pending_jobs()
+    if len(pending) < len(st.session_state.get("jobs", [])):
+        st.rerun()  # résultat prêt : collect_jobs le fait entrer dans la session
+    for job in pending:
+        if job.status == "queued":
+            st.info(LABELS[lang]["queue_position"].format(n=scheduler.position(job.id)))
         else:
-            st.session_state[f"essais_{user_id}"] += 1
-            log_usage(user_id, lang, activity, st.session_state[f"essais_{user_id}"])
-
-            with st.spinner(LABELS[lang]["writing"]):
-                try:
-                    # Construire le prompt enrichi
-                    prompt = f"Langue : {lang}. Activité : {activity}. Auteur : {author}\n"
-                    prompt += "Tu dois créer un texte adapté aux enfants (6–14 ans). "
-                    prompt += "Le texte doit être positif, créatif, structuré et bienveillant.\n\n"
-
-                    # Consignes spécifiques par activité
-                    if activity == "Poème":
-                        prompt += (
-                            "Consignes pour le poème :\n"
-                            "- Respecter le style choisi (alexandrin, haïku, rimes libres, etc.)\n"
-                            "- Longueur : 2 à 4 strophes.\n"
-                            "- Ton adapté aux enfants.\n\n"
-                        )
-                    elif activity == "Chanson":
-                        prompt += (
-                            "Consignes pour la chanson :\n"
-                            "- Respecter le style musical choisi (pop, jazz, rap, folk...)\n"
-                            "- Structure : plusieurs couplets courts + un refrain répété.\n"
-                            "- Ambiance adaptée aux enfants.\n"
-                            "- Fournir aussi une suggestion musicale simple (ex : accords C-G-Am-F, rythme 4/4, tempo modéré).\n\n"
-                        )
-                    elif activity == "Saynette":
-                        prompt += (
-                            "Consignes pour la saynette :\n"
-                            "- Respecter le style théâtral choisi (comédie, vaudeville, drame, comédie musicale...)\n"
-                            "- Dialogue entre 2 à 4 personnages.\n"
-                            "- De 6 à 12 répliques.\n"
-                            "- Si c’est une comédie musicale, ajouter aussi une indication de rythme ou de style musical (ex : jazz, pop, folk, tempo rapide ou lent).\n\n"
-                        )
-                    elif activity == "Histoire":
-                        prompt += (
-                            "Consignes pour l’histoire :\n"
-                            "- Structure claire : début, problème, solution, fin.\n"
-                            "- Ton choisi par l’utilisateur (drôle, mystérieux, épique...)\n"
-                            "- Fin souhaitée (heureuse, morale, surprenante...)\n\n"
-                        )
-                    elif activity == "Libre":
-                        prompt += (
-                            "Consignes pour le texte libre :\n"
-                            "- Respecter le type choisi (lettre, dialogue, journal...)\n"
-                            "- Ton narratif choisi (réaliste, imaginaire, poétique...)\n\n"
-                        )
-
-                    # Intégrer toutes les réponses utilisateur
-                    prompt += "Voici les réponses données par l’utilisateur :\n"
-                    for k, a in enumerate(answers, 1):
-                        if a:
-                            prompt += f"- Q{k}: {a}\n"
-
-                    prompt += "\nMaintenant, rédige le texte en suivant ces éléments."
-
-                    # ==== Appel OpenAI ====
-                    resp = client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": "Tu es un assistant créatif pour enfants."},
-                            {"role": "user", "content": prompt},
-                        ],
-                        temperature=0.9,
-                        max_tokens=700,
-                    )
-                    story = resp.choices[0].message.content.strip()
-
-                    # ==== Résultat ====
-                    st.success(LABELS[lang]["result_title"])
-                    st.markdown(f"<div class='result-box'>{story}</div>", unsafe_allow_html=True)
-
-                    # ==== Export PDF ====
-                    def create_pdf(text: str) -> str:
-                        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-                        c = canvas.Canvas(tmp_file.name, pagesize=A4)
-                        width, height = A4
-                        c.setFont("Helvetica-Bold", 22)
-                        c.drawCentredString(width/2, height - 4*cm, "Atelier Créatif — EDU")
-                        c.setFont("Helvetica", 16)
-                        c.drawCentredString(width/2, height - 5*cm, activity)
-                        c.setFont("Helvetica-Oblique", 10)
-                        c.drawCentredString(width/2, height - 6*cm, datetime.now().strftime("%d/%m/%Y"))
-                        c.showPage()
-                        c.setFont("Helvetica", 12)
-                        y = height - 3*cm
-                        for line in text.split("\n"):
-                            parts = [line[i:i+90] for i in range(0, len(line), 90)] if line else [""]
-                            for sub in parts:
-                                c.drawString(2*cm, y, sub)
-                                y -= 15
-                                if y < 2*cm:
-                                    c.showPage()
-                                    c.setFont("Helvetica", 12)
-                                    y = height - 3*cm
-                        c.save()
-                        return tmp_file.name
-
-                    pdf_path = create_pdf(story)
-                    with open(pdf_path, "rb") as f:
-                        st.download_button(
-                            label=LABELS[lang]["pdf_dl"],
-                            data=f,
-                            file_name="atelier_creatif.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-
-                except Exception as e:
-                    st.error(f"❌ Erreur OpenAI : {e}")
+            st.success(LABELS[lang]["result_title"])
+            if job.text:
+                st.markdown(f"<div class='result-box'>{job.text}</div>", unsafe_allow_html=True)
+            else:
+                st.info(LABELS[lang]["writing"])
+
+def current_creation(user_id: str, activity: str):
+    """Création affichée : celle choisie dans la session si elle est de cette activité, sinon la dernière."""
+    creation_id = st.session_state.get("creation_id")
+    creation = creations.get(user_id, creation_id) if creation_id else None
+    if creation is None or creation.activity != activity:
+        creation = creations.latest(user_id, activity)
+    return creation
+
+def open_creation(creation):
+    """Callback « Afficher » : la création choisie devient la création courante."""
+    st.session_state.creation_id = creation.id
+    st.session_state.lang = creation.lang
+    st.session_state.activity = creation.activity
+
+def creations_history(lang: str, activity: str, user_id: str):
+    """Historique « Mes créations », page par page."""
+    total = creations.count(user_id)
+    with st.expander(LABELS[lang]["my_creations"].format(n=total)):
+        if not total:
+            st.caption(LABELS[lang]["no_creations"])
+            return
+        pages = -(-total // CREATIONS_PER_PAGE)
+        page = min(st.session_state.get("creations_page", 0), pages - 1)
+        for creation in creations.page(user_id, page, CREATIONS_PER_PAGE):
+            created = time.strftime("%d/%m/%Y %H:%M", time.localtime(creation.created_at))
+            st.markdown(f"**{creation.activity}** · {creation.lang} · {created}")
+            preview = " ".join(creation.text.split())
+            st.caption(preview[:120] + ("…" if len(preview) > 120 else ""))
+            col_open, col_dl = st.columns(2)
+            col_open.button(LABELS[lang]["open_creation"], key=f"open_creation_{creation.id}",
+                            on_click=open_creation, args=(creation,), use_container_width=True)
+            col_dl.download_button(
+                label=LABELS[lang]["pdf_dl"],
+                data=lambda creation_id=creation.id: creations.pdf(user_id, creation_id),
+                file_name=f"atelier_creatif_{creation.id}.pdf",
+                mime="application/pdf",
+                key=f"dl_creation_{creation.id}",
+                use_container_width=True
+            )
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        col_prev.button("◀", key="creations_prev", disabled=page == 0, use_container_width=True,
+                        on_click=lambda: st.session_state.update(creations_page=page - 1))
+        col_page.caption(LABELS[lang]["page_of"].format(page=page + 1, pages=pages))
+        col_next.button("▶", key="creations_next", disabled=page >= pages - 1, use_container_width=True,
+                        on_click=lambda: st.session_state.update(creations_page=page + 1))
+
+@st.fragment
+def result_panel(lang: str, activity: str, user_id: str):
+    if (st.session_state.lang, st.session_state.activity) != (lang, activity):
+        st.rerun()  # création d'une autre langue ou activité ouverte : toute la page change
+    with timed("résultat"):
+        collect_jobs(lang, activity)
+        answers = current_answers(lang, activity)
+        author = st.session_state.get("author_input", LABELS[lang]["default_author"])
+
+        # Afficher quota
+        st.caption(LABELS[lang]["tries_left"].format(n=quota.remaining(user_id, activity), limit=quota.user_limit))
+
+        if st.button(LABELS[lang]["generate"], use_container_width=True, type="primary"):
+            if not any(answers):
+                st.error(LABELS[lang]["need_answers"])
+            else:
+                with trace_span("quota"):
+                    decision = quota.try_acquire(user_id, activity)
+                if not decision.allowed:
+                    quota_warning(decision)
+                else:
+                    params = build_request(lang, activity, author, answers)
+                    try:
+                        with trace_span("file : dépôt"):
+                            job = scheduler.submit(user_id, generation_job(user_id, lang, activity, params))
+                    except AdmissionError as e:
+                        quota.refund(user_id, activity)  # refusé par la file : l'essai n'est pas perdu
+                        st.warning(LABELS[lang]["queue_busy" if e.reason == "user" else "queue_full"])
+                    else:
+                        log_usage(user_id, lang, activity, decision.used, answers)  # réponses : pour warm_pool.py
+                        st.session_state.jobs = [*st.session_state.get("jobs", []), job.id]
+
+        if pending_jobs():
+            # Le résultat arrive en arrière-plan : la page reste utilisable pendant l'attente
+            job_progress(lang)
+        else:
+            error = st.session_state.pop("job_error", None)
+            if isinstance(error, CircuitOpenError):
+                st.error(f"⏳ {error}")
+            elif error:
+                st.error(f"❌ Erreur OpenAI : {error}")
+            # Création courante relue dans le store : survit aux reruns et aux changements de réplica
+            creation = current_creation(user_id, activity)
+            if creation:
+                st.success(LABELS[lang]["result_title"])
+                st.markdown(f"<div class='result-box'>{creation.text}</div>", unsafe_allow_html=True)
+                latency = st.session_state.get("creation_latency")
+                if latency and latency["creation_id"] == creation.id:
+                    st.caption(LABELS[lang]["latency"].format(ttft=latency["ttft"], total=latency["total"]))
+                    if latency.get("truncated"):
+                        st.caption(LABELS[lang]["truncated"])
+                st.download_button(
+                    label=LABELS[lang]["pdf_dl"],
+                    data=lambda: creations.pdf(user_id, creation.id),  # PDF déjà rendu, lu au clic
+                    file_name="atelier_creatif.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+
+        with st.expander(LABELS[lang]["class_pack"]):
+            # Un texte du pack = un appel au backend : les packs ont leur propre quota de textes
+            pack_left = quota.remaining_pack(user_id)
+            pack_max = min(PACK_MAX, pack_left)
+            st.caption(LABELS[lang]["pack_cost"].format(left=pack_left, limit=quota.pack_limit))
+            if pack_max >= 2:
+                pack_n = int(st.number_input(LABELS[lang]["pack_count"], min_value=2, max_value=pack_max,
+                                             value=min(25, pack_max), step=1))
+            if pack_max >= 2 and st.button(LABELS[lang]["pack_generate"], use_container_width=True):
+                if not any(answers):
+                    st.error(LABELS[lang]["need_answers"])
+                else:
+                    decision = quota.try_acquire_pack(user_id, pack_n)
+                    if not decision.allowed:
+                        quota_warning(decision)
+                    else:
+                        base = build_request(lang, activity, author, answers)
+
+                        on_usage = usage_recorder(lang, activity)
+                        trace = current_trace()  # les variantes tournent dans d'autres threads
+
+                        def generate_one(i: int) -> str:
+                            t0 = time.perf_counter()
+                            try:
+                                with metrics.time("atelier_upstream_seconds", lang=lang, activity=activity):
+                                    # Texte coupé : redemandé une fois avec un budget plus large
+                                    text, cut = generate_complete(
+                                        llm, dict(variant_params(base, i, pack_n), timeout=PACK_TIMEOUT_S),
+                                        on_usage=on_usage,
+                                    )
+                                if cut:
+                                    metrics.inc("atelier_truncated_total", lang=lang, activity=activity)
+                                return text
+                            finally:
+                                if trace is not None:
+                                    trace.add(f"backend (variante {i})", t0)
+
+                        try:
+                            with st.spinner(LABELS[lang]["writing"]), trace_span("pack", n=pack_n):
+                                # Variantes dans la file de génération (workers et admission partagés) ;
+                                # les reprises sont faites par le client partagé (llm), pas une seconde fois ici
+                                pack = generate_variants(generate_one, pack_n, retries=0,
+                                                         run=lambda tasks: scheduler.map(user_id, tasks))
+                        except AdmissionError as e:
+                            quota.refund_pack(user_id, pack_n)  # refusé par la file : textes rendus
+                            st.warning(LABELS[lang]["queue_busy" if e.reason == "user" else "queue_full"])
+                        else:
+                            # Une ligne du journal par texte généré ; les variantes en échec sont rendues
+                            quota.refund_pack(user_id, pack_n - pack.ok)
+                            first = decision.used - pack_n
+                            for i in range(1, pack.ok + 1):
+                                log_usage(user_id, lang, activity, first + i)
+                            st.caption(LABELS[lang]["pack_done"].format(
+                                ok=pack.ok, n=pack_n, wall=pack.wall_s, seq=pack.sequential_s
+                            ))
+                            for i, error in pack.errors:
+                                st.warning(f"❌ Version {i} : {error}")
+                            if pack.ok:
+                                metrics.inc("atelier_generations_total", pack.ok, source="pack", lang=lang, activity=activity)
+                                chapters = [
+                                    (f"{activity} {i}/{pack_n}", text)
+                                    for i, text in enumerate(pack.texts, 1) if text
+                                ]
+                                with metrics.time("atelier_pdf_seconds", lang=lang, activity=activity), trace_span("pdf (livret)"):
+                                    booklet = render_booklet(chapters, activity)
+                                st.download_button(
+                                    label=LABELS[lang]["pack_dl"],
+                                    data=booklet,
+                                    file_name="atelier_creatif_pack.pdf",
+                                    mime="application/pdf",
+                                    use_container_width=True
+                                )
+
+        with trace_span("historique"):
+            creations_history(lang, activity, user_id)
+
+result_panel(lang, activity, user_id)
 
 # =========================
 # SECTION ADMIN (Accès protégé)
 # =========================
-from pathlib import Path
-import pandas as pd
-
-st.sidebar.markdown("---")
-st.sidebar.markdown("### 🔒 Accès administrateur")
-
-admin_code = st.sidebar.text_input("Code admin :", type="password")
-
-if admin_code == os.environ.get("ADMIN_CODE", "1234"):
-    st.sidebar.success("✅ Accès admin activé")
-
-    log_file = Path("logs.csv")
-
-    if log_file.exists():
-        # Téléchargement CSV
-        with open(log_file, "rb") as f:
-            st.sidebar.download_button(
-                label="⬇️ Télécharger les logs (CSV)",
-                data=f,
-                file_name="logs.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
-
-        # Lecture du fichier log
-        df = pd.read_csv(log_file)
-
-        st.sidebar.markdown("### 📊 Statistiques")
-
-        # Nombre total d’essais
-        total_essais = len(df)
-        st.sidebar.metric("Nombre total d’essais", total_essais)
-
-        # Vérifier colonnes avant affichage
-        if "user_id" in df.columns and "essais" in df.columns:
-            essais_user = df.groupby("user_id")["essais"].max().reset_index()
-            essais_user = essais_user.rename(columns={"essais": "Nb essais"})
-            st.sidebar.markdown("👤 Par utilisateur")
-            st.sidebar.dataframe(essais_user, use_container_width=True, height=200)
+@st.fragment
+def admin_panel():
+    with timed("admin"):
+        st.markdown("---")
+        st.markdown("### 🔒 Accès administrateur")
+
+        admin_code = st.text_input("Code admin :", type="password")
+
+        if admin_code == os.environ.get("ADMIN_CODE", "1234"):
+            st.success("✅ Accès admin activé")
+
+            usage_store.import_csv("logs.csv")  # seulement les octets ajoutés depuis la dernière lecture
+            total_essais = usage_store.total()
+
+            if total_essais:
+                # Téléchargement CSV (export du journal SQLite)
+                st.download_button(
+                    label="⬇️ Télécharger les logs (CSV)",
+                    data=usage_store.export_csv(),
+                    file_name="logs.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+
+                st.markdown("### 📊 Statistiques")
+
+                # Nombre total d’essais
+                st.metric("Nombre total d’essais", total_essais)
+
+                # Séries temporelles
+                granularity = st.radio(
+                    "📈 Activité", ["hour", "day"], horizontal=True,
+                    format_func=lambda g: {"hour": "Par heure", "day": "Par jour"}[g]
+                )
+                series = pd.DataFrame(usage_store.series(granularity), columns=["Tranche", "Nb essais"])
+                st.bar_chart(series, x="Tranche", y="Nb essais", height=200)
+
+                # Compteurs matérialisés
+                essais_user = pd.DataFrame(usage_store.per_user(), columns=["user_id", "Nb essais"])
+                st.markdown("👤 Par utilisateur")
+                st.dataframe(essais_user, use_container_width=True, height=200)
+
+                essais_lang = pd.DataFrame(usage_store.per_lang(), columns=["Langue", "Nb essais"])
+                st.markdown("🌍 Par langue")
+                st.dataframe(essais_lang, use_container_width=True, height=200)
+
+                essais_act = pd.DataFrame(usage_store.per_activity(), columns=["Activité", "Nb essais"])
+                st.markdown("🎭 Par activité")
+                st.dataframe(essais_act, use_container_width=True, height=200)
+
+                # Combinaisons les plus demandées et variantes prêtes en cache (warm_pool.py)
+                combos = []
+                for combo_lang, combo_activity, combo_answers, n in usage_store.top_combos(10):
+                    if combo_lang in LABELS:
+                        key = pool_key(combo_lang, combo_activity, LABELS[combo_lang]["default_author"], combo_answers)
+                        combos.append((combo_lang, combo_activity, " / ".join(a for a in combo_answers if a),
+                                       n, gen_cache.count(key)))
+                if combos:
+                    st.markdown("🔥 Combinaisons les plus demandées")
+                    st.dataframe(
+                        pd.DataFrame(combos, columns=["Langue", "Activité", "Réponses", "Nb essais", "Variantes prêtes"]),
+                        use_container_width=True, height=200
+                    )
 
-        if "lang" in df.columns:
-            essais_lang = df["lang"].value_counts().reset_index()
-            essais_lang.columns = ["Langue", "Nb essais"]
-            st.sidebar.markdown("🌍 Par langue")
-            st.sidebar.dataframe(essais_lang, use_container_width=True, height=200)
+            else:
+                st.info("📂 Aucun log enregistré pour l’instant.")
+
+            # File d'écriture du journal
+            writer_stats = usage_writer.stats()
+            st.markdown("### 📝 File du journal")
+            w1, w2, w3 = st.columns(3)
+            w1.metric("En attente", writer_stats["queued"])
+            w2.metric("Écrits", writer_stats["written"])
+            w3.metric("Perdus", writer_stats["dropped"])
+
+            # Quotas
+            quota_stats = quota.snapshot()
+            st.markdown("### 🎟️ Quotas")
+            q1, q2, q3 = st.columns(3)
+            q1.metric("Jetons globaux", f"{quota_stats['global_tokens']:.0f}/{quota_stats['global_burst']}")
+            q2.metric("Utilisateurs", quota_stats["users"])
+            q3.metric("Épuisés", quota_stats["exhausted"])
+            if quota_stats["per_user"]:
+                st.dataframe(
+                    pd.DataFrame(quota_stats["per_user"], columns=["user_id", "Essais consommés"]),
+                    use_container_width=True, height=200
+                )
+
+            # Cache des générations
+            cache_stats = gen_cache.stats()
+            st.markdown("### 🗃️ Cache des générations")
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Hits", cache_stats["hits"])
+            c2.metric("Misses", cache_stats["misses"])
+            c3.metric("Taux", f"{cache_stats['hit_rate']:.0%}")
+            st.caption(f"{cache_stats['entries']} textes pour {cache_stats['keys']} prompts distincts")
+
+            # File de génération
+            queue_stats = scheduler.stats()
+            st.markdown("### 🚦 File de génération")
+            g1, g2, g3, g4 = st.columns(4)
+            g1.metric("En attente", queue_stats["queued"])
+            g2.metric("En cours", f"{queue_stats['running']}/{queue_stats['workers']}")
+            g3.metric("Refusées", queue_stats["rejected"])
+            g4.metric("Attente p50", f"{queue_stats['wait_p50_s']:.1f} s")
+            st.caption(f"{queue_stats['done']} terminées, {queue_stats['failed']} en échec, "
+                       f"attente max {queue_stats['wait_max_s']:.1f} s, {queue_stats['groups']} classe(s) en file")
+
+            # Mesures du processus (également exportées au format Prometheus)
+            st.markdown("### 📊 Mesures (ce processus)")
+            for error in metrics.export_errors:
+                st.warning(error)
+            per_activity = {}
+            for name in ("atelier_generations_total", "atelier_prompt_tokens_total",
+                         "atelier_completion_tokens_total", "atelier_cost_usd_total"):
+                for labels, value in metrics.series(name):
+                    row = per_activity.setdefault((labels["lang"], labels["activity"]), {})
+                    row[name] = row.get(name, 0) + value
+            if per_activity:
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Langue": lang_key, "Activité": act_key,
+                        "Générations": int(row.get("atelier_generations_total", 0)),
+                        "Jetons prompt": int(row.get("atelier_prompt_tokens_total", 0)),
+                        "Jetons réponse": int(row.get("atelier_completion_tokens_total", 0)),
+                        "Coût ($)": round(row.get("atelier_cost_usd_total", 0), 4),
+                        "Amont p50 (s)": round(metrics.quantile("atelier_upstream_seconds", 0.5,
+                                                                lang=lang_key, activity=act_key), 2),
+                        "Amont p95 (s)": round(metrics.quantile("atelier_upstream_seconds", 0.95,
+                                                                lang=lang_key, activity=act_key), 2),
+                    }
+                    for (lang_key, act_key), row in sorted(per_activity.items())
+                ]), use_container_width=True, height=200)
+            histogram_names = {
+                "atelier_upstream_seconds": "Appel au backend",
+                "atelier_upstream_ttft_seconds": "Premier fragment du backend",
+                "atelier_queue_wait_seconds": "Attente en file",
+                "atelier_pdf_seconds": "Construction du PDF",
+                "atelier_rerun_seconds": "Rerun complet",
+            }
+            histogram = st.selectbox("Histogramme", list(histogram_names), format_func=histogram_names.get)
+            counts = metrics.histogram_counts(histogram)
+            if any(n for _, n in counts):
+                st.bar_chart(pd.DataFrame(
+                    [(f"≤ {bound:g} s" if bound != float("inf") else "> max", n) for bound, n in counts],
+                    columns=["Durée", "Nombre"]
+                ), x="Durée", y="Nombre", height=200)
+                st.caption(f"p50 {metrics.quantile(histogram, 0.5):.2f} s · p95 {metrics.quantile(histogram, 0.95):.2f} s")
+            st.download_button("⬇️ Exporter (Prometheus)", data=metrics.render, file_name="atelier_metrics.prom",
+                               mime="text/plain", use_container_width=True)
+
+            # Demandes identiques simultanées
+            flight_stats = in_flight.stats()
+            st.markdown("### 🔁 Demandes identiques regroupées")
+            f1, f2, f3 = st.columns(3)
+            f1.metric("Appels lancés", flight_stats["issued"])
+            f2.metric("Regroupées", flight_stats["coalesced"])
+            f3.metric("En cours", flight_stats["in_flight"])
+
+            # Backend de génération
+            llm_stats = llm.stats()
+            st.markdown(f"### 🔌 Backend de génération ({llm.name})")
+            stat_labels = {"calls": "Appels", "retries": "Reprises", "failures": "Échecs", "breaker": "Disjoncteur"}
+            for col, (key, value) in zip(st.columns(len(llm_stats)), llm_stats.items()):
+                col.metric(stat_labels.get(key, key), value)
+
+            # Images du carrousel : octets envoyés par vue
+            image_report = image_assets.report(fmt=IMAGE_FORMAT)
+            before = sum(orig for _, orig, _ in image_report) / len(image_report)
+            after = sum(served for _, _, served in image_report) / len(image_report)
+            st.markdown("### 🖼️ Images du carrousel")
+            i1, i2 = st.columns(2)
+            i1.metric("Avant (Ko/vue)", f"{before / 1000:.0f}")
+            i2.metric("Après (Ko/vue)", f"{after / 1000:.0f}", f"{after / before - 1:.0%}", delta_color="inverse")
+
+            # Profilage : traces par étapes (échantillonnées ou demandées), cProfile en option
+            trace_stats = tracer.stats()
+            st.markdown("### 🔬 Profilage")
+            rate = st.slider("Reruns tracés, toutes sessions (%)", 0.0, 100.0,
+                             float(trace_stats["sample_rate"] * 100), step=0.5)
+            if rate / 100 != tracer.sample_rate:
+                tracer.sample_rate = rate / 100
+            p1, p2 = st.columns(2)
+            profile_n = int(p1.number_input("Reruns à profiler (cette session)", min_value=1, max_value=20, value=3))
+            with_cprofile = p2.checkbox("Avec cProfile", value=True)
+            st.button("▶️ Profiler les prochains reruns", use_container_width=True,
+                      on_click=lambda: st.session_state.update(profile_reruns=profile_n, profile_cprofile=with_cprofile))
+            if st.session_state.get("profile_reruns"):
+                st.caption(f"{st.session_state.profile_reruns} rerun(s) de cette session encore à profiler")
+            st.caption(f"{trace_stats['traced']} trace(s) écrite(s) dans {tracer.directory}/ "
+                       f"(dont {trace_stats['profiled']} avec cProfile), {trace_stats['dropped']} interrompue(s)")
+            traces = tracer.recent()
+            if traces:
+                trace = traces[st.selectbox(
+                    "Trace", range(len(traces)),
+                    format_func=lambda i: (f"{time.strftime('%H:%M:%S', time.localtime(traces[i].started_at))} · "
+                                           f"{traces[i].name} · {traces[i].duration_s * 1000:.0f} ms"
+                                           + (" · cProfile" if traces[i].profiled else ""))
+                )]
+                st.dataframe(pd.DataFrame(
+                    [(name, thread, round(start * 1000, 1), round(duration * 1000, 1))
+                     for name, start, duration, (_, thread), _ in sorted(trace.spans, key=lambda s: (s[1], -s[2]))],
+                    columns=["Étape", "Thread", "Début (ms)", "Durée (ms)"]
+                ), use_container_width=True, height=200)
+                if trace.profiled:
+                    st.dataframe(pd.DataFrame(
+                        trace.hotspots(), columns=["Fonction", "Appels", "Propre (s)", "Cumulé (s)"]
+                    ), use_container_width=True, height=200)
+                st.download_button("⬇️ Trace (chrome://tracing, Perfetto)",
+                                   data=lambda: json.dumps(trace.chrome(), ensure_ascii=False),
+                                   file_name=trace.path.name if trace.path else "trace.json",
+                                   mime="application/json", use_container_width=True)
+
+            # Chronométrage des sections (superposition en bas à droite)
+            show = st.toggle("⏱️ Chronométrage des sections", value=st.session_state.show_timings)
+            if show != st.session_state.show_timings:
+                st.session_state.show_timings = show
+                st.rerun()  # rerun complet pour afficher / masquer l'encart
+        else:
+            if admin_code:
+                st.error("❌ Code incorrect")
 
-        if "activity" in df.columns:
-            essais_act = df["activity"].value_counts().reset_index()
-            essais_act.columns = ["Activité", "Nb essais"]
-            st.sidebar.markdown("🎭 Par activité")
-            st.sidebar.dataframe(essais_act, use_container_width=True, height=200)
+with st.sidebar:
+    admin_panel()
 
-    else:
-        st.sidebar.info("📂 Aucun log enregistré pour l’instant.")
-else:
-    if admin_code:
-        st.sidebar.error("❌ Code incorrect")
+# =========================
+# CHRONOMÉTRAGE (superposition)
+# =========================
+record_timing("rerun complet", RERUN_T0)
+metrics.observe("atelier_rerun_seconds", time.perf_counter() - RERUN_T0, lang=lang, activity=activity)
+end_trace(rerun_trace)
+FULL_RERUN = False
+if st.session_state.get("show_timings"):
+    timing_overlay()
@@ -0,0 +1,373 @@
+"""Journal d'utilisation indexé (SQLite en mode WAL).
+
+Remplace l'ancien `logs.csv` en écriture append : plusieurs sessions
+Streamlit peuvent écrire en parallèle. Chaque insertion met aussi à jour,
+dans la même transaction, des compteurs matérialisés (par utilisateur,
+langue, activité, heure et jour) : les statistiques admin se lisent en
+temps constant, quelle que soit la taille du journal. Les réponses aux
+questions sont gardées avec chaque génération : les combinaisons les plus
+demandées (langue, activité, réponses) servent à préremplir le cache
+(`warm_pool.py`).
+`UsageLogWriter` sort l'écriture du chemin de la requête : les événements
+passent par une file vidée par lots dans un thread de fond.
+"""
+import atexit
+import csv
+import io
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+HEADERS = ["timestamp", "user_id", "lang", "activity", "essais"]
+
+# Granularités des séries temporelles : préfixe du timestamp à conserver
+BUCKETS = {"hour": 13, "day": 10}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    essais INTEGER NOT NULL,
+    answers TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_usage_timestamp ON usage(timestamp);
+CREATE INDEX IF NOT EXISTS idx_usage_user ON usage(user_id, essais);
+CREATE INDEX IF NOT EXISTS idx_usage_lang ON usage(lang);
+CREATE INDEX IF NOT EXISTS idx_usage_activity ON usage(activity);
+CREATE TABLE IF NOT EXISTS usage_counters (
+    dim TEXT NOT NULL,
+    key TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    max_essais INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dim, key)
+);
+CREATE TABLE IF NOT EXISTS usage_buckets (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class UsageStore:
+    """Accès au journal d'utilisation, partageable entre threads."""
+
+    def __init__(self, path="usage.db"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(usage)")]
+        if "answers" not in columns:  # base créée avant l'enregistrement des réponses
+            self._conn.execute("ALTER TABLE usage ADD COLUMN answers TEXT")
+        self._conn.commit()
+        # Base créée avant les compteurs : on les reconstruit une fois
+        if self.total() == 0 and self._query("SELECT 1 FROM usage LIMIT 1"):
+            self.rebuild_counters()
+
+    # -------------------------
+    # Écriture
+    # -------------------------
+    def record(self, user_id: str, lang: str, activity: str, essais: int, timestamp: str = None,
+               answers: list = None):
+        """Enregistre une génération (avec les réponses aux questions si fournies)."""
+        self.record_many([(timestamp, user_id, lang, activity, essais, answers)])
+
+    def record_many(self, rows):
+        """Enregistre plusieurs lignes (timestamp, user_id, lang, activity, essais[, answers]) en une transaction."""
+        with self._lock:
+            self._insert(rows)
+            self._conn.commit()
+
+    def import_csv(self, csv_path) -> int:
+        """Importe les lignes ajoutées à un `logs.csv` depuis le dernier appel.
+
+        Seuls les octets situés après le dernier offset mémorisé sont lus, et
+        seules les lignes complètes sont consommées : on peut rappeler cette
+        méthode à chaque affichage admin sans relire le fichier entier.
+        Renvoie le nombre de lignes importées.
+        """
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            return 0
+        offset_key = f"csv_offset:{csv_path.resolve()}"
+        legacy_key = f"csv_import:{csv_path.resolve()}"
+        size = csv_path.stat().st_size
+        if self._csv_offset(offset_key, legacy_key, size) == size:
+            return 0  # rien de nouveau : pas de verrou d'écriture
+        with self._lock:
+            # Plusieurs processus importent le même fichier : l'offset est relu sous
+            # verrou d'écriture SQLite, et les lignes et l'offset validés ensemble
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                size = csv_path.stat().st_size
+                offset = self._csv_offset(offset_key, legacy_key, size, locked=True)
+                with open(csv_path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+                end = chunk.rfind(b"\n") + 1  # ignorer une dernière ligne en cours d'écriture
+                if end == 0:
+                    self._conn.rollback()
+                    return 0
+                lines = chunk[:end].decode("utf-8").splitlines()
+                if offset == 0 and lines and lines[0].startswith("timestamp"):
+                    lines = lines[1:]
+                rows = [
+                    (r[0], r[1], r[2], r[3], r[4] or 0)
+                    for r in csv.reader(lines) if len(r) >= len(HEADERS)
+                ]
+                self._insert(rows)
+                self._upsert_meta(offset_key, str(offset + end))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return len(rows)
+
+    def rebuild_counters(self):
+        """Recalcule les compteurs matérialisés à partir du journal complet."""
+        with self._lock:
+            self._conn.execute("DELETE FROM usage_counters")
+            self._conn.execute("DELETE FROM usage_buckets")
+            rows = self._conn.execute(f"SELECT {', '.join(HEADERS)}, answers FROM usage").fetchall()
+            self._update_counters(rows)
+            self._conn.commit()
+
+    # -------------------------
+    # Statistiques (compteurs matérialisés)
+    # -------------------------
+    def total(self) -> int:
+        row = self._query("SELECT n FROM usage_counters WHERE dim = 'total' AND key = ''")
+        return row[0][0] if row else 0
+
+    def per_user(self):
+        """[(user_id, nb essais max)] — équivalent de groupby("user_id")["essais"].max()."""
+        return self._query("SELECT key, max_essais FROM usage_counters WHERE dim = 'user' ORDER BY key")
+
+    def per_lang(self):
+        """[(lang, nb)] par fréquence décroissante."""
+        return self._query("SELECT key, n FROM usage_counters WHERE dim = 'lang' ORDER BY n DESC")
+
+    def per_activity(self):
+        """[(activité, nb)] par fréquence décroissante."""
+        return self._query("SELECT key, n FROM usage_counters WHERE dim = 'activity' ORDER BY n DESC")
+
+    def top_combos(self, limit: int = 20, min_count: int = 1):
+        """[(lang, activité, réponses, nb)] des combinaisons de réponses les plus fréquentes."""
+        rows = self._query(
+            "SELECT key, n FROM usage_counters WHERE dim = 'combo' AND n >= ? ORDER BY n DESC, key LIMIT ?",
+            (min_count, limit),
+        )
+        return [(*json.loads(key), n) for key, n in rows]
+
+    def series(self, granularity: str = "hour", limit: int = 48):
+        """[(tranche, nb)] des `limit` dernières tranches horaires ou journalières, dans l'ordre."""
+        if granularity not in BUCKETS:
+            raise ValueError(f"Granularité inconnue : {granularity}")
+        rows = self._query(
+            "SELECT bucket, n FROM usage_buckets WHERE granularity = ? ORDER BY bucket DESC LIMIT ?",
+            (granularity, limit),
+        )
+        return rows[::-1]
+
+    def export_csv(self) -> bytes:
+        """Export complet au format de l'ancien `logs.csv`."""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(HEADERS)
+        writer.writerows(self._query(f"SELECT {', '.join(HEADERS)} FROM usage ORDER BY id"))
+        return buf.getvalue().encode("utf-8")
+
+    # -------------------------
+    # Interne
+    # -------------------------
+    def _query(self, sql: str, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _insert(self, rows):
+        now = datetime.now().strftime(TS_FORMAT)
+        values = [
+            (ts or now, user_id if user_id else "inconnu", lang, activity, int(essais),
+             _encode_answers(extra[0] if extra else None))
+            for ts, user_id, lang, activity, essais, *extra in rows
+        ]
+        self._conn.executemany(
+            "INSERT INTO usage (timestamp, user_id, lang, activity, essais, answers) VALUES (?, ?, ?, ?, ?, ?)",
+            values,
+        )
+        self._update_counters(values)
+
+    def _update_counters(self, values):
+        counts = Counter()
+        max_essais = {}
+        buckets = Counter()
+        for ts, user_id, lang, activity, essais, answers in values:
+            counts["total", ""] += 1
+            counts["user", user_id] += 1
+            counts["lang", lang] += 1
+            counts["activity", activity] += 1
+            max_essais[user_id] = max(max_essais.get(user_id, 0), essais)
+            if answers:
+                counts["combo", json.dumps([lang, activity, json.loads(answers)], ensure_ascii=False)] += 1
+            for granularity, width in BUCKETS.items():
+                buckets[granularity, ts[:width]] += 1
+        self._conn.executemany(
+            "INSERT INTO usage_counters (dim, key, n, max_essais) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(dim, key) DO UPDATE SET n = n + excluded.n, "
+            "max_essais = MAX(max_essais, excluded.max_essais)",
+            [
+                (dim, key, n, max_essais.get(key, 0) if dim == "user" else 0)
+                for (dim, key), n in counts.items()
+            ],
+        )
+        self._conn.executemany(
+            "INSERT INTO usage_buckets (granularity, bucket, n) VALUES (?, ?, ?) "
+            "ON CONFLICT(granularity, bucket) DO UPDATE SET n = n + excluded.n",
+            [(granularity, bucket, n) for (granularity, bucket), n in buckets.items()],
+        )
+
+    def _meta(self, key: str, locked: bool = False):
+        sql, args = "SELECT value FROM meta WHERE key = ?", (key,)
+        row = self._conn.execute(sql, args).fetchall() if locked else self._query(sql, args)
+        return row[0][0] if row else None
+
+    def _csv_offset(self, offset_key: str, legacy_key: str, size: int, locked: bool = False) -> int:
+        offset = self._meta(offset_key, locked)
+        if offset is None and self._meta(legacy_key, locked) is not None:
+            offset = size  # déjà importé en entier par l'ancien import unique
+        offset = int(offset or 0)
+        return 0 if offset > size else offset  # fichier tronqué ou remplacé : on repart du début
+
+    def _upsert_meta(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+def _encode_answers(answers):
+    # Liste JSON telle que saisie (positions comprises : elles numérotent les questions du prompt)
+    return json.dumps(list(answers), ensure_ascii=False) if answers and any(answers) else None
+
+
+class UsageLogWriter:
+    """Écriture asynchrone et par lots vers un `UsageStore`.
+
+    Les événements sont empilés sans attente ; un thread de fond les écrit
+    dès que `batch_size` événements sont en attente ou que `flush_ms`
+    millisecondes se sont écoulées. Si la file est pleine, l'événement est
+    abandonné (et compté) plutôt que de bloquer la page. Un vidage final est
+    garanti à l'arrêt du processus.
+    """
+
+    _STOP = object()
+
+    def __init__(self, store: UsageStore, batch_size: int = 50, flush_ms: int = 500, max_queue: int = 10000):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._counts_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, user_id: str, lang: str, activity: str, essais: int, answers: list = None) -> bool:
+        """Empile un événement (horodaté maintenant) ; renvoie False s'il a été abandonné."""
+        row = (datetime.now().strftime(TS_FORMAT), user_id, lang, activity, essais, answers)
+        if self._closed:
+            self._count(dropped=1)
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+
+    def flush(self):
+        """Bloque jusqu'à ce que tous les événements empilés soient écrits."""
+        self._queue.join()
+
+    def close(self):
+        """Vide la file puis arrête le thread d'écriture (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+            }
+
+    # -------------------------
+    # Thread de fond
+    # -------------------------
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            first = self._queue.get()
+            if first is self._STOP:
+                self._queue.task_done()
+                break
+            batch.append(first)
+            deadline = time.monotonic() + self.flush_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.store.record_many(batch)
+            self._count(written=len(batch), batches=1)
+        except sqlite3.Error:
+            self._count(dropped=len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _count(self, written: int = 0, dropped: int = 0, batches: int = 0):
+        with self._counts_lock:
+            self.written += written
+            self.dropped += dropped
+            self.batches += batches
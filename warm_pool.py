@@ -0,0 +1,151 @@
+"""Préremplissage du cache des générations pour les combinaisons les plus demandées.
+
+    python warm_pool.py [--top 20] [--min-count 3] [--variants 3] [--budget 30]
+                        [--hours 22-6] [--force] [--workers 4] [--dry-run]
+
+Les suggestions du questionnaire rendent l'espace des réponses petit et très
+déséquilibré : quelques combinaisons (langue, activité, réponses) reviennent
+sans cesse. Ce job lit les plus fréquentes dans le journal d'utilisation
+(`usage.db`, où les réponses sont enregistrées à chaque génération) et
+génère les variantes manquantes dans le cache (`generations.db`) : le bouton
+« Générer » de `streamlit_app.py` les sert ensuite instantanément, comme
+n'importe quel hit de cache. Les prompts utilisent l'auteur proposé par
+défaut dans chaque langue (« Ma classe »...).
+
+À lancer par cron (par exemple toutes les heures) : hors de la plage creuse
+`--hours` (22-6 par défaut), il ne fait rien sauf avec `--force`. Au plus
+`--budget` appels au backend par exécution, les combinaisons les plus
+demandées d'abord. Mêmes variables d'environnement que l'application
+(ATELIER_USAGE_DB, ATELIER_CACHE_*, ATELIER_LLM_BACKEND, OPENAI_API_KEY).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from atelier_core import generate_complete, make_backend
+from atelier_core.prompts import build_request
+from catalog import load_catalog
+from generation_cache import GenerationCache, make_key
+from usage_store import UsageStore
+
+
+@dataclass(frozen=True)
+class WarmTask:
+    lang: str
+    activity: str
+    answers: tuple
+    count: int      # nombre de demandes dans le journal
+    key: str        # clé du cache des générations
+    missing: int    # variantes à générer
+
+
+def pool_key(lang: str, activity: str, author: str, answers) -> str:
+    """Clé du cache pour cette demande : celle que calcule le bouton « Générer »."""
+    params = build_request(lang, activity, author, list(answers))
+    return make_key(params["messages"], params["model"], params["temperature"], params["max_tokens"])
+
+
+def in_window(spec: str, hour: int) -> bool:
+    """"22-6" -> vrai de 22 h à 5 h 59 ; "" -> toujours vrai."""
+    if not spec:
+        return True
+    start, end = (int(h) for h in spec.split("-"))
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def plan(usage: UsageStore, cache: GenerationCache, labels: dict, top: int, min_count: int, variants: int) -> list:
+    """Combinaisons fréquentes auxquelles il manque des variantes en cache."""
+    tasks = []
+    for lang, activity, answers, count in usage.top_combos(top, min_count):
+        if lang not in labels:
+            continue
+        key = pool_key(lang, activity, labels[lang]["default_author"], answers)
+        missing = variants - cache.count(key)
+        if missing > 0:
+            tasks.append(WarmTask(lang, activity, tuple(answers), count, key, missing))
+    return tasks
+
+
+def run_pool(tasks, backend, cache: GenerationCache, labels: dict, budget: int, workers: int = 4):
+    """Génère les variantes manquantes, dans la limite de `budget` appels ; renvoie (faites, erreurs).
+
+    Un texte encore coupé par `max_tokens` après reprise compte comme une erreur (pas mis en cache).
+    """
+    jobs = []
+    for task in tasks:
+        for _ in range(task.missing):
+            if len(jobs) >= budget:
+                break
+            jobs.append(task)
+    done, errors = 0, []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(generate_complete, backend, build_request(
+                task.lang, task.activity, labels[task.lang]["default_author"], list(task.answers)
+            )): task
+            for task in jobs
+        }
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                text, truncated = future.result()
+                if truncated:
+                    raise ValueError("texte coupé par max_tokens")
+                cache.put(task.key, text)
+                done += 1
+            except Exception as e:  # la variante sera retentée à la prochaine exécution
+                errors.append((task, str(e)))
+    return done, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20, help="combinaisons les plus demandées à considérer")
+    parser.add_argument("--min-count", type=int, default=3, help="demandes minimales pour une combinaison")
+    parser.add_argument("--variants", type=int, default=int(os.environ.get("ATELIER_CACHE_VARIANTS", "3")),
+                        help="variantes visées par combinaison (celles servies à tour de rôle par le cache)")
+    parser.add_argument("--budget", type=int, default=int(os.environ.get("ATELIER_WARM_BUDGET", "30")),
+                        help="appels au backend au plus par exécution")
+    parser.add_argument("--hours", default=os.environ.get("ATELIER_WARM_HOURS", "22-6"),
+                        help="plage creuse, heures locales (ex. 22-6 ; vide = toujours)")
+    parser.add_argument("--force", action="store_true", help="ignore la plage creuse")
+    parser.add_argument("--workers", type=int, default=4, help="appels simultanés au backend")
+    parser.add_argument("--dry-run", action="store_true", help="affiche le plan sans générer")
+    args = parser.parse_args(argv)
+
+    hour = time.localtime().tm_hour
+    if not args.force and not in_window(args.hours, hour):
+        print(f"{hour} h : hors de la plage creuse {args.hours}, rien à faire (--force pour passer outre)")
+        return 0
+
+    labels = load_catalog().labels
+    usage = UsageStore(os.environ.get("ATELIER_USAGE_DB", "usage.db"))
+    cache = GenerationCache(
+        os.environ.get("ATELIER_CACHE_PATH", "generations.db"),
+        ttl_s=float(os.environ.get("ATELIER_CACHE_TTL_H", "168")) * 3600,
+        max_entries=int(os.environ.get("ATELIER_CACHE_MAX", "5000")),
+        variants=args.variants,
+    )
+    tasks = plan(usage, cache, labels, args.top, args.min_count, args.variants)
+    print(f"{len(tasks)} combinaison(s) à compléter, {sum(t.missing for t in tasks)} variante(s) manquante(s), "
+          f"budget {args.budget} appel(s)")
+    for task in tasks:
+        print(f"  {task.count:>5} x {task.activity} ({task.lang}) : {' / '.join(a for a in task.answers if a)}"
+              f"  [+{task.missing}]")
+    if args.dry_run or not tasks:
+        return 0
+
+    backend = make_backend(os.environ.get("OPENAI_API_KEY"))
+    t0 = time.perf_counter()
+    done, errors = run_pool(tasks, backend, cache, labels, args.budget, args.workers)
+    print(f"{done} variante(s) générée(s) en {time.perf_counter() - t0:.1f} s (backend {backend.name})")
+    for task, error in errors:
+        print(f"échec {task.activity} ({task.lang}) : {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())